@@ -8,6 +8,17 @@ let currentPage = 1;
 const apiCache = {}; // simple cache: apiCache[endpoint] = data
 let stokListAbortController = null;
 let publicStokAbortController = null;
+// Paginasi cursor (keyset) untuk daftar stok: tanpa COUNT(*) dan biaya per
+// halaman tetap berapapun kedalamannya. Set false untuk kembali ke nomor halaman.
+const USE_CURSOR_PAGINATION = true;
+// Mode nomor halaman: cara API menghitung total (?count=exact|cached|estimate|none).
+// Selain exact, tombol halaman hanya Sebelumnya/Berikutnya karena total bisa perkiraan/null.
+const STOK_COUNT_MODE = 'estimate';
+// Riwayat cursor halaman yang sudah dikunjungi (untuk tombol "Sebelumnya")
+const cursorHistory = { public: [''], admin: [''] };
+// Kartu stok publik: hanya field yang ditampilkan, barang ikut di-embed (?expand=)
+// sehingga satu halaman cukup satu request, tanpa GET /barang/{id}/ per kartu.
+const PUBLIC_STOK_PARAMS = 'expand=barang&fields=id,jumlah,level_reorder,gudang_nama,barang.nama,barang.sku,barang.satuan,barang.gambar_url,barang.kategori_nama';
 
 // Utility: debounce to avoid spamming requests
 function debounce(fn, wait = 300) {
@@ -25,6 +36,27 @@ function authHeaders(extra = {}) {
     return headers;
 }
 
+// POST transaksi stok dengan Idempotency-Key: percobaan ulang setelah error
+// jaringan/5xx/409 memakai key yang sama, jadi stok tidak tercatat dua kali.
+async function postIdempoten(url, payload, percobaan = 3) {
+    const key = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    const options = {
+        method: 'POST',
+        headers: authHeaders({ 'Content-Type': 'application/json', 'Idempotency-Key': key }),
+        body: JSON.stringify(payload)
+    };
+    for (let i = 1; ; i++) {
+        try {
+            const res = await fetch(url, options);
+            if ((res.status >= 500 || res.status === 409) && i < percobaan) throw new Error(`status ${res.status}`);
+            return res;
+        } catch (e) {
+            if (i >= percobaan) throw e;
+            await new Promise(r => setTimeout(r, 500 * i));
+        }
+    }
+}
+
 // ===========================================================================
 // 2. FUNGSI HELPER (UI & AUTH)
 // ===========================================================================
@@ -144,7 +176,7 @@ async function loadPublicData() {
     try {
         const [kategoriRes, stokRes] = await Promise.all([
             fetch(`${API_BASE_URL}/kategori/`),
-            fetch(`${API_BASE_URL}/stok/`)
+            fetch(`${stokPageUrl(1, '')}&${PUBLIC_STOK_PARAMS}`)
         ]);
 
         const katData = await kategoriRes.json();
@@ -163,9 +195,16 @@ async function loadPublicData() {
     } catch (e) { console.error(e); } finally { hideLoading('loading'); }
 }
 
-async function loadStokPublic(page = 1, search = '', kategoriId = '') {
+// Bangun URL list stok sesuai mode paginasi (nomor halaman atau cursor)
+function stokPageUrl(page, cursor) {
+    if (USE_CURSOR_PAGINATION) return `${API_BASE_URL}/stok/?cursor=${encodeURIComponent(cursor || '')}`;
+    return `${API_BASE_URL}/stok/?page=${page}&count=${STOK_COUNT_MODE}`;
+}
+
+async function loadStokPublic(page = 1, search = '', kategoriId = '', cursor = '') {
     showLoading('loading');
-    let url = `${API_BASE_URL}/stok/?page=${page}`;
+    let url = `${stokPageUrl(page, cursor)}&${PUBLIC_STOK_PARAMS}`;
+    if (!cursor) cursorHistory.public = [''];
     if (search) url += `&search=${encodeURIComponent(search)}`;
     if (kategoriId) url += `&barang__kategori=${kategoriId}`;
 
@@ -184,16 +223,14 @@ function renderPublicStok(data) {
     const list = data.results || data || [];
     if (!list || list.length === 0) {
         container.innerHTML = '<div class="col-12 alert alert-warning text-center">Produk tidak ditemukan.</div>';
-        if (data.results) renderPagination(data.count, currentPage, '', '', 'public');
+        if (data.results) renderPagination(data.count, currentPage, '', '', 'public', data.next, data.count_tipe);
         return;
     }
 
     const frag = document.createDocumentFragment();
     list.forEach(stok => {
-        const imgUrl = getFullImageUrl(
-            stok.barang_detail?.gambar_url || stok.barang?.gambar_url || stok.barang_gambar || stok.barang?.gambar || stok.barang_image
-        );
-        const nama = stok.barang_nama || stok.barang?.nama || 'Produk';
+        const imgUrl = getFullImageUrl(stok.barang?.gambar_url || stok.barang_gambar);
+        const nama = stok.barang?.nama || stok.barang_nama || 'Produk';
 
         const col = document.createElement('div');
         col.className = 'col-md-4 mb-4';
@@ -221,27 +258,23 @@ function renderPublicStok(data) {
         const lokasiText = document.createElement('p');
         lokasiText.className = 'card-text small';
         lokasiText.textContent = `Lokasi: ${stok.gudang_nama || '-'}`;
+        const kategoriText = document.createElement('p');
+        kategoriText.className = 'card-text small text-muted';
+        kategoriText.textContent = `Kategori: ${stok.barang?.kategori_nama || '-'}`;
 
         body.appendChild(title);
         body.appendChild(stokText);
         body.appendChild(lokasiText);
+        body.appendChild(kategoriText);
 
         card.appendChild(img);
         card.appendChild(body);
         col.appendChild(card);
         frag.appendChild(col);
-
-        // If image missing, lazy fetch barang detail but don't block render
-        const isPlaceholder = !stok.barang_detail?.gambar_url && !stok.barang?.gambar_url && !stok.barang_gambar && !stok.barang?.gambar && !stok.barang_image;
-        if (isPlaceholder && stok.barang) {
-            fetch(`${API_BASE_URL}/barang/${stok.barang}/`).then(r => r.ok ? r.json() : null).then(bdata => {
-                if (bdata && (bdata.gambar_url || bdata.gambar)) img.src = getFullImageUrl(bdata.gambar_url || bdata.gambar);
-            }).catch(() => {});
-        }
     });
 
     container.appendChild(frag);
-    if (data.results) renderPagination(data.count, currentPage, '', '', 'public');
+    if (data.results) renderPagination(data.count, currentPage, '', '', 'public', data.next, data.count_tipe);
 }
 
 // ===========================================================================
@@ -306,6 +339,9 @@ async function loadGudangForStok() {
         (data.results || data || []).forEach(g => {
             el.innerHTML += `<option value="${g.id}">${g.nama}</option>`;
         });
+        // Pilihan gudang tujuan di modal stok keluar (keperluan Transfer Antar Gudang)
+        const tujuan = document.getElementById('modalGudangTujuan');
+        if (tujuan) tujuan.innerHTML = el.innerHTML;
     } catch (e) { console.error('loadGudangForStok error:', e); }
 }
 
@@ -517,10 +553,11 @@ async function setBarangEdit(id) {
 }
 
 // --- D. ADMIN STOK ---
-async function loadStokTable(page = 1) {
+async function loadStokTable(page = 1, _search = '', _kat = '', cursor = '') {
     const search = document.getElementById('searchInput')?.value || '';
     const kat = document.getElementById('kategoriFilter')?.value || '';
-    let url = `${API_BASE_URL}/stok/?page=${page}`;
+    let url = stokPageUrl(page, cursor);
+    if (!cursor) cursorHistory.admin = [''];
     if (search) url += `&search=${encodeURIComponent(search)}`;
     if (kat) url += `&barang__kategori=${kat}`;
 
@@ -536,7 +573,7 @@ async function loadStokTable(page = 1) {
 
         // Update stok count badge if exists
         const stokCountEl = document.getElementById('stokCount');
-        if (stokCountEl) stokCountEl.textContent = `${data.count !== undefined ? data.count : (data.results || data).length} Items`;
+        if (stokCountEl) stokCountEl.textContent = `${formatTotal(data)} Items`;
 
         const list = data.results || data || [];
         if (list.length === 0) {
@@ -547,11 +584,13 @@ async function loadStokTable(page = 1) {
         const frag = document.createDocumentFragment();
         list.forEach(stok => {
             const tr = document.createElement('tr');
+            tr.dataset.stokId = stok.id;
+            tr.dataset.levelReorder = stok.level_reorder;
             if (stok.jumlah <= stok.level_reorder) tr.classList.add('table-warning');
 
             const tdBarang = document.createElement('td'); tdBarang.innerHTML = `${stok.barang_nama || (stok.barang_detail && stok.barang_detail.nama) || ''} <br><small>${stok.barang_sku || ''}</small>`;
             const tdGudang = document.createElement('td'); tdGudang.textContent = stok.gudang_nama || (stok.gudang_detail && stok.gudang_detail.nama) || '';
-            const tdJumlah = document.createElement('td'); tdJumlah.className='text-center'; tdJumlah.innerHTML = `<strong>${stok.jumlah}</strong>`;
+            const tdJumlah = document.createElement('td'); tdJumlah.className='text-center stok-jumlah'; tdJumlah.innerHTML = `<strong>${stok.jumlah}</strong>`;
             const tdLevel = document.createElement('td'); tdLevel.className='text-center'; tdLevel.textContent = stok.level_reorder;
             const tdUpdated = document.createElement('td'); tdUpdated.textContent = new Date(stok.diperbarui_pada).toLocaleDateString('id-ID');
             const tdAction = document.createElement('td');
@@ -565,7 +604,7 @@ async function loadStokTable(page = 1) {
         });
         tbody.appendChild(frag);
 
-        if(data.results) renderPagination(data.count, page, search, kat, 'admin');
+        if(data.results) renderPagination(data.count, page, search, kat, 'admin', data.next, data.count_tipe);
 
     } catch (e) {
         if (e.name === 'AbortError') return; // expected when cancelled
@@ -573,6 +612,43 @@ async function loadStokTable(page = 1) {
     }
 }
 
+// Terima pergerakan stok real-time (SSE) dan perbarui baris tabel yang tampil,
+// tanpa memuat ulang seluruh list. EventSource tidak bisa mengirim header
+// Authorization, jadi URL-nya memakai tiket stream berumur pendek (bukan token
+// API). Reconnect otomatis EventSource memakai tiket yang sama; setelah tiket
+// kedaluwarsa koneksi ditolak dan tiket baru diminta.
+let stokStream = null;
+async function subscribeStokStream() {
+    if (!authToken || typeof EventSource === 'undefined' || stokStream) return;
+    stokStream = 'menunggu';
+    let tiket;
+    try {
+        const res = await fetch(`${API_BASE_URL}/stok/stream/tiket/`, { method: 'POST', headers: authHeaders() });
+        if (res.status === 401 || res.status === 403) { stokStream = null; return; }
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        tiket = (await res.json()).tiket;
+    } catch (e) {
+        stokStream = null;
+        setTimeout(subscribeStokStream, 5000);
+        return;
+    }
+    const es = new EventSource(`${API_BASE_URL}/stok/stream/?tiket=${encodeURIComponent(tiket)}`);
+    stokStream = es;
+    es.addEventListener('error', () => {
+        if (es.readyState !== EventSource.CLOSED) return;
+        stokStream = null;
+        setTimeout(subscribeStokStream, 5000);
+    });
+    es.addEventListener('pergerakan', (e) => {
+        const ev = JSON.parse(e.data);
+        const tr = document.querySelector(`#stokTableBody tr[data-stok-id="${ev.stok}"]`);
+        if (!tr) return;
+        const td = tr.querySelector('.stok-jumlah');
+        if (td) td.innerHTML = `<strong>${ev.jumlah_stok}</strong>`;
+        tr.classList.toggle('table-warning', ev.jumlah_stok <= Number(tr.dataset.levelReorder));
+    });
+}
+
 async function addOrUpdateStok() {
     const id = document.getElementById('stokId').value;
     const payload = {
@@ -611,6 +687,7 @@ function openStockOutModal(stokId, currentJumlah) {
     document.getElementById('modalJumlahKeluar').value = '';
     document.getElementById('modalCatatan').value = '';
     document.getElementById('modalKeperluan').value = 'Penjualan';
+    toggleGudangTujuan();
     document.getElementById('modalStokInfo').textContent = `Stok saat ini: ${currentJumlah}`;
 
     // Show bootstrap modal
@@ -618,6 +695,13 @@ function openStockOutModal(stokId, currentJumlah) {
     modal.show();
 }
 
+const KEPERLUAN_TRANSFER = 'Transfer Antar Gudang';
+
+function toggleGudangTujuan() {
+    const wrap = document.getElementById('modalTujuanWrap');
+    if (wrap) wrap.classList.toggle('d-none', document.getElementById('modalKeperluan').value !== KEPERLUAN_TRANSFER);
+}
+
 async function processStockOut() {
     const stokId = document.getElementById('modalStokId').value;
     const jumlahKeluar = Number(document.getElementById('modalJumlahKeluar').value) || 0;
@@ -637,12 +721,17 @@ async function processStockOut() {
         const newJumlah = stok.jumlah - jumlahKeluar;
 
         // Perform transactional stok OUT in one request to avoid race conditions
-        const txPayload = { stok: stokId, tipe: 'OUT', jumlah: jumlahKeluar, catatan: `${keperluan}${catatan ? ' - ' + catatan : ''}` };
-        const txRes = await fetch(`${API_BASE_URL}/stok/transaction/`, {
-            method: 'POST',
-            headers: authHeaders({ 'Content-Type': 'application/json' }),
-            body: JSON.stringify(txPayload)
-        });
+        let txUrl = `${API_BASE_URL}/stok/transaction/`;
+        let txPayload = { stok: stokId, tipe: 'OUT', jumlah: jumlahKeluar, catatan: `${keperluan}${catatan ? ' - ' + catatan : ''}` };
+        if (keperluan === KEPERLUAN_TRANSFER) {
+            // OUT di gudang asal dan IN di gudang tujuan dalam satu transaksi
+            const keGudang = document.getElementById('modalGudangTujuan')?.value;
+            if (!keGudang) { showAlert('Pilih gudang tujuan', false); return; }
+            if (Number(keGudang) === stok.gudang) { showAlert('Gudang tujuan harus berbeda dengan gudang asal', false); return; }
+            txUrl = `${API_BASE_URL}/stok/transfer/`;
+            txPayload = { stok: stokId, ke_gudang: keGudang, jumlah: jumlahKeluar, catatan: txPayload.catatan };
+        }
+        const txRes = await postIdempoten(txUrl, txPayload);
         if (!txRes.ok) {
             const err = await txRes.json().catch(() => ({}));
             throw new Error(err.detail || JSON.stringify(err));
@@ -653,7 +742,7 @@ async function processStockOut() {
         const modal = bootstrap.Modal.getInstance(modalEl);
         if (modal) modal.hide();
 
-        showAlert('Stok berhasil dikeluarkan', true);
+        showAlert(keperluan === KEPERLUAN_TRANSFER ? 'Stok berhasil ditransfer' : 'Stok berhasil dikeluarkan', true);
         loadStokTable(currentPage);
     } catch (e) {
         console.error('processStockOut error', e);
@@ -667,7 +756,8 @@ async function submitData(endpoint, id, payload, reloadCb, resetCb) {
     const method = id ? 'PUT' : 'POST';
     
     try {
-        const res = await fetch(url, {
+        // Tambah stok (upsert) aman dicoba ulang lewat Idempotency-Key
+        const res = (endpoint === 'stok' && !id) ? await postIdempoten(url, payload) : await fetch(url, {
             method: method,
             headers: authHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify(payload)
@@ -760,14 +850,73 @@ async function deleteItem(endpoint, id, reloadCb) {
             method: 'DELETE',
             headers: authHeaders()
         });
-        if (res.ok) { showAlert("Terhapus!", true); reloadCb(); }
-    } catch (e) { showAlert("Gagal hapus", false); }
+        if (res.status === 202) {
+            // Data besar (mis. kategori dengan ribuan barang) dihapus lewat tugas latar
+            const tugas = await res.json();
+            showAlert("Penghapusan berjalan di latar belakang...", true);
+            let akhir;
+            try {
+                akhir = await tungguTugas(tugas.id);
+            } catch (e) {
+                // Tugas tetap di antrian dan dijalankan begitu pekerja latar aktif
+                if (e.tugas) { showAlert(`Penghapusan dijadwalkan (tugas #${tugas.id}): ${e.message}`, false); return; }
+                throw e;
+            }
+            if (akhir.status !== 'selesai') throw new Error(akhir.pesan || akhir.status);
+            showAlert("Terhapus!", true); reloadCb();
+        } else if (res.ok) { showAlert("Terhapus!", true); reloadCb(); }
+    } catch (e) { showAlert("Gagal hapus" + (e.message ? `: ${e.message}` : ''), false); }
 }
 
-function renderPagination(total, page, search, kat, type) {
+// Pantau tugas latar (/api/tugas/<id>/) sampai berakhir; onProgres menerima data tugas terbaru.
+// Tugas yang masih 'antri' setelah batasAntri biasanya berarti pekerja
+// `python manage.py jalankan_tugas` tidak berjalan: error-nya ditandai `antri`.
+const BATAS_ANTRI_TUGAS_MS = 30000;
+const BATAS_TUGAS_MS = 10 * 60000;
+
+async function tungguTugas(id, onProgres, { batasAntri = BATAS_ANTRI_TUGAS_MS, batas = BATAS_TUGAS_MS } = {}) {
+    const mulai = Date.now();
+    for (;;) {
+        const res = await fetch(`${API_BASE_URL}/tugas/${id}/`, { headers: authHeaders() });
+        if (!res.ok) throw new Error(`Status ${res.status}`);
+        const tugas = await res.json();
+        if (onProgres) onProgres(tugas);
+        if (['selesai', 'gagal', 'batal'].includes(tugas.status)) return tugas;
+        const lama = Date.now() - mulai;
+        if ((tugas.status === 'antri' && lama > batasAntri) || lama > batas) {
+            const err = new Error(tugas.status === 'antri'
+                ? 'Tugas belum diambil pekerja latar (jalankan_tugas tidak berjalan?)'
+                : 'Tugas belum selesai, pantau lagi nanti');
+            err.tugas = tugas;
+            err.antri = tugas.status === 'antri';
+            throw err;
+        }
+        await new Promise(r => setTimeout(r, 1000));
+    }
+}
+
+// Total untuk badge jumlah: `~` untuk estimasi, `+` jika count tidak dihitung tapi masih ada halaman berikutnya
+function formatTotal(data) {
+    const list = data.results || data || [];
+    if (data.count === undefined || data.count === null) return `${list.length}${data.next ? '+' : ''}`;
+    return `${data.count_tipe === 'estimate' ? '~' : ''}${data.count}`;
+}
+
+function renderPagination(total, page, search, kat, type, next, countTipe) {
     const el = document.getElementById('pagination');
     const nav = document.getElementById('paginationNav');
     if (!el || !nav) return;
+
+    // Mode cursor: tidak ada total, hanya tombol sebelumnya/berikutnya
+    if (USE_CURSOR_PAGINATION && (total === undefined || total === null)) {
+        renderCursorPagination(el, nav, search, kat, type, next);
+        return;
+    }
+    // Count null/perkiraan (?count=none|estimate): nomor halaman terakhir tidak pasti
+    if (total === undefined || total === null || countTipe === 'estimate') {
+        renderPrevNextPagination(el, nav, page, search, kat, type, next, total);
+        return;
+    }
     
     const pages = Math.ceil(total / 10);
     if (pages <= 1) { nav.classList.add('d-none'); return; }
@@ -783,6 +932,47 @@ function renderPagination(total, page, search, kat, type) {
     }
 }
 
+function renderPrevNextPagination(el, nav, page, search, kat, type, next, total) {
+    const func = type === 'public' ? 'loadStokPublic' : 'loadStokTable';
+    if (page <= 1 && !next) { nav.classList.add('d-none'); return; }
+
+    nav.classList.remove('d-none');
+    el.innerHTML = '';
+    if (page > 1) {
+        el.innerHTML += `<li class="page-item">
+            <button class="page-link" onclick="${func}(${page - 1}, '${search}', '${kat}')">&laquo; Sebelumnya</button>
+        </li>`;
+    }
+    const perkiraan = total ? ` dari ~${Math.ceil(total / 10)}` : '';
+    el.innerHTML += `<li class="page-item disabled"><span class="page-link">Halaman ${page}${perkiraan}</span></li>`;
+    if (next) {
+        el.innerHTML += `<li class="page-item">
+            <button class="page-link" onclick="${func}(${page + 1}, '${search}', '${kat}')">Berikutnya &raquo;</button>
+        </li>`;
+    }
+}
+
+// Cursor diambil dari link `next` yang dikirim API
+function renderCursorPagination(el, nav, search, kat, type, next) {
+    const history = cursorHistory[type];
+    const func = type === 'public' ? 'loadStokPublic' : 'loadStokTable';
+    const nextCursor = next ? (new URL(next).searchParams.get('cursor') || '') : null;
+    if (history.length <= 1 && nextCursor === null) { nav.classList.add('d-none'); return; }
+
+    nav.classList.remove('d-none');
+    el.innerHTML = '';
+    if (history.length > 1) {
+        el.innerHTML += `<li class="page-item">
+            <button class="page-link" onclick="cursorHistory['${type}'].pop(); ${func}(1, '${search}', '${kat}', cursorHistory['${type}'].at(-1))">&laquo; Sebelumnya</button>
+        </li>`;
+    }
+    if (nextCursor !== null) {
+        el.innerHTML += `<li class="page-item">
+            <button class="page-link" onclick="cursorHistory['${type}'].push('${nextCursor}'); ${func}(1, '${search}', '${kat}', '${nextCursor}')">Berikutnya &raquo;</button>
+        </li>`;
+    }
+}
+
 // ===========================================================================
 // 6. INISIALISASI (EVENT LISTENER)
 // ===========================================================================
@@ -853,6 +1043,8 @@ document.addEventListener('DOMContentLoaded', async () => {
         // Attach stock-out modal confirm button
         const confirmBtn = document.getElementById('modalConfirmOut');
         if (confirmBtn) confirmBtn.addEventListener('click', processStockOut);
+        const keperluan = document.getElementById('modalKeperluan');
+        if (keperluan) keperluan.addEventListener('change', toggleGudangTujuan);
     }
 });
 // Duplicate finalization block removed — configuration already declared above
@@ -935,7 +1127,7 @@ async function loadStok(page = 1, search = '', kategoriId = '') {
     const errEl = document.getElementById('error');
     if (errEl) errEl.classList.add('d-none');
     
-    let url = `${API_BASE_URL}/stok/?`;
+    let url = `${API_BASE_URL}/stok/?${PUBLIC_STOK_PARAMS}&`;
     
     // 1. Determine search & kategoriId from inputs if not provided
     const searchInputEl = document.getElementById('searchInput');
@@ -978,17 +1170,15 @@ async function loadStok(page = 1, search = '', kategoriId = '') {
             if (data.results) renderPagination(data.count, currentPage, '', '', 'public');
             return;
         }
-        // Build DOM nodes per item so we can lazily fetch barang detail if image missing
         const frag = document.createDocumentFragment();
         const activeCategorySelected = kategoriVal && kategoriVal !== '';
         items.forEach(stok => {
-            const barangNama = stok.barang_nama || stok.barang?.nama || 'Nama Tidak Ditemukan';
-            const kategoriNama = stok.barang?.kategori_nama || stok.barang?.kategori || 'Tak Terkategori';
-            const sku = stok.barang_sku || stok.barang?.sku || 'N/A';
-            const satuan = stok.barang_satuan || stok.barang?.satuan || '';
+            const barangNama = stok.barang?.nama || stok.barang_nama || 'Nama Tidak Ditemukan';
+            const kategoriNama = stok.barang?.kategori_nama || 'Tak Terkategori';
+            const sku = stok.barang?.sku || stok.barang_sku || 'N/A';
+            const satuan = stok.barang?.satuan || stok.barang_satuan || '';
 
-            const imgCandidate = stok.barang_detail?.gambar_url || stok.barang?.gambar_url || stok.barang_gambar || stok.barang?.gambar || stok.barang_image;
-            const imgUrl = getFullImageUrl(imgCandidate);
+            const imgUrl = getFullImageUrl(stok.barang?.gambar_url || stok.barang_gambar);
 
             const col = document.createElement('div');
             col.className = 'col-md-4 mb-4';
@@ -1037,14 +1227,6 @@ async function loadStok(page = 1, search = '', kategoriId = '') {
             card.appendChild(body);
             col.appendChild(card);
             frag.appendChild(col);
-
-            // If image missing, lazy fetch barang detail but don't block render
-            const isPlaceholder = imgCandidate === undefined || imgCandidate === null || String(imgCandidate).trim() === '';
-            if (isPlaceholder && stok.barang) {
-                fetch(`${API_BASE_URL}/barang/${stok.barang}/`).then(r => r.ok ? r.json() : null).then(bdata => {
-                    if (bdata && (bdata.gambar_url || bdata.gambar)) imgEl.src = getFullImageUrl(bdata.gambar_url || bdata.gambar);
-                }).catch(() => {});
-            }
         });
 
         container.appendChild(frag);
@@ -1073,141 +1255,63 @@ function getFullImageUrl(url) {
     }
 }
 
-// Fetch all stok items by following pagination `next` links
-async function fetchAllStoks() {
-    let url = `${API_BASE_URL}/stok/`;
-    let all = [];
-    try {
-        while (url) {
-            const res = await fetch(url, { headers: authHeaders() });
-            if (!res.ok) throw new Error('Gagal mengambil data stok');
-            const data = await res.json();
-            const items = data.results || data;
-            all = all.concat(items);
-            url = data.next || null;
-        }
-    } catch (e) {
-        console.error('fetchAllStoks error', e);
-        throw e;
-    }
-    return all;
-}
-
-// Fetch all riwayat-stok entries with tipe=OUT
-async function fetchAllRiwayatOuts() {
-    let url = `${API_BASE_URL}/riwayat-stok/?tipe=OUT`;
-    let all = [];
-    try {
-        while (url) {
-            const res = await fetch(url, { headers: authHeaders() });
-            if (!res.ok) throw new Error('Gagal mengambil data riwayat stok');
-            const data = await res.json();
-            const items = data.results || data;
-            all = all.concat(items);
-            url = data.next || null;
-        }
-    } catch (e) {
-        console.error('fetchAllRiwayatOuts error', e);
-        throw e;
-    }
-    return all;
-}
-
-// Export stok data to CSV and trigger download (Excel-compatible)
-function exportStoksToCSV(items) {
-    if (!items || items.length === 0) {
-        showAlert('Tidak ada data stok untuk di-download', false);
-        return;
-    }
-
-    const headers = ['ID','Barang','SKU','Kategori','Gudang','Jumlah','Level Reorder','Satuan','Diperbarui Pada'];
-    const rows = items.map(s => {
-        const nama = s.barang_nama || s.barang?.nama || '';
-        const sku = s.barang_sku || s.barang?.sku || '';
-        const kategori = s.barang?.kategori_nama || s.barang?.kategori || '';
-        const gudang = s.gudang_nama || s.gudang_detail?.nama || '';
-        const jumlah = s.jumlah ?? '';
-        const level = s.level_reorder ?? '';
-        const satuan = s.barang_satuan || s.barang?.satuan || '';
-        const updated = s.diperbarui_pada || s.updated_at || '';
-        return [s.id, nama, sku, kategori, gudang, jumlah, level, satuan, updated];
-    });
-
-    // Build CSV content (escape quotes)
-    const escape = v => `"${String(v ?? '').replace(/"/g, '""')}"`;
-    const csv = [headers.map(escape).join(','), ...rows.map(r => r.map(escape).join(','))].join('\r\n');
-
-    const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' });
+// Trigger browser download for a Blob
+function downloadBlob(blob, filename) {
     const url = URL.createObjectURL(blob);
     const a = document.createElement('a');
-    const now = new Date().toISOString().slice(0,10);
     a.href = url;
-    a.download = `stok_export_${now}.csv`;
+    a.download = filename;
     document.body.appendChild(a);
     a.click();
     a.remove();
     URL.revokeObjectURL(url);
 }
 
-// Export combined data to XLSX with two sheets: 'Stok' and 'Stok Keluar'
-async function exportStoksToXLSX(stokItems, riwayatItems) {
-    // If SheetJS not available, fallback to CSV of stok only
-    if (typeof XLSX === 'undefined') {
-        showAlert('SheetJS tidak tersedia, men-download CSV stok saja', false);
-        exportStoksToCSV(stokItems);
-        return;
-    }
+// Laporan besar bisa dibuat oleh tugas latar (butuh pekerja `python manage.py
+// jalankan_tugas`); default-nya file di-stream langsung oleh /stok/export/.
+const EKSPOR_LEWAT_TUGAS = false;
 
-    // Prepare stok sheet
-    const stokRows = (stokItems || []).map(s => ({
-        ID: s.id,
-        Barang: s.barang_nama || (s.barang && s.barang.nama) || '',
-        SKU: s.barang_sku || (s.barang && s.barang.sku) || '',
-        Kategori: (s.barang && (s.barang.kategori_nama || s.barang.kategori)) || '',
-        Gudang: s.gudang_nama || (s.gudang_detail && s.gudang_detail.nama) || '',
-        Jumlah: s.jumlah ?? '',
-        LevelReorder: s.level_reorder ?? '',
-        Satuan: s.barang_satuan || (s.barang && s.barang.satuan) || '',
-        DiperbaruiPada: s.diperbarui_pada || s.updated_at || ''
-    }));
-
-    // Prepare riwayat keluar sheet
-    const riwayatRows = (riwayatItems || []).map(r => ({
-        ID: r.id,
-        StokID: r.stok || '',
-        Barang: r.stok_barang || r.stok_nama || r.barang_nama || '',
-        Tipe: r.tipe || '',
-        Jumlah: r.jumlah ?? '',
-        Catatan: r.catatan || '',
-        DibuatPada: r.dibuat_pada || r.created_at || '' ,
-        DibuatOleh: r.dibuat_oleh_nama || r.dibuat_oleh || ''
-    }));
-
-    const wb = XLSX.utils.book_new();
-    const ws1 = XLSX.utils.json_to_sheet(stokRows);
-    XLSX.utils.book_append_sheet(wb, ws1, 'Stok');
-    const ws2 = XLSX.utils.json_to_sheet(riwayatRows);
-    XLSX.utils.book_append_sheet(wb, ws2, 'Stok Keluar');
-
-    const now = new Date().toISOString().slice(0,10);
-    XLSX.writeFile(wb, `laporan_stok_${now}.xlsx`);
+async function eksporLewatTugas(parameter, now) {
+    const res = await fetch(`${API_BASE_URL}/tugas/`, {
+        method: 'POST',
+        headers: authHeaders({ 'Content-Type': 'application/json' }),
+        body: JSON.stringify({ jenis: 'ekspor_stok', parameter })
+    });
+    if (!res.ok) throw new Error(`Status ${res.status}`);
+    const id = (await res.json()).id;
+    let tugas;
+    try {
+        tugas = await tungguTugas(id, t => {
+            const el = document.getElementById('loadingTable');
+            if (el && t.status === 'berjalan') el.setAttribute('title', `Menyiapkan laporan ${t.progres}%`);
+        });
+    } catch (e) {
+        if (!e.antri) throw e;
+        // Tidak ada pekerja: batalkan tugasnya dan pakai export langsung
+        await fetch(`${API_BASE_URL}/tugas/${id}/batal/`, { method: 'POST', headers: authHeaders() }).catch(() => {});
+        return false;
+    }
+    if (tugas.status !== 'selesai') throw new Error(tugas.pesan || tugas.status);
+    const berkas = await fetch(tugas.url_hasil, { headers: authHeaders() });
+    if (!berkas.ok) throw new Error(`Status ${berkas.status}`);
+    downloadBlob(await berkas.blob(), (tugas.hasil && tugas.hasil.nama_berkas) || `laporan_stok_${now}.xlsx`);
+    return true;
 }
 
-// Handler to run when user clicks download
+// Handler to run when user clicks download.
+// File dibuat di server (streaming) lewat /stok/export/, jadi tidak perlu lagi
+// mengambil semua halaman stok & riwayat satu per satu di browser.
 async function handleDownloadStock() {
     try {
         showLoading('loadingTable');
-        const [items, riwayat] = await Promise.all([
-            fetchAllStoks(),
-            fetchAllRiwayatOuts().catch(() => [])
-        ]);
-
-        // If XLSX (SheetJS) available, produce a workbook with two sheets
-        if (typeof XLSX !== 'undefined') {
-            await exportStoksToXLSX(items, riwayat);
-        } else {
-            // Fallback: CSV of stok only
-            exportStoksToCSV(items);
+        const now = new Date().toISOString().slice(0,10);
+        const kat = document.getElementById('kategoriFilter')?.value || '';
+        const parameter = { jenis: 'xlsx' };
+        if (kat) parameter.barang__kategori = kat;
+        if (!(EKSPOR_LEWAT_TUGAS && await eksporLewatTugas(parameter, now))) {
+            const res = await fetch(`${API_BASE_URL}/stok/export/?${new URLSearchParams(parameter)}`, { headers: authHeaders() });
+            if (!res.ok) throw new Error(`Status ${res.status}`);
+            downloadBlob(await res.blob(), `laporan_stok_${now}.xlsx`);
         }
         showAlert('Download dimulai', true);
     } catch (e) {
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,11 +55,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     # CorsMiddleware harus berada di posisi paling atas
     'corsheaders.middleware.CorsMiddleware',
+    # Server-Timing dan metrik per rute; dipasang di atas agar mencakup middleware lain
+    'inventaris.metrics.MetrikMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventaris.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -92,9 +98,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Penulis bersamaan menunggu lock database (detik) alih-alih langsung
+        # gagal dengan "database is locked"
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Read replica (opsional), lihat inventaris/db_router.py. Untuk mencoba secara
+# lokal dengan dua file SQLite: salin db.sqlite3 ke replica.sqlite3 lalu jalankan
+#   INVENTARIS_REPLICA_SQLITE=replica.sqlite3 python manage.py runserver
+INVENTARIS_DATABASE_REPLICAS = []
+for _i, _nama in enumerate(filter(None, os.environ.get('INVENTARIS_REPLICA_SQLITE', '').split(',')), start=1):
+    DATABASES[f'replica{_i}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / _nama,
+        'OPTIONS': {'timeout': 20},
+        # Saat test, replica menunjuk ke database test yang sama dengan default
+        'TEST': {'MIRROR': 'default'},
+    }
+    INVENTARIS_DATABASE_REPLICAS.append(f'replica{_i}')
+
+DATABASE_ROUTERS = ['inventaris.db_router.ReplicaRouter']
+# Lama (detik) klien tetap membaca dari primary setelah melakukan penulisan
+INVENTARIS_REPLICA_JENDELA_LENGKET = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,6 +159,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Berkas hasil tugas latar (export) disimpan di sini; lihat INVENTARIS_TUGAS
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -141,12 +172,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Konfigurasi Django REST Framework (DRF)
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'inventaris.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'inventaris.pagination.InventarisPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -157,10 +188,71 @@ REST_FRAMEWORK = {
 }
 
 
+# Cache response endpoint data referensi (kategori, supplier, gudang).
+# Lihat inventaris/cache.py. Versi model disimpan di cache Django 'default'; jika API,
+# worker `jalankan_tugas` dan management command berjalan di proses terpisah, arahkan
+# CACHES ke backend bersama (Redis/Memcached) agar invalidasi terlihat antar proses.
+INVENTARIS_RESPONSE_CACHE = {
+    'AKTIF': True,
+    'BACKEND': 'django',
+    'MAKS_ENTRI': 512,
+    'MAKS_BYTE': 8 * 1024 * 1024,
+    'TIMEOUT': 300,
+}
+
+
+# Strategi count paginasi nomor halaman; klien bisa memilih per request lewat
+# ?count=exact|cached|estimate|none (lihat inventaris/pagination.py).
+INVENTARIS_PAGINATION = {
+    'COUNT_DEFAULT': 'exact',
+    'COUNT_CACHE_TTL': 30,
+}
+
+
+# Broker event stream pergerakan stok (/api/stok/stream/, lihat inventaris/realtime.py).
+# Endpoint stream butuh server ASGI, mis. `uvicorn gudang_proyek.asgi:application`.
+INVENTARIS_REALTIME_BROKER = 'inventaris.realtime.InProcessBroker'
+# Masa berlaku (detik) tiket dari /api/stok/stream/tiket/ untuk membuka stream
+INVENTARIS_REALTIME_TIKET_TTL = 60
+
+# Riwayat stok yang lebih tua dari ini dipindahkan ke tabel arsip oleh
+# `python manage.py arsipkan_riwayat` (lihat inventaris/arsip.py).
+INVENTARIS_RETENSI_RIWAYAT_HARI = 365
+
+# Instrumentasi per request (header Server-Timing, /api/metrics/, log request
+# lambat ke logger 'inventaris.metrics'). Lihat inventaris/metrics.py.
+INVENTARIS_METRICS = {
+    'AKTIF': True,
+    'SERVER_TIMING': True,
+    'AMBANG_LAMBAT_MS': 500,
+    'SAMPEL_LAMBAT': 1.0,
+}
+
+
+# Tugas latar (export besar, hapus kategori besar, bangun ulang rekap) yang
+# dijalankan `python manage.py jalankan_tugas`. Lihat inventaris/tugas.py.
+INVENTARIS_TUGAS = {
+    'KONKURENSI': 2,
+    'BATAS_DETAK': 300,
+    'SIMPAN_HARI': 7,
+    'AMBANG_HAPUS_KATEGORI': 500,
+}
+
+# Header Idempotency-Key pada endpoint transaksi stok: response disimpan selama
+# TTL_JAM lalu dibuang `python manage.py bersihkan_idempotensi`.
+# Lihat inventaris/idempotensi.py.
+INVENTARIS_IDEMPOTENSI = {
+    'TTL_JAM': 24,
+}
+
+
 # Konfigurasi CORS (Cross-Origin Resource Sharing)
 # Izinkan semua origin untuk development (ganti di production)
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+# Header conditional request (ETag/If-Match) dan Idempotency-Key untuk frontend lintas origin
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match', 'if-none-match', 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'X-Cache', 'Idempotent-Replayed']
 
 
 # Konfigurasi drf-spectacular (Dokumentasi API)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Kategori, Supplier, Barang, Gudang, Stok, RiwayatStok
+from .models import Kategori, Supplier, Barang, Gudang, Stok, RiwayatStok, RekapPergerakanHarian, CheckpointStok, RiwayatStokArsip, Tugas
 
 # Custom Admin untuk Barang
 class BarangAdmin(admin.ModelAdmin):
@@ -19,10 +19,60 @@ class RiwayatStokAdmin(admin.ModelAdmin):
     list_filter = ('tipe', 'dibuat_pada', 'dibuat_oleh')
     search_fields = ('stok__barang__nama', 'catatan')
 
+# Custom Admin untuk RekapPergerakanHarian (diisi otomatis, hanya untuk dilihat)
+class RekapPergerakanHarianAdmin(admin.ModelAdmin):
+    list_display = ('tanggal', 'barang', 'gudang', 'tipe', 'total_jumlah', 'jumlah_transaksi')
+    list_filter = ('tipe', 'gudang', 'tanggal')
+    search_fields = ('barang__sku', 'barang__nama')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Custom Admin untuk CheckpointStok (dibuat oleh command buat_checkpoint_stok)
+class CheckpointStokAdmin(admin.ModelAdmin):
+    list_display = ('waktu', 'stok', 'jumlah', 'riwayat_terakhir')
+    list_filter = ('waktu',)
+    search_fields = ('stok__barang__sku', 'stok__barang__nama')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Custom Admin untuk RiwayatStokArsip (diisi command arsipkan_riwayat, hanya untuk dilihat)
+class RiwayatStokArsipAdmin(admin.ModelAdmin):
+    list_display = ('id', 'stok', 'tipe', 'jumlah', 'dibuat_oleh', 'dibuat_pada')
+    list_filter = ('tipe',)
+    date_hierarchy = 'dibuat_pada'
+    search_fields = ('stok__barang__nama',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Custom Admin untuk Tugas (dibuat lewat API, dijalankan command jalankan_tugas)
+class TugasAdmin(admin.ModelAdmin):
+    list_display = ('id', 'jenis', 'status', 'progres', 'percobaan', 'dibuat_oleh', 'dibuat_pada', 'selesai_pada')
+    list_filter = ('status', 'jenis')
+    readonly_fields = ('progres', 'pesan', 'hasil', 'error', 'percobaan', 'pekerja', 'detak', 'mulai_pada', 'selesai_pada')
+
+    def has_add_permission(self, request):
+        return False
+
 # Daftarkan semua model ke admin
 admin.site.register(Kategori)
 admin.site.register(Supplier)
 admin.site.register(Barang, BarangAdmin)
 admin.site.register(Gudang)
 admin.site.register(Stok, StokAdmin)
-admin.site.register(RiwayatStok, RiwayatStokAdmin)
\ No newline at end of file
+admin.site.register(RiwayatStok, RiwayatStokAdmin)
+admin.site.register(RekapPergerakanHarian, RekapPergerakanHarianAdmin)
+admin.site.register(CheckpointStok, CheckpointStokAdmin)
+admin.site.register(RiwayatStokArsip, RiwayatStokArsipAdmin)
+admin.site.register(Tugas, TugasAdmin)
@@ -2,10 +2,11 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     KategoriViewSet, SupplierViewSet, BarangViewSet,
-    GudangViewSet, StokViewSet, RiwayatStokViewSet
+    GudangViewSet, StokViewSet, RiwayatStokViewSet, TugasViewSet
 )
-from .views import current_user
-from .views import StokTransactionAPIView
+from .views import current_user, cache_stats, metrik_prometheus, tiket_stream
+from .realtime import stream_pergerakan
+from .views import StokTransactionAPIView, StokBulkTransactionAPIView, StokTransferAPIView, StatistikAPIView
 
 # Inisialisasi Router DRF
 router = DefaultRouter()
@@ -15,11 +16,19 @@ router.register(r'barang', BarangViewSet, basename='barang')
 router.register(r'gudang', GudangViewSet, basename='gudang')
 router.register(r'stok', StokViewSet, basename='stok')
 router.register(r'riwayat-stok', RiwayatStokViewSet, basename='riwayat-stok')
+router.register(r'tugas', TugasViewSet, basename='tugas')
 
 # URL API otomatis di-generate oleh Router
 urlpatterns = [
     # Place custom views before the router to avoid router treating 'transaction' as a pk
     path('stok/transaction/', StokTransactionAPIView.as_view(), name='stok-transaction'),
+    path('stok/transaction/bulk/', StokBulkTransactionAPIView.as_view(), name='stok-transaction-bulk'),
+    path('stok/transfer/', StokTransferAPIView.as_view(), name='stok-transfer'),
+    path('stok/stream/', stream_pergerakan, name='stok-stream'),
+    path('stok/stream/tiket/', tiket_stream, name='stok-stream-tiket'),
     path('', include(router.urls)),
     path('me/', current_user, name='current-user'),
+    path('stats/', StatistikAPIView.as_view(), name='statistik'),
+    path('cache/stats/', cache_stats, name='cache-stats'),
+    path('metrics/', metrik_prometheus, name='metrik'),
 ]
\ No newline at end of file
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class InventarisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'inventaris'
\ No newline at end of file
+    name = 'inventaris'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,161 @@
+"""Arsip riwayat stok: pisahkan riwayat lama dari tabel RiwayatStok yang aktif.
+
+`arsipkan(sebelum)` memindahkan riwayat yang `dibuat_pada`-nya lebih tua dari
+`sebelum` ke tabel `RiwayatStokArsip` per batch (INSERT ... SELECT lalu DELETE
+dalam satu transaksi, id asli dipertahankan). Pemindahan memakai SQL langsung
+sehingga signal RiwayatStok tidak terpicu: rekap harian, index pencarian dan
+stream real-time tidak berubah karena pergerakannya memang tidak berubah.
+
+Pembacaan gabungan memakai database view `inventaris_riwayatstok_semua`
+(model `RiwayatStokSemua`, UNION ALL kedua tabel). Query dengan filter rentang
+waktu diteruskan database ke index masing-masing tabel. Kode pembaca cukup
+memilih queryset lewat `riwayat_sejak(waktu)` (atau `net_per_stok` untuk
+total per stok): tabel arsip hanya ikut dibaca jika ada baris arsip yang jatuh
+di rentang tersebut.
+"""
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, When
+
+from . import checkpoint
+from .models import RekapPergerakanHarian, RiwayatStok, RiwayatStokArsip, RiwayatStokSemua, Stok
+
+RETENSI_HARI_DEFAULT = 365
+UKURAN_BATCH = 1000
+KOLOM = ('id', 'stok_id', 'tipe', 'jumlah', 'catatan', 'dibuat_oleh_id', 'dibuat_pada', 'kode_transfer')
+
+
+def retensi_hari():
+    return getattr(settings, 'INVENTARIS_RETENSI_RIWAYAT_HARI', RETENSI_HARI_DEFAULT)
+
+
+def ada_arsip_sejak(waktu, sampai=None):
+    """True jika ada riwayat terarsip dengan `waktu <= dibuat_pada < sampai` (None = tanpa batas)."""
+    qs = RiwayatStokArsip.objects.all()
+    if waktu is not None:
+        qs = qs.filter(dibuat_pada__gte=waktu)
+    if sampai is not None:
+        qs = qs.filter(dibuat_pada__lt=sampai)
+    return qs.exists()
+
+
+def riwayat_sejak(waktu):
+    """Queryset riwayat untuk pembacaan mulai `waktu`: tabel aktif saja, atau gabungan jika perlu."""
+    if ada_arsip_sejak(waktu):
+        return RiwayatStokSemua.objects.all()
+    return RiwayatStok.objects.all()
+
+
+def perlu_arsip(params):
+    """Apakah request list riwayat (query params) membutuhkan baris arsip.
+
+    Arsip ikut dibaca jika `?arsip=true`, atau jika rentang `dari`/`sampai`
+    (tanggal atau datetime ISO 8601, seperti filter riwayat) menjangkau waktu
+    yang sudah diarsipkan; `sampai` saja berarti rentang tanpa batas bawah.
+    Tanpa keduanya, list hanya berisi riwayat aktif (dalam jendela retensi).
+    """
+    if str(params.get('arsip', '')).lower() in ('1', 'true', 'ya'):
+        return True
+    if not params.get('dari') and not params.get('sampai'):
+        return False
+    try:
+        dari = checkpoint.parse_waktu(params['dari']) if params.get('dari') else None
+        sampai = checkpoint.parse_waktu(params['sampai'], akhir_hari=True) if params.get('sampai') else None
+    except ValueError:
+        # Ditolak dengan 400 oleh filter riwayat
+        return False
+    return ada_arsip_sejak(dari, sampai)
+
+
+def arsipkan(sebelum, ukuran_batch=UKURAN_BATCH, batas_batch=None):
+    """Pindahkan riwayat dengan `dibuat_pada < sebelum` ke arsip. Mengembalikan jumlah baris."""
+    koneksi = connections[router.db_for_write(RiwayatStok)]
+    qn = koneksi.ops.quote_name
+    kolom = ', '.join(qn(k) for k in KOLOM)
+    aktif, arsip = qn(RiwayatStok._meta.db_table), qn(RiwayatStokArsip._meta.db_table)
+    total = batch = 0
+    while batas_batch is None or batch < batas_batch:
+        ids = list(
+            RiwayatStok.objects.using(koneksi.alias).filter(dibuat_pada__lt=sebelum)
+            .order_by('dibuat_pada', 'id').values_list('id', flat=True)[:ukuran_batch]
+        )
+        if not ids:
+            break
+        tanda = ', '.join(['%s'] * len(ids))
+        # Diawali penulisan agar di SQLite kunci tulis diambil sebelum membaca baris yang dipindah
+        with transaction.atomic(using=koneksi.alias):
+            with koneksi.cursor() as cursor:
+                cursor.execute(f'INSERT INTO {arsip} ({kolom}) SELECT {kolom} FROM {aktif} WHERE {qn("id")} IN ({tanda})', ids)
+                cursor.execute(f'DELETE FROM {aktif} WHERE {qn("id")} IN ({tanda})', ids)
+        total += len(ids)
+        batch += 1
+    return total
+
+
+def net_per_stok(sejak, *args, **kwargs):
+    """Total IN - OUT per stok dari riwayat yang cocok dengan filter, mulai `sejak`.
+
+    Agregasi dijalankan per tabel (aktif, lalu arsip jika rentangnya perlu)
+    dan dijumlahkan di Python: GROUP BY langsung di atas view UNION ALL tidak
+    bisa memakai index dan selalu butuh tabel sementara.
+    """
+    tabel = (RiwayatStok, RiwayatStokArsip) if ada_arsip_sejak(sejak) else (RiwayatStok,)
+    hasil = {}
+    for model in tabel:
+        for stok_id, net in (
+            model.objects.filter(*args, **kwargs).order_by().values('stok_id').annotate(net=Sum(
+                Case(When(tipe='IN', then=F('jumlah')), default=-F('jumlah')),
+                output_field=IntegerField(),
+            )).values_list('stok_id', 'net')
+        ):
+            hasil[stok_id] = hasil.get(stok_id, 0) + net
+    return hasil
+
+
+def verifikasi(gudang=None):
+    """Cocokkan arsip + riwayat aktif dengan Stok.jumlah dan tabel rekap.
+
+    Mengembalikan dict berisi:
+      - `duplikat`: id yang ada di tabel aktif dan arsip sekaligus (harus 0);
+      - `rekap_selisih`: stok yang total IN-OUT di rekap harian (tidak disentuh
+        pengarsipan) berbeda dengan total riwayat aktif + arsip, artinya ada
+        riwayat yang hilang atau terduplikasi;
+      - `ledger_selisih`: stok yang `jumlah`-nya tidak sama dengan total IN-OUT
+        seluruh riwayatnya (mis. stok awal diisi tanpa riwayat).
+    Setiap daftar selisih berisi tuple (stok_id, nilai_a, nilai_b).
+    """
+    stok_qs = Stok.objects.all()
+    filter_stok = Q()
+    if gudang is not None:
+        stok_qs = stok_qs.filter(gudang_id=gudang)
+        filter_stok = Q(stok__gudang_id=gudang)
+
+    duplikat = list(
+        RiwayatStokArsip.objects.filter(filter_stok, id__in=RiwayatStok.objects.filter(filter_stok).values('id'))
+        .values_list('id', flat=True)[:100]
+    )
+    riwayat = net_per_stok(None, filter_stok)
+    rekap = dict(
+        RekapPergerakanHarian.objects.filter(**({'gudang_id': gudang} if gudang is not None else {}))
+        .order_by().values('stok_id').annotate(net=Sum(
+            Case(When(tipe='IN', then=F('total_jumlah')), default=-F('total_jumlah')),
+            output_field=IntegerField(),
+        )).values_list('stok_id', 'net')
+    )
+    rekap_selisih = [
+        (stok_id, rekap.get(stok_id, 0), riwayat.get(stok_id, 0))
+        for stok_id in sorted(rekap.keys() | riwayat.keys())
+        if rekap.get(stok_id, 0) != riwayat.get(stok_id, 0)
+    ]
+    ledger_selisih = [
+        (stok_id, jumlah, riwayat.get(stok_id, 0))
+        for stok_id, jumlah in stok_qs.order_by('id').values_list('id', 'jumlah').iterator()
+        if jumlah != riwayat.get(stok_id, 0)
+    ]
+    return {
+        'stok': stok_qs.count(),
+        'arsip': RiwayatStokArsip.objects.filter(filter_stok).count(),
+        'duplikat': duplikat,
+        'rekap_selisih': rekap_selisih,
+        'ledger_selisih': ledger_selisih,
+    }
@@ -0,0 +1,12 @@
+"""Kelas autentikasi API."""
+from rest_framework import authentication
+
+from . import metrics
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """TokenAuthentication DRF yang waktunya tercatat sebagai fase `auth` (lihat metrics.py)."""
+
+    def authenticate(self, request):
+        with metrics.ukur('auth'):
+            return super().authenticate(request)
@@ -0,0 +1,272 @@
+"""Cache response untuk endpoint data referensi (kategori, supplier, gudang).
+
+Data yang di-cache adalah `response.data` hasil serialisasi, sehingga cache hit
+tidak menjalankan query maupun serializer. Key cache terdiri dari nama view,
+versi model yang dipakai view, scope autentikasi, dan query params. Setiap
+`post_save`/`post_delete` pada model menaikkan versinya (lihat `signals.py`)
+sehingga entri lama otomatis tidak terpakai lagi.
+
+Konfigurasi lewat setting `INVENTARIS_RESPONSE_CACHE` (lihat `KONFIGURASI_DEFAULT`):
+  - BACKEND 'django' (default): memakai cache framework Django (`ALIAS` di
+    CACHES) untuk response dan versi model.
+  - BACKEND 'lokal': response disimpan di LRU memori proses (dibatasi jumlah
+    entri dan ukuran), versi model tetap di cache Django `ALIAS`.
+Kedua backend membuang entri setelah `TIMEOUT` detik. Versi model dinaikkan
+oleh proses yang menulis (worker `jalankan_tugas`, `import_barang`, ...), jadi
+jika API berjalan di beberapa proses, CACHES `ALIAS` harus backend bersama
+(Redis/Memcached/database) agar API melihat kenaikan versinya; dengan
+LocMemCache data referensi bisa basi paling lama `TIMEOUT` detik.
+
+Catatan: `QuerySet.update()` dan `bulk_create` tidak memicu signal; panggil
+`naikkan_versi(Model)` setelahnya jika dipakai pada model yang di-cache.
+"""
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+KONFIGURASI_DEFAULT = {
+    'AKTIF': True,
+    'BACKEND': 'django',
+    'MAKS_ENTRI': 512,
+    'MAKS_BYTE': 8 * 1024 * 1024,
+    'TIMEOUT': 300,
+    'ALIAS': 'default',
+    'PREFIX': 'inventaris:response',
+}
+
+
+def _ukuran(data):
+    """Perkiraan ukuran (byte) data hasil serialisasi, untuk batas memori LRU."""
+    if isinstance(data, dict):
+        return sys.getsizeof(data) + sum(_ukuran(k) + _ukuran(v) for k, v in data.items())
+    if isinstance(data, (list, tuple)):
+        return sys.getsizeof(data) + sum(_ukuran(v) for v in data)
+    return sys.getsizeof(data)
+
+
+class LRUCacheLokal:
+    """Cache LRU thread-safe di memori proses dengan batas entri, byte dan umur entri.
+
+    Versi model tidak disimpan di memori proses: `versi` dan `naikkan_versi`
+    diteruskan ke `DjangoCache`, sehingga kenaikan versi dari proses lain
+    (worker, management command) ikut terlihat.
+    """
+
+    def __init__(self, maks_entri, maks_byte, timeout, alias, prefix, **kwargs):
+        self.maks_entri = maks_entri
+        self.maks_byte = maks_byte
+        self.timeout = timeout
+        self._versi = DjangoCache(alias=alias, timeout=timeout, prefix=prefix)
+        self._data = OrderedDict()
+        self._byte = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entri = self._data.get(key)
+            if entri is None:
+                return None
+            if entri[2] is not None and entri[2] <= time.monotonic():
+                del self._data[key]
+                self._byte -= entri[1]
+                return None
+            self._data.move_to_end(key)
+            return entri[0]
+
+    def set(self, key, nilai):
+        ukuran = _ukuran(nilai)
+        if ukuran > self.maks_byte:
+            return
+        # TIMEOUT None berarti tanpa batas umur, seperti cache Django
+        kedaluwarsa = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            lama = self._data.pop(key, None)
+            if lama is not None:
+                self._byte -= lama[1]
+            self._data[key] = (nilai, ukuran, kedaluwarsa)
+            self._byte += ukuran
+            while len(self._data) > self.maks_entri or self._byte > self.maks_byte:
+                _, (_, ukuran_lama, _) = self._data.popitem(last=False)
+                self._byte -= ukuran_lama
+
+    def versi(self, label):
+        return self._versi.versi(label)
+
+    def naikkan_versi(self, label):
+        self._versi.naikkan_versi(label)
+
+    def info(self):
+        with self._lock:
+            return {'backend': 'lokal', 'entri': len(self._data), 'byte': self._byte,
+                    'maks_entri': self.maks_entri, 'maks_byte': self.maks_byte, 'timeout': self.timeout,
+                    'alias_versi': self._versi.alias}
+
+
+class DjangoCache:
+    """Adapter ke cache framework Django; versi model disimpan di cache yang sama."""
+
+    def __init__(self, alias, timeout, prefix, **kwargs):
+        self.cache = caches[alias]
+        self.alias = alias
+        self.timeout = timeout
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, nilai):
+        self.cache.set(key, nilai, self.timeout)
+
+    def versi(self, label):
+        return self.cache.get_or_set(f'{self.prefix}:versi:{label}', 0, None)
+
+    def naikkan_versi(self, label):
+        key = f'{self.prefix}:versi:{label}'
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Key belum ada / sudah dibuang backend
+            self.cache.add(key, 1, None)
+
+    def info(self):
+        return {'backend': 'django', 'alias': self.alias, 'timeout': self.timeout}
+
+
+class _Statistik:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hit = {}
+        self.miss = {}
+
+    def catat(self, nama, hit):
+        with self._lock:
+            tujuan = self.hit if hit else self.miss
+            tujuan[nama] = tujuan.get(nama, 0) + 1
+
+    def ringkasan(self):
+        with self._lock:
+            per_view = {
+                nama: {'hit': self.hit.get(nama, 0), 'miss': self.miss.get(nama, 0)}
+                for nama in sorted(set(self.hit) | set(self.miss))
+            }
+        return {
+            'hit': sum(v['hit'] for v in per_view.values()),
+            'miss': sum(v['miss'] for v in per_view.values()),
+            'per_view': per_view,
+        }
+
+
+statistik = _Statistik()
+_store = None
+
+
+def konfigurasi():
+    return {**KONFIGURASI_DEFAULT, **getattr(settings, 'INVENTARIS_RESPONSE_CACHE', {})}
+
+
+def store():
+    global _store
+    if _store is None:
+        conf = konfigurasi()
+        if conf['BACKEND'] == 'django':
+            _store = DjangoCache(alias=conf['ALIAS'], timeout=conf['TIMEOUT'], prefix=conf['PREFIX'])
+        else:
+            _store = LRUCacheLokal(maks_entri=conf['MAKS_ENTRI'], maks_byte=conf['MAKS_BYTE'],
+                                   timeout=conf['TIMEOUT'], alias=conf['ALIAS'], prefix=conf['PREFIX'])
+    return _store
+
+
+def reset():
+    """Buang store dan statistik (store baru dibuat ulang dari setting)."""
+    global _store
+    _store = None
+    statistik.reset()
+
+
+@receiver(setting_changed)
+def _setting_berubah(setting, **kwargs):
+    if setting == 'INVENTARIS_RESPONSE_CACHE':
+        reset()
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def naikkan_versi(model):
+    """Invalidasi semua response yang bergantung pada `model`.
+
+    Versi dinaikkan langsung dan sekali lagi setelah commit: request lain yang
+    sempat membaca data lama sebelum transaksi penulis commit tidak akan
+    menyimpan hasilnya di bawah versi terakhir.
+    """
+    label = _label(model)
+    store().naikkan_versi(label)
+    transaction.on_commit(lambda: store().naikkan_versi(label))
+
+
+def scope_auth(request):
+    """Scope autentikasi untuk key cache: response anonim, user biasa dan staff dipisah."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return 'anon'
+    return 'staff' if user.is_staff else 'user'
+
+
+def buat_key(nama, model_list, request, extra=''):
+    s = store()
+    versi = '.'.join(str(s.versi(_label(m))) for m in model_list)
+    params = sorted((k, v) for k in request.query_params for v in request.query_params.getlist(k))
+    # Host ikut masuk key karena link paginasi (next/previous) berupa URL absolut
+    mentah = f'{request.get_host()}|{params}|{extra}'
+    ringkas = hashlib.sha1(mentah.encode('utf-8')).hexdigest()
+    return f"{konfigurasi()['PREFIX']}:{nama}:{versi}:{scope_auth(request)}:{ringkas}"
+
+
+class ResponseCacheMixin:
+    """Mixin ViewSet: cache hasil `list` dan `retrieve`.
+
+    `cache_models` berisi model yang isinya memengaruhi response (default:
+    model dari queryset). Response membawa header `X-Cache: HIT|MISS`.
+    """
+    cache_models = None
+
+    def get_cache_models(self):
+        return self.cache_models or (self.queryset.model,)
+
+    def _dengan_cache(self, aksi, request, *args, **kwargs):
+        if not konfigurasi()['AKTIF']:
+            return aksi(request, *args, **kwargs)
+        nama = f'{self.basename}-{self.action}'
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')
+        key = buat_key(nama, self.get_cache_models(), request, extra=pk)
+        data = store().get(key)
+        if data is not None:
+            statistik.catat(nama, hit=True)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        statistik.catat(nama, hit=False)
+        response = aksi(request, *args, **kwargs)
+        if response.status_code == 200:
+            store().set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._dengan_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._dengan_cache(super().retrieve, request, *args, **kwargs)
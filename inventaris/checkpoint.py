@@ -0,0 +1,149 @@
+"""Jumlah stok pada waktu tertentu dari checkpoint berkala + RiwayatStok.
+
+`buat_checkpoint()` (dijalankan terjadwal lewat `python manage.py
+buat_checkpoint_stok`) menyalin jumlah seluruh stok ke `CheckpointStok` dalam
+satu `INSERT ... SELECT`, bersama id RiwayatStok terbesar saat itu. Stok
+berjumlah 0 tidak disalin: stok yang tidak ada di sebuah checkpoint dianggap 0.
+
+`level_pada(stok_list, waktu)` lalu menghitung jumlah stok tepat sebelum
+`waktu` dari checkpoint terdekat:
+
+  - checkpoint terakhir sebelum `waktu`: jumlah checkpoint + pergerakan
+    sesudah checkpoint dan sebelum `waktu`;
+  - jika belum ada, checkpoint pertama sesudah `waktu`: jumlah checkpoint -
+    pergerakan antara `waktu` dan checkpoint;
+  - jika belum ada checkpoint sama sekali: jumlah stok sekarang - pergerakan
+    sejak `waktu` (menelusuri log mundur seperti sebelumnya).
+
+Pergerakan yang dibaca hanya yang berada di antara `waktu` dan checkpoint, jadi
+biayanya dibatasi interval checkpoint, bukan panjang seluruh log. Perubahan
+`Stok.jumlah` tanpa RiwayatStok (edit langsung lewat API stok) tidak terlihat
+di antara dua checkpoint.
+
+Batas pergerakan yang sudah termasuk checkpoint adalah id riwayat, bukan
+timestamp: `dibuat_pada` diisi sebelum commit sehingga bisa sedikit lebih awal
+dari checkpoint walaupun belum ikut tersalin. Di SQLite penulis berjalan
+berurutan sehingga id ini tepat; di PostgreSQL jalankan checkpoint saat tidak
+ada transaksi stok yang panjang.
+"""
+import datetime
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import arsip
+from .models import CheckpointStok, RiwayatStok, RiwayatStokArsip, Stok
+
+# Batas atas selisih antara `dibuat_pada` sebuah riwayat dan commit-nya. Hanya
+# dipakai untuk membatasi rentang index; batas sebenarnya adalah id riwayat.
+TOLERANSI = datetime.timedelta(minutes=5)
+# Batas histori per stok dalam satu response
+MAKS_PERGERAKAN = 1000
+HARI_HISTORI_DEFAULT = 30
+
+
+def parse_waktu(teks, akhir_hari=False):
+    """Parse `YYYY-MM-DD` atau datetime ISO 8601 menjadi datetime aware.
+
+    Tanggal saja diartikan awal hari itu (zona waktu aktif), atau awal hari
+    berikutnya jika `akhir_hari` (untuk batas eksklusif "sampai akhir hari").
+    Melempar ValueError jika format tidak dikenali.
+    """
+    waktu = parse_datetime(teks)
+    if waktu is None:
+        tanggal = parse_date(teks)
+        if tanggal is None:
+            raise ValueError('Format waktu harus YYYY-MM-DD atau ISO 8601')
+        if akhir_hari:
+            tanggal += datetime.timedelta(days=1)
+        waktu = datetime.datetime.combine(tanggal, datetime.time.min)
+    if timezone.is_naive(waktu):
+        waktu = timezone.make_aware(waktu)
+    return waktu
+
+
+def buat_checkpoint(waktu=None):
+    """Simpan snapshot jumlah semua stok. Mengembalikan (jumlah baris, waktu)."""
+    waktu = waktu or timezone.now()
+    koneksi = connections[router.db_for_write(CheckpointStok)]
+    qn = koneksi.ops.quote_name
+    sql = (
+        'INSERT INTO {cp} ({stok_id}, {jumlah}, {waktu}, {riwayat}) '
+        'SELECT {id}, {jumlah}, %s, (SELECT COALESCE(MAX({id}), %s) FROM {rw}) '
+        'FROM {stok} WHERE {jumlah} > 0'
+    ).format(
+        cp=qn(CheckpointStok._meta.db_table), stok=qn(Stok._meta.db_table), rw=qn(RiwayatStok._meta.db_table),
+        stok_id=qn('stok_id'), jumlah=qn('jumlah'), waktu=qn('waktu'), riwayat=qn('riwayat_terakhir'), id=qn('id'),
+    )
+    # Jika semua riwayat sudah diarsipkan, id terakhir ada di tabel arsip
+    arsip_terakhir = RiwayatStokArsip.objects.aggregate(maks=Max('id'))['maks'] or 0
+    # Satu statement: snapshot stok dan id riwayat terakhir diambil bersamaan
+    with transaction.atomic(using=koneksi.alias), koneksi.cursor() as cursor:
+        cursor.execute(sql, [koneksi.ops.adapt_datetimefield_value(waktu), arsip_terakhir])
+        return cursor.rowcount, waktu
+
+
+def hapus_checkpoint_sebelum(waktu):
+    """Hapus checkpoint yang lebih tua dari `waktu`; query lama akan memakai checkpoint sesudahnya."""
+    return CheckpointStok.objects.filter(waktu__lt=waktu).delete()[0]
+
+
+def level_pada(stok_list, waktu):
+    """Jumlah stok tepat sebelum `waktu` untuk setiap objek Stok di `stok_list`.
+
+    Mengembalikan dict {stok_id: jumlah}. Jumlah query tetap (paling banyak
+    enam), tidak bergantung pada banyaknya stok.
+    """
+    stok_list = list(stok_list)
+    ids = [s.pk for s in stok_list]
+    if not ids:
+        return {}
+
+    def net(sejak, **filter):
+        # Tabel arsip hanya ikut dibaca jika rentangnya sudah diarsipkan
+        return arsip.net_per_stok(sejak, stok_id__in=ids, **filter)
+
+    sebelum = (CheckpointStok.objects.filter(waktu__lte=waktu).order_by('-waktu')
+               .values('waktu', 'riwayat_terakhir').first())
+    if sebelum:
+        dasar = _jumlah_checkpoint(sebelum['waktu'], ids)
+        awal = sebelum['waktu'] - TOLERANSI
+        selisih = net(awal, pk__gt=sebelum['riwayat_terakhir'], dibuat_pada__gte=awal, dibuat_pada__lt=waktu)
+        return {i: dasar.get(i, 0) + selisih.get(i, 0) for i in ids}
+
+    sesudah = (CheckpointStok.objects.filter(waktu__gt=waktu).order_by('waktu')
+               .values('waktu', 'riwayat_terakhir').first())
+    if sesudah:
+        dasar = _jumlah_checkpoint(sesudah['waktu'], ids)
+        selisih = net(waktu, pk__lte=sesudah['riwayat_terakhir'],
+                      dibuat_pada__gte=waktu, dibuat_pada__lt=sesudah['waktu'] + TOLERANSI)
+        return {i: dasar.get(i, 0) - selisih.get(i, 0) for i in ids}
+
+    selisih = net(waktu, dibuat_pada__gte=waktu)
+    return {s.pk: s.jumlah - selisih.get(s.pk, 0) for s in stok_list}
+
+
+def _jumlah_checkpoint(waktu, ids):
+    return dict(CheckpointStok.objects.filter(waktu=waktu, stok_id__in=ids).values_list('stok_id', 'jumlah'))
+
+
+def histori(stok, dari, sampai, batas):
+    """Pergerakan satu stok di [dari, sampai) beserta saldo setelah setiap pergerakan.
+
+    Mengembalikan (saldo_awal, list riwayat dengan atribut `saldo`, terpotong).
+    Maksimal `batas` pergerakan; `terpotong` True jika masih ada sisanya.
+    """
+    saldo = level_pada([stok], dari)[stok.pk]
+    saldo_awal = saldo
+    riwayat = list(
+        arsip.riwayat_sejak(dari).filter(stok=stok, dibuat_pada__gte=dari, dibuat_pada__lt=sampai)
+        .select_related('dibuat_oleh').order_by('dibuat_pada', 'id')[:batas + 1]
+    )
+    terpotong = len(riwayat) > batas
+    riwayat = riwayat[:batas]
+    for r in riwayat:
+        saldo += r.jumlah if r.tipe == 'IN' else -r.jumlah
+        r.saldo = saldo
+    return saldo_awal, riwayat, terpotong
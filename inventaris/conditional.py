@@ -0,0 +1,198 @@
+"""Conditional request (ETag/Last-Modified) untuk API Barang dan Stok.
+
+Validator dihitung murah dari kolom `diperbarui_pada`, tanpa serialisasi:
+  - detail: id + `diperbarui_pada` objek dan setiap relasi yang ikut
+    diserialisasi (`kategori_nama`, `gudang_nama`, objek `?expand=`, lihat
+    `kolom_waktu`);
+  - list (paginasi halaman): COUNT dan MAX timestamp queryset terfilter, ditambah
+    query string. Query agregat ini sekaligus menggantikan COUNT paginator,
+    sehingga jumlah query list tidak bertambah.
+
+GET dengan `If-None-Match`/`If-Modified-Since` yang cocok dijawab 304. PUT,
+PATCH dan DELETE dengan `If-Match` yang tidak cocok dijawab 412; pemeriksaan
+dan penulisan terjadi dalam satu transaksi dengan baris terkunci.
+"""
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.response import Response
+
+KOLOM_WAKTU = 'diperbarui_pada'
+
+_kolom_waktu = {}
+
+
+def _etag(*bagian):
+    return '"%s"' % hashlib.sha1('|'.join(str(b) for b in bagian).encode('utf-8')).hexdigest()[:32]
+
+
+def _ambil(obj, path):
+    for nama in path.split('__'):
+        obj = getattr(obj, nama, None) if obj is not None else None
+    return obj
+
+
+def _detik(waktu):
+    return timegm(waktu.utctimetuple()) if waktu else None
+
+
+def _tambah_waktu(model, prefix, kolom):
+    try:
+        model._meta.get_field(KOLOM_WAKTU)
+    except FieldDoesNotExist:
+        return
+    if prefix + KOLOM_WAKTU not in kolom:
+        kolom.append(prefix + KOLOM_WAKTU)
+
+
+def _kumpulkan_waktu(serializer, model, prefix, kolom):
+    _tambah_waktu(model, prefix, kolom)
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        bersarang = isinstance(field, serializers.BaseSerializer)
+        # Relasi yang dilewati source (`kategori.nama`), termasuk relasi serializer bersarang
+        relasi = field.source_attrs if bersarang else field.source_attrs[:-1]
+        model_field, path = model, prefix
+        for attr in relasi:
+            try:
+                relasi_field = model_field._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not relasi_field.is_relation or relasi_field.many_to_many:
+                break
+            model_field, path = relasi_field.related_model, f'{path}{attr}__'
+            _tambah_waktu(model_field, path, kolom)
+        else:
+            if bersarang and not isinstance(field, serializers.ListSerializer):
+                _kumpulkan_waktu(field, model_field, path, kolom)
+
+
+def kolom_waktu(serializer_class, rencana=None):
+    """Path timestamp (`diperbarui_pada`) semua model yang isinya ikut diserialisasi.
+
+    Mis. StokSerializer -> diperbarui_pada, barang__diperbarui_pada,
+    gudang__diperbarui_pada; dengan `?expand=barang` ditambah kategori dan
+    supplier barang. Di-cache per serializer dan rencana fieldset.
+    """
+    kunci = (serializer_class, rencana.kunci if rencana is not None else None)
+    if kunci not in _kolom_waktu:
+        serializer = serializer_class(rencana=rencana) if rencana is not None else serializer_class()
+        kolom = []
+        _kumpulkan_waktu(serializer, serializer_class.Meta.model, '', kolom)
+        _kolom_waktu[kunci] = tuple(kolom)
+    return _kolom_waktu[kunci]
+
+
+class ConditionalMixin:
+    """Mixin ViewSet untuk ETag, Last-Modified, 304 dan If-Match (412).
+
+    Path timestamp yang memengaruhi isi response diturunkan dari serializer
+    (lihat `kolom_waktu`), jadi mengganti nama barang, kategori, supplier
+    atau gudang ikut mengubah ETag list dan detail. `etag_kolom_waktu` bisa
+    diisi untuk menimpanya.
+    """
+    etag_kolom_waktu = None
+
+    def kolom_etag(self):
+        if self.etag_kolom_waktu is not None:
+            return tuple(self.etag_kolom_waktu)
+        rencana = self.rencana_fieldset() if hasattr(self, 'rencana_fieldset') else None
+        return kolom_waktu(self.get_serializer_class(), rencana)
+
+    # ---------- validator ----------
+    def etag_objek(self, obj):
+        waktu = [_ambil(obj, kolom) for kolom in self.kolom_etag()]
+        terakhir = max((w for w in waktu if w), default=None)
+        return _etag(obj.pk, *[w.isoformat() if w else '' for w in waktu]), _detik(terakhir)
+
+    def etag_list(self, queryset):
+        kolom_etag = self.kolom_etag()
+        agregat = queryset.order_by().aggregate(
+            jumlah=Count('pk'),
+            **{f'maks_{i}': Max(kolom) for i, kolom in enumerate(kolom_etag)},
+        )
+        waktu = [agregat[f'maks_{i}'] for i in range(len(kolom_etag))]
+        terakhir = max((w for w in waktu if w), default=None)
+        etag = _etag(agregat['jumlah'], *[w.isoformat() if w else '' for w in waktu],
+                     self.request.get_full_path())
+        return etag, _detik(terakhir), agregat['jumlah']
+
+    @staticmethod
+    def pasang_header(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Browser boleh menyimpan, tapi wajib validasi ulang (304) setiap kali dipakai
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _pakai_etag_list(self):
+        # Mode cursor dan ?count= selain exact sengaja dilewati: agregat COUNT/MAX
+        # atas seluruh hasil filter justru biaya yang ingin dihindari.
+        paginator = self.paginator
+        return (paginator is not None and hasattr(paginator, 'jumlah_diketahui')
+                and paginator.pakai_count_exact(self.request, self))
+
+    # ---------- GET ----------
+    def list(self, request, *args, **kwargs):
+        if not self._pakai_etag_list():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified, jumlah = self.etag_list(queryset)
+        bersyarat = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if bersyarat is not None:
+            return self.pasang_header(bersyarat, etag, last_modified)
+        # COUNT sudah diketahui dari agregat di atas; paginator tidak perlu query lagi
+        self.paginator.jumlah_diketahui = jumlah
+        response = super().list(request, *args, **kwargs)
+        return self.pasang_header(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.get_object()
+        etag, last_modified = self.etag_objek(obj)
+        bersyarat = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if bersyarat is not None:
+            return self.pasang_header(bersyarat, etag, last_modified)
+        response = Response(self.get_serializer(obj).data)
+        return self.pasang_header(response, etag, last_modified)
+
+    # ---------- If-Match pada penulisan ----------
+    def get_object(self):
+        obj = getattr(self, '_objek_terkunci', None)
+        if obj is None:
+            obj = super().get_object()
+        self._objek_terakhir = obj
+        return obj
+
+    def _tulis_bersyarat(self, aksi, request, *args, **kwargs):
+        if 'HTTP_IF_MATCH' not in request.META and 'HTTP_IF_UNMODIFIED_SINCE' not in request.META:
+            response = aksi(request, *args, **kwargs)
+            if response.status_code == 200 and request.method != 'DELETE':
+                self.pasang_header(response, *self.etag_objek(self._objek_terakhir))
+            return response
+        with transaction.atomic():
+            # Kunci baris agar tidak ada penulis lain di antara pemeriksaan ETag dan UPDATE
+            self.queryset = self.queryset.select_for_update(of=('self',))
+            obj = super().get_object()
+            etag, last_modified = self.etag_objek(obj)
+            gagal = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if gagal is not None:
+                return self.pasang_header(gagal, etag, last_modified)
+            self._objek_terkunci = obj
+            response = aksi(request, *args, **kwargs)
+        if response.status_code == 200 and request.method != 'DELETE':
+            self.pasang_header(response, *self.etag_objek(obj))
+        return response
+
+    def update(self, request, *args, **kwargs):
+        return self._tulis_bersyarat(super().update, request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        return self._tulis_bersyarat(super().destroy, request, *args, **kwargs)
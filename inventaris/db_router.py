@@ -0,0 +1,178 @@
+"""Routing database: baca dari replica, tulis ke primary (`default`).
+
+Replica didaftarkan di `settings.INVENTARIS_DATABASE_REPLICAS` (alias di
+DATABASES). Keputusan dibuat per request oleh `ReplicaRoutingMiddleware`:
+
+  - request GET/HEAD/OPTIONS boleh membaca dari replica (satu replica dipilih
+    acak per request, sehingga satu request melihat snapshot yang konsisten);
+  - request lain (POST/PUT/PATCH/DELETE) memakai primary untuk semua query, dan
+    klien tersebut "lengket" ke primary selama `INVENTARIS_REPLICA_JENDELA_LENGKET`
+    detik agar langsung melihat tulisannya sendiri (read-your-writes) walaupun
+    replica masih tertinggal;
+  - view/aksi yang harus membaca data terbaru bisa memaksa primary dengan
+    atribut `baca_dari_primary` (True, atau daftar nama aksi ViewSet);
+  - kode lain bisa memakai context manager `pakai_primary()`.
+
+Di luar request (management command, shell), di dalam `transaction.atomic()`
+pada primary, dan untuk model autentikasi (`APP_SELALU_PRIMARY`), query baca
+selalu ke primary.
+
+Penanda lengket disimpan di cache Django (key = hash header Authorization, atau
+session/IP untuk klien tanpa token). Jika server berjalan multi-proses, pakai
+backend cache bersama (Redis/Memcached/database) agar penandanya terlihat oleh
+semua proses. Middleware ini hybrid: di bawah ASGI ia berjalan sebagai coroutine
+(cache dibaca lewat `cache.aget`), tanpa thread sync_to_async tambahan.
+"""
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Lookup autentikasi selalu ke primary: token yang baru dibuat saat login belum
+# tentu sudah tereplikasi, dan lookup-nya hanya query primary key yang ringan.
+APP_SELALU_PRIMARY = ('auth', 'authtoken', 'sessions')
+JENDELA_LENGKET_DEFAULT = 10
+
+# Alias replica untuk request yang sedang berjalan; None = pakai primary
+_replica = contextvars.ContextVar('inventaris_replica', default=None)
+
+
+def daftar_replica():
+    return list(getattr(settings, 'INVENTARIS_DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def pakai_primary():
+    """Paksa semua query baca di dalam blok ini ke primary."""
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or model._meta.app_label in APP_SELALU_PRIMARY or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary dan replica berisi data yang sama
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replica mendapat skema lewat replikasi dari primary
+        return db not in daftar_replica()
+
+
+def _kunci_klien(request):
+    identitas = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return 'inventaris:primary-lengket:' + hashlib.sha256(identitas.encode('utf-8')).hexdigest()
+
+
+def _view_minta_primary(request, view_func):
+    cls = getattr(view_func, 'cls', None)
+    nilai = getattr(cls, 'baca_dari_primary', False)
+    if isinstance(nilai, bool):
+        return nilai
+    # ViewSet: `actions` memetakan method HTTP ke nama aksi (list, retrieve, ...)
+    aksi = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+    return aksi in nilai
+
+
+def _alirkan_dengan(isi, alias):
+    # Set/unset di sekitar setiap next(): iterasi bisa berpindah thread/context
+    # (mis. di ASGI), jadi tidak memakai token reset.
+    iterator = iter(isi)
+    while True:
+        _replica.set(alias)
+        try:
+            bagian = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _replica.set(None)
+        yield bagian
+
+
+def _jendela_lengket():
+    return getattr(settings, 'INVENTARIS_REPLICA_JENDELA_LENGKET', JENDELA_LENGKET_DEFAULT)
+
+
+def _bawa_replica(response):
+    # Query export streaming baru berjalan saat isinya dialirkan, setelah
+    # middleware selesai; pilihan database ikut dibawa ke iterasinya.
+    aktif = _replica.get()
+    if aktif is not None and response.streaming and not getattr(response, 'is_async', False):
+        response.streaming_content = _alirkan_dengan(response.streaming_content, aktif)
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        replica = daftar_replica()
+        if not replica:
+            return self.get_response(request)
+
+        kunci = _kunci_klien(request)
+        pilihan = None
+        if request.method in SAFE_METHODS and not cache.get(kunci):
+            pilihan = random.choice(replica)
+        token = _replica.set(pilihan)
+        try:
+            response = self.get_response(request)
+            _bawa_replica(response)
+        finally:
+            _replica.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            cache.set(kunci, True, _jendela_lengket())
+        return response
+
+    async def __acall__(self, request):
+        replica = daftar_replica()
+        if not replica:
+            return await self.get_response(request)
+
+        kunci = _kunci_klien(request)
+        pilihan = None
+        if request.method in SAFE_METHODS and not await cache.aget(kunci):
+            pilihan = random.choice(replica)
+        token = _replica.set(pilihan)
+        try:
+            response = await self.get_response(request)
+            _bawa_replica(response)
+        finally:
+            _replica.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            await cache.aset(kunci, True, _jendela_lengket())
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if _replica.get() is not None and _view_minta_primary(request, view_func):
+            _replica.set(None)
@@ -0,0 +1,247 @@
+"""Ekspor stok dan riwayat stok secara streaming (CSV / XLSX).
+
+Data dibaca langsung dari queryset `.values_list().iterator()` per chunk dan
+langsung ditulis ke response, jadi memori server tetap konstan berapapun
+jumlah barisnya dan byte pertama terkirim tanpa menunggu seluruh data.
+"""
+import csv
+import datetime
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+UKURAN_CHUNK = 2000
+# Jumlah baris CSV yang dikumpulkan sebelum dikirim sebagai satu potongan response
+BARIS_PER_POTONGAN = 500
+# Ukuran buffer XLSX (byte terkompresi) sebelum dikirim ke klien
+UKURAN_BUFFER_XLSX = 64 * 1024
+
+# Kolom mengikuti format yang sebelumnya dibuat oleh frontend (app.js)
+KOLOM_STOK = [
+    ('ID', 'id'),
+    ('Barang', 'barang__nama'),
+    ('SKU', 'barang__sku'),
+    ('Kategori', 'barang__kategori__nama'),
+    ('Gudang', 'gudang__nama'),
+    ('Jumlah', 'jumlah'),
+    ('Level Reorder', 'level_reorder'),
+    ('Satuan', 'barang__satuan'),
+    ('Diperbarui Pada', 'diperbarui_pada'),
+]
+
+KOLOM_RIWAYAT = [
+    ('ID', 'id'),
+    ('StokID', 'stok_id'),
+    ('Barang', 'stok__barang__nama'),
+    ('Tipe', 'tipe'),
+    ('Jumlah', 'jumlah'),
+    ('Catatan', 'catatan'),
+    ('DibuatPada', 'dibuat_pada'),
+    ('DibuatOleh', 'dibuat_oleh__username'),
+    ('KodeTransfer', 'kode_transfer'),
+]
+
+# Karakter kontrol yang tidak valid di dalam XML
+_KARAKTER_ILEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _format_nilai(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat()
+    return value
+
+
+def iter_baris(queryset, kolom):
+    """Iterasi baris (tuple) dari queryset tanpa membuat instance model."""
+    fields = [field for _, field in kolom]
+    for row in queryset.values_list(*fields).iterator(chunk_size=UKURAN_CHUNK):
+        yield [_format_nilai(v) for v in row]
+
+
+class _Echo:
+    """Objek file semu: csv.writer langsung mengembalikan baris yang ditulis."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    potongan = [writer.writerow(header)]
+    for row in rows:
+        potongan.append(writer.writerow(row))
+        if len(potongan) >= BARIS_PER_POTONGAN:
+            yield ''.join(potongan)
+            potongan = []
+    if potongan:
+        yield ''.join(potongan)
+
+
+class _BufferTulis(io.RawIOBase):
+    """Buffer tulis-saja (tidak bisa seek) untuk ZipFile.
+
+    ZipFile otomatis memakai data descriptor ketika file tujuan tidak bisa
+    di-seek, sehingga isi arsip bisa dikirim sepotong-sepotong.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._potongan = []
+        self._ukuran = 0
+        self._posisi = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        self._potongan.append(data)
+        self._ukuran += len(data)
+        self._posisi += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._posisi
+
+    @property
+    def ukuran(self):
+        return self._ukuran
+
+    def ambil(self):
+        data = b''.join(self._potongan)
+        self._potongan = []
+        self._ukuran = 0
+        return data
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '</styleSheet>'
+)
+_SHEET_AWAL = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_AKHIR = b'</sheetData></worksheet>'
+
+
+def _sel_xml(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        teks = escape(_KARAKTER_ILEGAL.sub('', str(value)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{teks}</t></is></c>'
+    return f'<c><v>{value}</v></c>'
+
+
+def _baris_xml(row):
+    return ('<row>' + ''.join(_sel_xml(v) for v in row) + '</row>').encode('utf-8')
+
+
+def stream_xlsx(sheets):
+    """Tulis workbook XLSX secara streaming.
+
+    `sheets` adalah list `(nama_sheet, header, rows)`; `rows` boleh berupa
+    generator. Memakai inline string sehingga tidak perlu menyimpan tabel
+    shared strings di memori.
+    """
+    buf = _BufferTulis()
+    with zipfile.ZipFile(buf, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        nomor = range(1, len(sheets) + 1)
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES.format(sheets=''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in nomor
+        )))
+        zf.writestr('_rels/.rels', _ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name="{escape(nama)}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, (nama, _, _) in zip(nomor, sheets)
+        )))
+        zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(sheets=''.join(
+            f'<Relationship Id="rId{i}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>'
+            for i in nomor
+        )))
+        zf.writestr('xl/styles.xml', _STYLES)
+        yield buf.ambil()
+
+        for i, (_, header, rows) in zip(nomor, sheets):
+            with zf.open(f'xl/worksheets/sheet{i}.xml', mode='w') as f:
+                f.write(_SHEET_AWAL)
+                f.write(_baris_xml(header))
+                for row in rows:
+                    f.write(_baris_xml(row))
+                    if buf.ukuran >= UKURAN_BUFFER_XLSX:
+                        yield buf.ambil()
+                f.write(_SHEET_AKHIR)
+            yield buf.ambil()
+    # Central directory ditulis saat ZipFile ditutup
+    yield buf.ambil()
+
+
+def nama_file(prefix, ekstensi):
+    return f'{prefix}_{timezone.localdate().isoformat()}.{ekstensi}'
+
+
+def response_csv(queryset, kolom, prefix):
+    header = [judul for judul, _ in kolom]
+    response = StreamingHttpResponse(
+        stream_csv(header, iter_baris(queryset, kolom)),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nama_file(prefix, "csv")}"'
+    return response
+
+
+def response_xlsx(sheets, prefix):
+    """`sheets` berisi `(nama_sheet, queryset, kolom)`."""
+    response = StreamingHttpResponse(
+        stream_xlsx([
+            (nama, [judul for judul, _ in kolom], iter_baris(queryset, kolom))
+            for nama, queryset, kolom in sheets
+        ]),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nama_file(prefix, "xlsx")}"'
+    return response
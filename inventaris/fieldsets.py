@@ -0,0 +1,195 @@
+"""Sparse fieldset (`?fields=`) dan ekspansi relasi (`?expand=`) untuk API.
+
+`?fields=id,jumlah,gudang_nama` membatasi field response; `?expand=barang,gudang`
+mengganti id relasi dengan objek bersarang (serializer di `Meta.ekspansi`).
+Nama expand yang bukan relasi di level atas diteruskan ke relasi yang
+diekspansi, jadi `/stok/?expand=barang,kategori` juga mengekspansi
+`barang.kategori`; bentuk bertitik (`expand=barang.kategori`,
+`fields=barang.nama`) menunjuk level tertentu secara eksplisit.
+
+Pilihan ini sekaligus menentukan query: relasi yang dibutuhkan di-JOIN lewat
+`select_related` dan kolom yang diambil dibatasi dengan `only()`, sehingga
+jumlah query list tetap sama berapapun relasi yang diekspansi. ViewSet
+mengaktifkannya lewat `FieldsetMixin`.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .serializer_cepat import TidakDidukung, path_model
+
+_nama_field = {}
+
+
+def _pisah(nilai):
+    return [bagian.strip() for bagian in (nilai or '').split(',') if bagian.strip()]
+
+
+def nama_field(serializer_class):
+    """Nama field serializer (tanpa ekspansi), di-cache per kelas."""
+    if serializer_class not in _nama_field:
+        _nama_field[serializer_class] = tuple(serializer_class().fields)
+    return _nama_field[serializer_class]
+
+
+class Rencana:
+    """Field dan relasi yang diekspansi untuk satu serializer; `expand` berisi Rencana anak."""
+
+    def __init__(self, serializer_class, fields=None, expand=None):
+        self.serializer_class = serializer_class
+        self.fields = fields
+        self.expand = expand or {}
+
+    @property
+    def kunci(self):
+        """Representasi hashable (dipakai sebagai key cache serializer terkompilasi)."""
+        fields = tuple(sorted(self.fields)) if self.fields is not None else None
+        return (self.serializer_class, fields, tuple(sorted((nama, anak.kunci) for nama, anak in self.expand.items())))
+
+
+def _rencana(serializer_class, fields, expand):
+    """(Rencana, nama expand yang tidak dikenal, field yang tidak dikenal) untuk satu level."""
+    relasi = serializer_class.relasi_ekspansi() if hasattr(serializer_class, 'relasi_ekspansi') else {}
+    expand_anak, diteruskan = {}, []
+    for path in expand:
+        kepala, _, ekor = path.partition('.')
+        if kepala in relasi:
+            expand_anak.setdefault(kepala, [])
+            if ekor:
+                expand_anak[kepala].append(ekor)
+        elif ekor:
+            return None, {path}, set()
+        else:
+            diteruskan.append(path)
+
+    fields_atas, fields_anak, salah = None, {}, set()
+    if fields is not None:
+        fields_atas = set()
+        for path in fields:
+            kepala, _, ekor = path.partition('.')
+            if ekor:
+                if kepala not in expand_anak:
+                    salah.add(path)
+                fields_anak.setdefault(kepala, []).append(ekor)
+            elif kepala in nama_field(serializer_class):
+                fields_atas.add(kepala)
+            else:
+                salah.add(path)
+        # Relasi yang diekspansi selalu ikut, walau tidak disebut di ?fields=
+        fields_atas.update(expand_anak)
+
+    anak, belum_diteruskan, tidak_dikenal = {}, set(diteruskan), set()
+    for nama, ekor in expand_anak.items():
+        rencana_anak, belum, salah_anak = _rencana(relasi[nama], fields_anak.get(nama), ekor + diteruskan)
+        if rencana_anak is None:
+            return None, {f'{nama}.{b}' for b in belum}, set()
+        anak[nama] = rencana_anak
+        # Nama yang diteruskan cukup dikenal oleh salah satu relasi
+        belum_diteruskan &= belum
+        tidak_dikenal.update(f'{nama}.{b}' for b in belum if b not in diteruskan)
+        salah.update(f'{nama}.{s}' for s in salah_anak)
+    return Rencana(serializer_class, fields_atas, anak), tidak_dikenal | belum_diteruskan, salah
+
+
+def buat_rencana(serializer_class, fields=None, expand=None):
+    """Rencana dari nilai mentah `?fields=` dan `?expand=`; None jika keduanya kosong.
+
+    Nama yang tidak dikenal menghasilkan ValidationError (400).
+    """
+    if not fields and not expand:
+        return None
+    rencana, tidak_dikenal, salah = _rencana(
+        serializer_class, _pisah(fields) if fields else None, _pisah(expand))
+    errors = {}
+    if tidak_dikenal:
+        errors['expand'] = [f'Relasi tidak bisa diekspansi: {", ".join(sorted(tidak_dikenal))}']
+    if salah:
+        errors['fields'] = [f'Field tidak dikenal: {", ".join(sorted(salah))}']
+    if errors:
+        raise ValidationError(errors)
+    return rencana
+
+
+def _kumpulkan(serializer, model, prefix, only, related):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer):
+                raise TidakDidukung(field.field_name)
+            lookup, _, field_model = path_model(model, field.source_attrs)
+            if not field_model.is_relation:
+                raise TidakDidukung(field.field_name)
+            related.add(prefix + lookup)
+            only.add(prefix + lookup)
+            _kumpulkan(field, field_model.related_model, f'{prefix}{lookup}__', only, related)
+            continue
+        if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, serializers.ManyRelatedField)):
+            raise TidakDidukung(field.field_name)
+        _tambah_path(model, field.source_attrs, prefix, only, related)
+
+
+def _tambah_path(model, source_attrs, prefix, only, related):
+    lookup, _, _ = path_model(model, source_attrs)
+    bagian = lookup.split('__')
+    for i in range(1, len(bagian)):
+        relasi = prefix + '__'.join(bagian[:i])
+        related.add(relasi)
+        only.add(relasi)
+    only.add(prefix + lookup)
+
+
+def optimasi(queryset, rencana, kolom_wajib=()):
+    """Batasi JOIN dan kolom `queryset` ke yang dibutuhkan `rencana`.
+
+    `kolom_wajib` (path `__`, mis. kolom ETag atau cursor) selalu ikut diambil.
+    Jika ada field yang sumbernya tidak bisa dipetakan ke kolom model,
+    queryset dikembalikan apa adanya.
+    """
+    only, related = set(), set()
+    try:
+        _kumpulkan(rencana.serializer_class(rencana=rencana), queryset.model, '', only, related)
+        for path in kolom_wajib:
+            _tambah_path(queryset.model, path.split('__'), '', only, related)
+    except TidakDidukung:
+        return queryset
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(only))
+
+
+class FieldsetMixin:
+    """Mixin ViewSet: `?fields=` dan `?expand=` untuk aksi baca di `fieldset_aksi`."""
+    fieldset_aksi = ('list', 'retrieve')
+
+    def rencana_fieldset(self):
+        if not hasattr(self, '_rencana_fieldset'):
+            request = getattr(self, 'request', None)
+            self._rencana_fieldset = None
+            if request is not None and getattr(self, 'action', None) in self.fieldset_aksi:
+                self._rencana_fieldset = buat_rencana(
+                    self.get_serializer_class(),
+                    request.query_params.get('fields'),
+                    request.query_params.get('expand'),
+                )
+        return self._rencana_fieldset
+
+    def kolom_wajib(self):
+        """Kolom yang dibaca view di luar serializer: timestamp ETag dan kolom cursor."""
+        kolom = tuple(self.kolom_etag()) if hasattr(self, 'kolom_etag') else ()
+        if getattr(self, 'keyset_field', None):
+            kolom += (self.keyset_field,)
+        return kolom
+
+    def get_serializer(self, *args, **kwargs):
+        rencana = self.rencana_fieldset()
+        if rencana is not None:
+            kwargs.setdefault('rencana', rencana)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        rencana = self.rencana_fieldset()
+        if rencana is not None:
+            queryset = optimasi(queryset, rencana, self.kolom_wajib())
+        return queryset
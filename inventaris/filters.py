@@ -0,0 +1,59 @@
+from django import forms
+from django_filters import rest_framework as filters
+
+from .checkpoint import parse_waktu
+from .models import RiwayatStok, RiwayatStokSemua
+
+
+class WaktuField(forms.Field):
+    """`YYYY-MM-DD` atau datetime ISO 8601 (lihat `checkpoint.parse_waktu`)."""
+
+    def __init__(self, *args, akhir_hari=False, **kwargs):
+        self.akhir_hari = akhir_hari
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return parse_waktu(str(value).strip(), akhir_hari=self.akhir_hari)
+        except ValueError as e:
+            raise forms.ValidationError(str(e), code='invalid')
+
+
+class WaktuFilter(filters.Filter):
+    field_class = WaktuField
+
+
+class RiwayatStokFilter(filters.FilterSet):
+    """Filter riwayat stok.
+
+    Nama parameter dibuat sama dengan filter di endpoint stok (`gudang`,
+    `barang__kategori`) supaya query string yang sama bisa dipakai untuk
+    keduanya. Rentang waktu memakai `dari` dan `sampai`: tanggal YYYY-MM-DD
+    (keduanya inklusif) atau datetime ISO 8601 (`sampai` eksklusif).
+    """
+    gudang = filters.NumberFilter(field_name='stok__gudang')
+    barang__kategori = filters.NumberFilter(field_name='stok__barang__kategori')
+    dari = WaktuFilter(method='filter_dari')
+    # Tanggal saja diartikan awal hari berikutnya, jadi `lt` tetap inklusif untuk hari itu
+    sampai = WaktuFilter(method='filter_sampai', akhir_hari=True)
+
+    class Meta:
+        model = RiwayatStok
+        fields = ['tipe', 'dibuat_oleh', 'gudang', 'barang__kategori', 'dari', 'sampai', 'kode_transfer']
+
+    def filter_dari(self, queryset, name, value):
+        return queryset.filter(dibuat_pada__gte=value)
+
+    def filter_sampai(self, queryset, name, value):
+        # Rentang ke atas dibuat eksklusif agar tetap bisa memakai index pada
+        # dibuat_pada (tanpa fungsi __date).
+        return queryset.filter(dibuat_pada__lt=value)
+
+
+class RiwayatStokSemuaFilter(RiwayatStokFilter):
+    """Filter yang sama untuk gabungan riwayat aktif + arsip (lihat `arsip.py`)."""
+
+    class Meta(RiwayatStokFilter.Meta):
+        model = RiwayatStokSemua
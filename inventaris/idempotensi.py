@@ -0,0 +1,165 @@
+"""Header `Idempotency-Key` untuk endpoint transaksi stok.
+
+Klien yang request-nya timeout tidak tahu apakah pergerakan stoknya sudah
+tercatat. Dengan mengirim `Idempotency-Key: <uuid>` yang sama pada setiap
+percobaan, request ulang mendapat response asli (header `Idempotent-Replayed:
+true`) tanpa menyentuh Stok lagi.
+
+Cara kerja dekorator `idempoten` (dipasang pada method view):
+  - Key yang sudah tersimpan dan belum kedaluwarsa langsung di-replay dengan
+    satu query, sebelum transaksi apapun dibuka.
+  - Jika belum ada, baris `KunciIdempotensi` di-INSERT sebagai statement
+    pertama transaksi, view dijalankan di transaksi yang sama, lalu response
+    2xx/4xx-nya disimpan ke baris itu. Pergerakan stok dan response tersimpan
+    commit (atau batal) bersamaan.
+  - Request duplikat yang datang bersamaan tertahan di unique constraint
+    (pengguna, kunci) sampai transaksi pertama selesai: jika commit, duplikat
+    mendapat replay; jika batal, duplikat yang menjalankan view. Jika lock
+    tidak didapat dalam batas waktu database, duplikat mendapat 409 dengan
+    `Retry-After` dan boleh mengulang dengan key yang sama.
+  - Response 4xx ikut disimpan (batch non-atomik bisa berstatus 400 padahal
+    sebagian barisnya tersimpan); klien yang memperbaiki request-nya harus
+    memakai key baru. Response 5xx/exception tidak disimpan dan transaksinya
+    dibatalkan, jadi boleh dicoba lagi dengan key yang sama.
+  - Key yang sama dengan method/path/body berbeda ditolak dengan 422.
+
+Key berlaku per pengguna selama TTL_JAM (setting `INVENTARIS_IDEMPOTENSI`);
+baris kedaluwarsa dibuang oleh `python manage.py bersihkan_idempotensi`.
+"""
+import datetime
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import KunciIdempotensi
+
+HEADER = 'Idempotency-Key'
+HEADER_REPLAY = 'Idempotent-Replayed'
+# Header response yang ikut disimpan dan dikirim ulang saat replay
+HEADER_DISIMPAN = ('Location', 'ETag', 'Last-Modified')
+MAKS_PANJANG = 255
+
+KONFIGURASI_DEFAULT = {
+    'TTL_JAM': 24,
+}
+
+
+def konfigurasi():
+    return {**KONFIGURASI_DEFAULT, **getattr(settings, 'INVENTARIS_IDEMPOTENSI', {})}
+
+
+class _Sibuk(Exception):
+    pass
+
+
+class _Duplikat(Exception):
+    def __init__(self, simpanan):
+        super().__init__(simpanan.kunci)
+        self.simpanan = simpanan
+
+
+def sidik_request(request):
+    """Hash method, path dan body (hasil parse) request."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {k: v for k, v in data.lists()}
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _replay(simpanan, sidik):
+    if simpanan.sidik != sidik:
+        return Response({'detail': f'{HEADER} sudah dipakai untuk request yang berbeda.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = Response(simpanan.respons, status=simpanan.status_code)
+    for nama, nilai in simpanan.header.items():
+        response[nama] = nilai
+    response[HEADER_REPLAY] = 'true'
+    return response
+
+
+def _sibuk():
+    # Lock pada baris key tidak didapat dalam batas waktu (mis. SQLite "database is locked")
+    return Response({'detail': 'Request lain dengan key ini sedang diproses, coba lagi.'},
+                    status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+
+
+def _klaim(user, kunci, sidik):
+    """INSERT baris key; raise _Duplikat jika key masih berlaku dipakai transaksi yang sudah commit."""
+    sekarang = timezone.now()
+    kedaluwarsa = sekarang + datetime.timedelta(hours=konfigurasi()['TTL_JAM'])
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return KunciIdempotensi.objects.create(
+                    pengguna=user, kunci=kunci, sidik=sidik, status_code=0, kedaluwarsa=kedaluwarsa)
+        except IntegrityError:
+            lama = KunciIdempotensi.objects.filter(pengguna=user, kunci=kunci).first()
+            if lama is None:
+                continue
+            if lama.kedaluwarsa > sekarang:
+                raise _Duplikat(lama)
+            # Key kedaluwarsa yang belum dibersihkan boleh dipakai lagi
+            KunciIdempotensi.objects.filter(pk=lama.pk, kedaluwarsa__lte=sekarang).delete()
+    raise _Duplikat(KunciIdempotensi.objects.get(pengguna=user, kunci=kunci))
+
+
+def idempoten(method):
+    """Dekorator method view (post/create): dukungan header Idempotency-Key."""
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        kunci = request.headers.get(HEADER)
+        if not kunci or not request.user or not request.user.is_authenticated:
+            return method(self, request, *args, **kwargs)
+        if len(kunci) > MAKS_PANJANG:
+            return Response({'detail': f'{HEADER} maksimal {MAKS_PANJANG} karakter.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        sidik = sidik_request(request)
+        try:
+            simpanan = KunciIdempotensi.objects.filter(
+                pengguna=request.user, kunci=kunci, kedaluwarsa__gt=timezone.now()).first()
+        except OperationalError:
+            return _sibuk()
+        if simpanan is not None:
+            return _replay(simpanan, sidik)
+
+        try:
+            with transaction.atomic():
+                try:
+                    simpanan = _klaim(request.user, kunci, sidik)
+                except OperationalError:
+                    raise _Sibuk()
+                response = method(self, request, *args, **kwargs)
+                if status.is_server_error(response.status_code):
+                    transaction.set_rollback(True)
+                    return response
+                simpanan.status_code = response.status_code
+                simpanan.respons = response.data
+                simpanan.header = {nama: response[nama] for nama in HEADER_DISIMPAN if response.has_header(nama)}
+                simpanan.save(update_fields=['status_code', 'respons', 'header'])
+        except _Duplikat as e:
+            return _replay(e.simpanan, sidik)
+        except _Sibuk:
+            return _sibuk()
+        return response
+    return wrapper
+
+
+def bersihkan(batch=1000, dry_run=False):
+    """Hapus key kedaluwarsa per batch (agar tidak mengunci tabel lama); kembalikan jumlahnya."""
+    kedaluwarsa = KunciIdempotensi.objects.filter(kedaluwarsa__lte=timezone.now())
+    if dry_run:
+        return kedaluwarsa.count()
+    total = 0
+    while True:
+        ids = list(kedaluwarsa.values_list('pk', flat=True)[:batch])
+        if not ids:
+            return total
+        jumlah, _ = KunciIdempotensi.objects.filter(pk__in=ids, kedaluwarsa__lte=timezone.now()).delete()
+        total += jumlah
@@ -0,0 +1,412 @@
+"""Import massal barang dan stok dari file CSV/XLSX.
+
+File dibaca baris demi baris (CSV lewat `csv.reader`, XLSX lewat `iterparse`
+atas XML sheet di dalam zip) dan diproses per batch: setiap batch me-resolve
+kategori/supplier/gudang berdasarkan nama (dengan cache di memori), lalu
+meng-upsert `Barang` berdasarkan `sku` dan `Stok` berdasarkan (barang, gudang)
+dengan `bulk_create`/`bulk_update`. Memori yang dipakai sebanding dengan ukuran
+batch, bukan ukuran file.
+
+Kolom yang dikenali (header tidak peka huruf besar/kecil): sku, nama (atau
+barang), deskripsi, kategori, supplier, satuan, gambar_url, gudang, jumlah,
+level_reorder. Format file export stok (`/api/stok/export/`) bisa langsung
+di-import ulang.
+
+Perubahan jumlah stok dicatat sebagai RiwayatStok IN/OUT sebesar selisihnya,
+sehingga ledger, rekap harian dan stream real-time tetap konsisten.
+"""
+import csv
+import io
+import re
+import time
+import zipfile
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+
+from . import movements, search
+from .models import Barang, Gudang, Kategori, RiwayatStok, Stok, Supplier
+from .serializers import bersihkan_gambar_url
+
+UKURAN_BATCH = 1000
+# Laporan error dibatasi agar memori tetap kecil untuk file yang rusak total
+MAKS_ERROR = 1000
+
+ALIAS_KOLOM = {
+    'sku': 'sku',
+    'kode_sku': 'sku',
+    'nama': 'nama',
+    'barang': 'nama',
+    'nama_barang': 'nama',
+    'deskripsi': 'deskripsi',
+    'kategori': 'kategori',
+    'supplier': 'supplier',
+    'satuan': 'satuan',
+    'gambar_url': 'gambar_url',
+    'gudang': 'gudang',
+    'jumlah': 'jumlah',
+    'level_reorder': 'level_reorder',
+    'levelreorder': 'level_reorder',
+}
+
+PANJANG_MAKS = {
+    'sku': Barang._meta.get_field('sku').max_length,
+    'nama': Barang._meta.get_field('nama').max_length,
+    'satuan': Barang._meta.get_field('satuan').max_length,
+    'gambar_url': Barang._meta.get_field('gambar_url').max_length,
+}
+
+FIELD_BARANG = ('nama', 'deskripsi', 'kategori_id', 'supplier_id', 'satuan', 'gambar_url')
+
+
+# ---------- Pembaca file ----------
+def baca_csv(berkas):
+    """Iterasi baris CSV dari file biner; delimiter ',', ';' atau tab dideteksi otomatis."""
+    teks = io.TextIOWrapper(berkas, encoding='utf-8-sig', newline='')
+    contoh = teks.read(8192)
+    teks.seek(0)
+    try:
+        dialek = csv.Sniffer().sniff(contoh, delimiters=',;\t')
+    except csv.Error:
+        dialek = csv.excel
+    try:
+        yield from csv.reader(teks, dialek)
+    finally:
+        # Jangan ikut menutup file milik pemanggil
+        teks.detach()
+
+
+def _indeks_kolom(ref):
+    huruf = re.match(r'[A-Z]+', ref or '')
+    if not huruf:
+        return None
+    indeks = 0
+    for h in huruf.group(0):
+        indeks = indeks * 26 + (ord(h) - 64)
+    return indeks - 1
+
+
+def baca_xlsx(berkas):
+    """Iterasi baris sheet pertama file XLSX tanpa memuat seluruh sheet ke memori."""
+    ns = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    with zipfile.ZipFile(berkas) as zf:
+        nama = set(zf.namelist())
+        shared = []
+        if 'xl/sharedStrings.xml' in nama:
+            with zf.open('xl/sharedStrings.xml') as f:
+                for _, elem in iterparse(f):
+                    if elem.tag == f'{ns}si':
+                        shared.append(''.join(t.text or '' for t in elem.iter(f'{ns}t')))
+                        elem.clear()
+        sheet = 'xl/worksheets/sheet1.xml'
+        if sheet not in nama:
+            sheet = sorted(n for n in nama if n.startswith('xl/worksheets/sheet'))[0]
+        with zf.open(sheet) as f:
+            induk = None
+            for event, elem in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == f'{ns}sheetData':
+                        induk = elem
+                    continue
+                if elem.tag != f'{ns}row':
+                    continue
+                baris = []
+                for sel in elem.iter(f'{ns}c'):
+                    indeks = _indeks_kolom(sel.get('r'))
+                    if indeks is None:
+                        indeks = len(baris)
+                    tipe = sel.get('t')
+                    if tipe == 'inlineStr':
+                        nilai = ''.join(t.text or '' for t in sel.iter(f'{ns}t'))
+                    else:
+                        v = sel.find(f'{ns}v')
+                        nilai = v.text if v is not None else None
+                        if tipe == 's' and nilai is not None:
+                            nilai = shared[int(nilai)]
+                    baris.extend([None] * (indeks + 1 - len(baris)))
+                    baris[indeks] = nilai
+                yield baris
+                # Buang baris yang sudah diproses agar memori tetap datar
+                elem.clear()
+                if induk is not None:
+                    induk.clear()
+
+
+def baca_berkas(berkas, nama_berkas):
+    if nama_berkas.lower().endswith('.xlsx'):
+        return baca_xlsx(berkas)
+    return baca_csv(berkas)
+
+
+# ---------- Parsing baris ----------
+def _teks(nilai):
+    if nilai is None:
+        return ''
+    return str(nilai).strip()
+
+
+def _bilangan(nilai, nama, errors):
+    teks = _teks(nilai)
+    if not teks:
+        return None
+    try:
+        angka = float(teks)
+        if angka != int(angka) or angka < 0:
+            raise ValueError
+        return int(angka)
+    except ValueError:
+        errors[nama] = ['Harus bilangan bulat >= 0']
+        return None
+
+
+def _update_massal(model, objek_list, fields):
+    """UPDATE per baris lewat satu `executemany`.
+
+    `bulk_update` membangun ekspresi CASE WHEN sebesar batch yang biayanya di
+    Python jauh lebih mahal daripada query-nya sendiri untuk puluhan ribu baris.
+    """
+    objek_list = list(objek_list)
+    if not objek_list:
+        return
+    meta = model._meta
+    kolom = [meta.get_field(f) for f in fields]
+    koneksi = connections[router.db_for_write(model)]
+    qn = koneksi.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        qn(meta.db_table), ', '.join(f'{qn(f.column)} = %s' for f in kolom), qn(meta.pk.column),
+    )
+    params = [
+        [f.get_db_prep_save(getattr(obj, f.attname), koneksi) for f in kolom] + [obj.pk]
+        for obj in objek_list
+    ]
+    with koneksi.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class Importer:
+    def __init__(self, buat_referensi=False, ukuran_batch=UKURAN_BATCH, user=None, catatan='Import'):
+        self.buat_referensi = buat_referensi
+        self.ukuran_batch = ukuran_batch
+        self.user = user if user is not None and user.is_authenticated else None
+        self.catatan = catatan
+        # Cache nama -> id untuk data referensi
+        self.cache = {Kategori: {}, Supplier: {}, Gudang: {}}
+        self.hasil = {'baris': 0, **self._hitungan_kosong()}
+
+    @staticmethod
+    def _hitungan_kosong():
+        return {'barang_dibuat': 0, 'barang_diperbarui': 0, 'stok_dibuat': 0, 'stok_diperbarui': 0,
+                'gagal': 0, 'errors': []}
+
+    def catat_error(self, nomor, sku, errors, hasil=None):
+        hasil = self.hasil if hasil is None else hasil
+        hasil['gagal'] += 1
+        if len(hasil['errors']) < MAKS_ERROR:
+            hasil['errors'].append({'baris': nomor, 'sku': sku, 'errors': errors})
+
+    def _gabung(self, hasil):
+        for kunci, nilai in hasil.items():
+            if kunci == 'errors':
+                self.hasil['errors'].extend(nilai[:MAKS_ERROR - len(self.hasil['errors'])])
+            else:
+                self.hasil[kunci] += nilai
+
+    def jalankan(self, baris_iter):
+        mulai = time.perf_counter()
+        baris_iter = iter(baris_iter)
+        header = next(baris_iter, None)
+        if header is None:
+            raise ValueError('File kosong')
+        kolom = {}
+        for i, nama in enumerate(header):
+            kunci = ALIAS_KOLOM.get(re.sub(r'\s+', '_', _teks(nama).lower()))
+            if kunci and kunci not in kolom:
+                kolom[kunci] = i
+        if 'sku' not in kolom:
+            raise ValueError('Kolom sku wajib ada di header')
+
+        batch = []
+        for nomor, baris in enumerate(baris_iter, start=2):
+            if not any(_teks(v) for v in baris):
+                continue
+            self.hasil['baris'] += 1
+            item = {k: (baris[i] if i < len(baris) else None) for k, i in kolom.items()}
+            item['_baris'] = nomor
+            batch.append(item)
+            if len(batch) >= self.ukuran_batch:
+                self.proses_batch(batch)
+                batch = []
+        if batch:
+            self.proses_batch(batch)
+        self.hasil['durasi'] = round(time.perf_counter() - mulai, 3)
+        return self.hasil
+
+    def parse(self, item):
+        errors = {}
+        data = {'_baris': item['_baris']}
+        for nama in ('sku', 'nama', 'deskripsi', 'kategori', 'supplier', 'satuan', 'gambar_url', 'gudang'):
+            data[nama] = _teks(item.get(nama))
+            maks = PANJANG_MAKS.get(nama)
+            if maks and len(data[nama]) > maks:
+                errors[nama] = [f'Maksimal {maks} karakter']
+        if not data['sku']:
+            errors['sku'] = ['SKU wajib diisi']
+        data['gambar_url'] = bersihkan_gambar_url(data['gambar_url'])
+        data['jumlah'] = _bilangan(item.get('jumlah'), 'jumlah', errors)
+        data['level_reorder'] = _bilangan(item.get('level_reorder'), 'level_reorder', errors)
+        if (data['jumlah'] is not None or data['level_reorder'] is not None) and not data['gudang']:
+            errors['gudang'] = ['Gudang wajib diisi jika jumlah/level_reorder diisi']
+        return data, errors
+
+    def resolve(self, model, nama_list):
+        """Isi cache nama -> id untuk `nama_list`; buat yang belum ada jika diizinkan."""
+        cache = self.cache[model]
+        kurang = {n for n in nama_list if n and n not in cache}
+        if not kurang:
+            return
+        # Nama supplier/gudang tidak unik: pakai id terkecil
+        for pk, nama in model.objects.filter(nama__in=kurang).order_by('-pk').values_list('pk', 'nama'):
+            cache[nama] = pk
+        if self.buat_referensi:
+            for nama in sorted(kurang - cache.keys()):
+                extra = {'lokasi': '-'} if model is Gudang else {}
+                cache[nama] = model.objects.create(nama=nama, **extra).pk
+
+    def proses_batch(self, batch):
+        valid = []
+        for item in batch:
+            data, errors = self.parse(item)
+            if errors:
+                self.catat_error(data['_baris'], data['sku'], errors)
+            else:
+                valid.append(data)
+        if not valid:
+            return
+        # Hitungan dan error batch baru digabung setelah commit: batch yang
+        # dibatalkan tidak boleh menyisakan hitungan, error ganda, atau id
+        # referensi yang ikut di-rollback di cache
+        lokal = self._hitungan_kosong()
+        cache = {model: dict(isi) for model, isi in self.cache.items()}
+        try:
+            with transaction.atomic():
+                self._simpan(valid, lokal)
+        except DatabaseError as e:
+            self.cache = cache
+            for data in valid:
+                self.catat_error(data['_baris'], data['sku'], {'detail': f'Gagal disimpan: {e}'})
+        else:
+            self._gabung(lokal)
+
+    def _simpan(self, valid, hasil):
+        # SQLite: ambil kunci tulis sebelum membaca barang/stok yang akan ditimpa
+        movements._kunci_tulis_sqlite()
+        self.resolve(Kategori, {d['kategori'] for d in valid})
+        self.resolve(Supplier, {d['supplier'] for d in valid})
+        self.resolve(Gudang, {d['gudang'] for d in valid})
+
+        # ---------- Barang: upsert berdasarkan sku ----------
+        ada = Barang.objects.in_bulk({d['sku'] for d in valid}, field_name='sku')
+        baru, diubah, siap = {}, {}, []
+        for data in valid:
+            errors = {}
+            for nama, model in (('kategori', Kategori), ('supplier', Supplier), ('gudang', Gudang)):
+                if data[nama] and data[nama] not in self.cache[model]:
+                    errors[nama] = [f'{model._meta.verbose_name.title()} "{data[nama]}" tidak ditemukan']
+            barang = ada.get(data['sku']) or baru.get(data['sku'])
+            if barang is None:
+                for nama in ('nama', 'kategori', 'satuan'):
+                    if not data[nama]:
+                        errors.setdefault(nama, ['Wajib diisi untuk barang baru'])
+            if errors:
+                self.catat_error(data['_baris'], data['sku'], errors, hasil)
+                continue
+
+            nilai = {
+                'nama': data['nama'], 'deskripsi': data['deskripsi'], 'satuan': data['satuan'],
+                'gambar_url': data['gambar_url'],
+                'kategori_id': self.cache[Kategori].get(data['kategori']),
+                'supplier_id': self.cache[Supplier].get(data['supplier']),
+            }
+            if barang is None:
+                barang = Barang(sku=data['sku'], **nilai)
+                baru[data['sku']] = barang
+            else:
+                # Kolom kosong di file tidak menimpa data yang sudah ada
+                berubah = False
+                for field, v in nilai.items():
+                    if v not in ('', None) and getattr(barang, field) != v:
+                        setattr(barang, field, v)
+                        berubah = True
+                if berubah and barang.pk:
+                    diubah[barang.pk] = barang
+            data['barang'] = barang
+            siap.append(data)
+
+        sekarang = timezone.now()
+        Barang.objects.bulk_create(baru.values(), batch_size=500)
+        for barang in diubah.values():
+            barang.diperbarui_pada = sekarang
+        _update_massal(Barang, diubah.values(), [*FIELD_BARANG, 'diperbarui_pada'])
+        # bulk_create/bulk_update tidak memicu signal, jadi index pencarian diperbarui manual
+        search.indeks_barang([b.pk for b in baru.values()] + list(diubah))
+        hasil['barang_dibuat'] += len(baru)
+        hasil['barang_diperbarui'] += len(diubah)
+
+        # ---------- Stok: upsert berdasarkan (barang, gudang) ----------
+        baris_stok = [d for d in siap if d['gudang']]
+        if not baris_stok:
+            return
+        # Baris stok dikunci (urutan pk, sama dengan movements._kunci_stok) sampai
+        # commit: jumlah absolut dari file dan selisih yang dicatat sebagai
+        # riwayat dihitung dari nilai yang tidak bisa diubah transaksi lain
+        stok_ada = {
+            (s.barang_id, s.gudang_id): s for s in Stok.objects.select_for_update().filter(
+                barang_id__in={d['barang'].pk for d in baris_stok},
+                gudang_id__in={self.cache[Gudang][d['gudang']] for d in baris_stok},
+            ).order_by('pk')
+        }
+        stok_baru, stok_diubah, selisih = {}, {}, []
+        for data in baris_stok:
+            kunci = (data['barang'].pk, self.cache[Gudang][data['gudang']])
+            stok = stok_ada.get(kunci) or stok_baru.get(kunci)
+            if stok is None:
+                stok = Stok(barang=data['barang'], gudang_id=kunci[1], jumlah=0, level_reorder=10)
+                stok_baru[kunci] = stok
+            berubah = False
+            if data['level_reorder'] is not None and data['level_reorder'] != stok.level_reorder:
+                stok.level_reorder = data['level_reorder']
+                berubah = True
+            if data['jumlah'] is not None and data['jumlah'] != stok.jumlah:
+                selisih.append((stok, data['jumlah'] - stok.jumlah))
+                stok.jumlah = data['jumlah']
+                berubah = True
+            if berubah and stok.pk:
+                stok_diubah[stok.pk] = stok
+
+        Stok.objects.bulk_create(stok_baru.values(), batch_size=500)
+        for stok in stok_diubah.values():
+            stok.diperbarui_pada = sekarang
+        _update_massal(Stok, stok_diubah.values(), ['jumlah', 'level_reorder', 'diperbarui_pada'])
+        hasil['stok_dibuat'] += len(stok_baru)
+        hasil['stok_diperbarui'] += len(stok_diubah)
+
+        riwayat = RiwayatStok.objects.bulk_create([
+            RiwayatStok(stok=stok, tipe='IN' if delta > 0 else 'OUT', jumlah=abs(delta),
+                        catatan=self.catatan, dibuat_oleh=self.user)
+            for stok, delta in selisih
+        ], batch_size=500)
+        movements.riwayat_tercatat(riwayat)
+
+
+def impor_berkas(berkas, nama_berkas, **kwargs):
+    """Import file (objek file biner yang bisa di-seek). Mengembalikan ringkasan hasil.
+
+    Melempar ValueError jika file tidak bisa dibaca. Batch yang sudah diproses
+    sebelum kerusakan ditemukan tetap tersimpan.
+    """
+    kwargs.setdefault('catatan', f'Import {nama_berkas}'[:200])
+    try:
+        return Importer(**kwargs).jalankan(baca_berkas(berkas, nama_berkas))
+    except (zipfile.BadZipFile, UnicodeDecodeError, csv.Error, ParseError, KeyError, IndexError) as e:
+        raise ValueError(f'{type(e).__name__}: {e}') from e
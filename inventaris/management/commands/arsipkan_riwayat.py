@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventaris import arsip
+from inventaris.models import RiwayatStok
+
+
+class Command(BaseCommand):
+    help = (
+        'Pindahkan riwayat stok yang lebih tua dari jendela retensi ke tabel arsip '
+        '(jalankan terjadwal). Endpoint riwayat tetap bisa membaca arsip lewat ?dari=.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hari', type=int, default=None,
+                            help='Jendela retensi dalam hari (default INVENTARIS_RETENSI_RIWAYAT_HARI).')
+        parser.add_argument('--ukuran-batch', type=int, default=arsip.UKURAN_BATCH)
+        parser.add_argument('--batas-batch', type=int, default=None,
+                            help='Berhenti setelah sejumlah batch (untuk membagi pekerjaan besar).')
+        parser.add_argument('--dry-run', action='store_true', help='Hanya hitung baris yang akan diarsipkan.')
+
+    def handle(self, *args, **options):
+        hari = options['hari'] if options['hari'] is not None else arsip.retensi_hari()
+        if hari < 1 or options['ukuran_batch'] < 1:
+            raise CommandError('--hari dan --ukuran-batch harus lebih dari 0.')
+        sebelum = timezone.now() - datetime.timedelta(days=hari)
+
+        if options['dry_run']:
+            jumlah = RiwayatStok.objects.filter(dibuat_pada__lt=sebelum).count()
+            self.stdout.write(f'{jumlah} riwayat sebelum {sebelum.isoformat()} akan diarsipkan.')
+            return
+        jumlah = arsip.arsipkan(sebelum, options['ukuran_batch'], options['batas_batch'])
+        self.stdout.write(self.style.SUCCESS(f'{jumlah} riwayat sebelum {sebelum.isoformat()} diarsipkan.'))
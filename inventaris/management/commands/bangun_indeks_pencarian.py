@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventaris import search
+
+
+class Command(BaseCommand):
+    help = 'Bangun ulang index pencarian full-text barang (SQLite FTS5).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.fts_tersedia(using):
+            self.stdout.write(self.style.WARNING('Index FTS hanya tersedia di SQLite; pencarian memakai icontains.'))
+            return
+        search.bangun_ulang(using)
+        self.stdout.write(self.style.SUCCESS('Index pencarian barang selesai dibangun ulang.'))
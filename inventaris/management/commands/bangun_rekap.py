@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventaris import rekap
+
+
+class Command(BaseCommand):
+    help = 'Isi atau bangun ulang tabel rekap pergerakan harian dari riwayat stok.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dari', help='Hanya bangun ulang mulai tanggal ini (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        dari = None
+        if options['dari']:
+            dari = parse_date(options['dari'])
+            if dari is None:
+                raise CommandError('Format --dari harus YYYY-MM-DD.')
+        dibuat = rekap.bangun_ulang(dari)
+        self.stdout.write(self.style.SUCCESS(f'{dibuat} baris rekap pergerakan harian dibuat.'))
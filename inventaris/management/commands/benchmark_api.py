@@ -0,0 +1,326 @@
+import datetime
+import gc
+import json
+import platform
+import random
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventaris import api_urls, sintetis
+from inventaris.models import Barang, Gudang, Kategori, RiwayatStok, Stok, Supplier
+
+# Rute yang sengaja tidak diukur
+TIDAK_DIUKUR = {
+    'stok-stream': 'stream SSE tidak pernah selesai',
+    'barang-impor': 'upload berkas; ukur dengan `import_barang`',
+}
+# Metode yang mengubah data (dilewati dengan --baca-saja)
+METODE_TULIS = ('post', 'put', 'patch', 'delete')
+
+
+def persentil(nilai_urut, p):
+    """Persentil metode nearest-rank dari list yang sudah diurutkan."""
+    if not nilai_urut:
+        return 0.0
+    indeks = max(0, min(len(nilai_urut) - 1, -(-len(nilai_urut) * p // 100) - 1))
+    return nilai_urut[int(indeks)]
+
+
+def nama_rute():
+    """Semua nama URL yang terdaftar di api_urls (termasuk rute router)."""
+    hasil = set()
+
+    def telusuri(pola):
+        for p in pola:
+            if hasattr(p, 'url_patterns'):
+                telusuri(p.url_patterns)
+            elif p.name:
+                hasil.add(p.name)
+    telusuri(api_urls.urlpatterns)
+    return hasil
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark seluruh endpoint API di atas data sintetis: mencatat latensi p50/p95/p99, '
+        'jumlah query per request dan ukuran response, menyimpan hasil sebagai JSON dan '
+        'membandingkannya dengan baseline (gagal jika ada regresi).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skala', choices=sorted(sintetis.SKALA), default='kecil')
+        parser.add_argument('--seed', type=int, default=42, help='Seed data sintetis dan urutan request.')
+        parser.add_argument('--iterasi', type=int, default=30, help='Request terukur per skenario.')
+        parser.add_argument('--pemanasan', type=int, default=3, help='Request awal per skenario yang tidak dihitung.')
+        parser.add_argument('--skenario', nargs='*', default=None, metavar='NAMA',
+                            help='Hanya jalankan skenario yang namanya diawali salah satu nilai ini.')
+        parser.add_argument('--baca-saja', action='store_true', help='Lewati skenario yang mengubah data.')
+        parser.add_argument('--output', metavar='FILE', help='Simpan hasil sebagai JSON.')
+        parser.add_argument('--bandingkan', metavar='BASELINE', help='File JSON hasil sebelumnya sebagai baseline.')
+        parser.add_argument('--ambang', type=float, default=0.25,
+                            help='Kenaikan relatif p50 dan p95 (keduanya) atau ukuran response yang dianggap regresi (default 0.25 = 25%%).')
+        parser.add_argument('--ambang-ms', type=float, default=2.0,
+                            help='Kenaikan latensi di bawah nilai ini (ms) diabaikan sebagai noise.')
+        parser.add_argument('--data-ada', action='store_true',
+                            help='Pakai database yang dikonfigurasi beserta isinya, tanpa membuat data sintetis '
+                                 '(skenario tulis ikut mengubah data; tambahkan --baca-saja untuk menghindarinya).')
+
+    def handle(self, *args, **options):
+        if options['iterasi'] < 1:
+            raise CommandError('--iterasi harus lebih dari 0.')
+        baseline = self.baca_baseline(options['bandingkan']) if options['bandingkan'] else None
+
+        # Host default APIClient
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            if options['data_ada']:
+                hasil = self.ukur(options, None)
+            else:
+                # Data sintetis dibuat di database test terpisah (dibuang setelah selesai)
+                lama = setup_databases(verbosity=0, interactive=False)
+                try:
+                    hasil = self.ukur(options, options['skala'])
+                finally:
+                    teardown_databases(lama, verbosity=0)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(hasil, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Hasil disimpan ke {options['output']}")
+        if baseline is not None:
+            regresi = self.bandingkan(baseline, hasil, options['ambang'], options['ambang_ms'])
+            if regresi:
+                raise CommandError(f'{len(regresi)} regresi dibanding baseline: {", ".join(regresi)}')
+            self.stdout.write(self.style.SUCCESS('Tidak ada regresi dibanding baseline.'))
+
+    def baca_baseline(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Baseline tidak bisa dibaca: {e}')
+
+    def ukur(self, options, skala):
+        self.rng = random.Random(options['seed'])
+        admin = User.objects.filter(is_staff=True, is_active=True).order_by('pk').first()
+        if skala is not None:
+            admin = admin or User.objects.create_user('benchmark', password='benchmark', is_staff=True)
+            mulai = time.perf_counter()
+            jumlah = sintetis.buat(skala, seed=options['seed'], pengguna=admin)
+            self.stdout.write(f'Data sintetis ({skala}) dibuat dalam {time.perf_counter() - mulai:.1f}s: {jumlah}')
+        elif admin is None:
+            raise CommandError('Butuh satu user staff aktif di database untuk --data-ada.')
+        self.konteks = self.siapkan_konteks()
+        if not self.konteks['stok']:
+            raise CommandError('Database tidak berisi stok untuk diukur.')
+
+        client = APIClient()
+        client.force_authenticate(admin)
+        daftar = self.skenario()
+        if options['skenario']:
+            daftar = [s for s in daftar if s[0].startswith(tuple(options['skenario']))]
+        if options['baca_saja']:
+            daftar = [s for s in daftar if s[2] not in METODE_TULIS]
+
+        hasil = {}
+        self.stdout.write(f"{'skenario':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'query':>7}{'byte':>10}  status")
+        for nama, rute, metode, buat_request in daftar:
+            # Urutan request setiap skenario tetap, walaupun hanya sebagian skenario yang dijalankan
+            self.rng.seed(f"{options['seed']}:{nama}")
+            hasil[nama] = self.jalankan(client, rute, metode, buat_request, options['iterasi'], options['pemanasan'])
+            h = hasil[nama]
+            self.stdout.write(
+                f"{nama:<28}{h['p50_ms']:>9.2f}{h['p95_ms']:>9.2f}{h['p99_ms']:>9.2f}"
+                f"{h['query_rata']:>7.1f}{h['byte_rata']:>10.0f}  {h['status']}"
+            )
+            if h['gagal']:
+                self.stdout.write(self.style.WARNING(f"  {h['gagal']} request {nama} tidak berstatus 2xx"))
+
+        terukur = {rute for _, rute, _, _ in self.skenario()}
+        sisa = sorted(nama_rute() - terukur - set(TIDAK_DIUKUR))
+        if sisa:
+            self.stdout.write(self.style.WARNING(f'Rute tanpa skenario benchmark: {", ".join(sisa)}'))
+        return {
+            'meta': {
+                'skala': skala or 'data-ada', 'seed': options['seed'], 'iterasi': options['iterasi'],
+                'waktu': timezone.now().isoformat(), 'database': connection.vendor,
+                'python': platform.python_version(), 'django': django.get_version(),
+                'data': {m.__name__.lower(): m.objects.count() for m in (Kategori, Supplier, Gudang, Barang, Stok, RiwayatStok)},
+            },
+            'hasil': hasil,
+        }
+
+    def siapkan_konteks(self):
+        # Id diambil acak (tetap per seed) agar request detail tidak selalu mengenai baris yang sama
+        def sampel(model, n=500, **filter):
+            pk = list(model.objects.filter(**filter).order_by('pk').values_list('pk', flat=True))
+            return sorted(self.rng.sample(pk, min(n, len(pk))))
+        stok = sampel(Stok, jumlah__gt=0)
+        barang = sampel(Barang)
+        return {
+            'kategori': sampel(Kategori), 'supplier': sampel(Supplier), 'gudang': sampel(Gudang),
+            'barang': barang, 'stok': stok, 'riwayat': sampel(RiwayatStok),
+            'stok_detail': list(Stok.objects.filter(pk__in=stok[:50]).order_by('pk').values('barang_id', 'gudang_id')),
+            'kata': list(Barang.objects.filter(pk__in=barang[:50]).order_by('pk').values_list('nama', flat=True)),
+            'urutan': 0,
+        }
+
+    def skenario(self):
+        """Daftar (nama, nama rute, metode, fungsi pembuat request -> (url, data))."""
+        k, rng = self.konteks, self.rng
+
+        def pilih(kunci):
+            return rng.choice(k[kunci]) if k[kunci] else 0
+
+        def kata():
+            return k['kata'] and rng.choice(k['kata']).split()[0]
+
+        def urut():
+            k['urutan'] += 1
+            return k['urutan']
+
+        def url(nama, **kwargs):
+            return reverse(nama, kwargs=kwargs or None)
+
+        hari_lalu = (timezone.localdate() - datetime.timedelta(days=7)).isoformat()
+        return [
+            ('api-root', 'api-root', 'get', lambda: (url('api-root'), None)),
+            ('kategori-list', 'kategori-list', 'get', lambda: (url('kategori-list'), None)),
+            ('kategori-list-search', 'kategori-list', 'get', lambda: (url('kategori-list'), {'search': str(rng.randint(0, 9))})),
+            ('kategori-detail', 'kategori-detail', 'get', lambda: (url('kategori-detail', pk=pilih('kategori')), None)),
+            ('kategori-create', 'kategori-list', 'post',
+             lambda: (url('kategori-list'), {'nama': f'Benchmark Kategori {urut()}-{rng.random()}'})),
+            ('supplier-list', 'supplier-list', 'get', lambda: (url('supplier-list'), {'ordering': 'nama'})),
+            ('supplier-detail', 'supplier-detail', 'get', lambda: (url('supplier-detail', pk=pilih('supplier')), None)),
+            ('gudang-list', 'gudang-list', 'get', lambda: (url('gudang-list'), None)),
+            ('gudang-detail', 'gudang-detail', 'get', lambda: (url('gudang-detail', pk=pilih('gudang')), None)),
+            ('barang-list', 'barang-list', 'get', lambda: (url('barang-list'), {'page': rng.randint(1, 5)})),
+            ('barang-list-search', 'barang-list', 'get', lambda: (url('barang-list'), {'search': kata()})),
+            ('barang-list-filter', 'barang-list', 'get', lambda: (url('barang-list'), {'kategori': pilih('kategori')})),
+            ('barang-list-ordering', 'barang-list', 'get', lambda: (url('barang-list'), {'ordering': rng.choice(['nama', '-sku'])})),
+            ('barang-detail', 'barang-detail', 'get', lambda: (url('barang-detail', pk=pilih('barang')), None)),
+            ('barang-create', 'barang-list', 'post', lambda: (url('barang-list'), {
+                'sku': f'BENCH-{urut()}-{rng.randrange(10**9)}', 'nama': 'Barang benchmark',
+                'kategori': pilih('kategori'), 'satuan': 'pcs',
+            })),
+            ('stok-list', 'stok-list', 'get', lambda: (url('stok-list'), {'page': rng.randint(1, 5)})),
+            ('stok-list-search', 'stok-list', 'get', lambda: (url('stok-list'), {'search': kata()})),
+            ('stok-list-filter', 'stok-list', 'get', lambda: (url('stok-list'), {'gudang': pilih('gudang')})),
+            ('stok-list-ordering', 'stok-list', 'get', lambda: (url('stok-list'), {'ordering': '-jumlah'})),
+            ('stok-list-cursor', 'stok-list', 'get', lambda: (url('stok-list'), {'cursor': ''})),
+            ('stok-list-search-count-none', 'stok-list', 'get', lambda: (url('stok-list'), {'search': kata(), 'count': 'none'})),
+            ('stok-list-search-count-cached', 'stok-list', 'get', lambda: (url('stok-list'), {'search': kata(), 'count': 'cached'})),
+            ('stok-list-as-of', 'stok-list', 'get', lambda: (url('stok-list'), {'as_of': hari_lalu, 'gudang': pilih('gudang')})),
+            ('stok-detail', 'stok-detail', 'get', lambda: (url('stok-detail', pk=pilih('stok')), None)),
+            ('stok-histori', 'stok-histori', 'get', lambda: (url('stok-histori', pk=pilih('stok')), None)),
+            ('stok-reorder', 'stok-reorder', 'get', lambda: (url('stok-reorder'), {'gudang': pilih('gudang')})),
+            ('stok-export', 'stok-export', 'get', lambda: (url('stok-export'), {'gudang': pilih('gudang')})),
+            ('stok-create', 'stok-list', 'post', lambda: (url('stok-list'), {
+                **self.pasangan_stok(), 'jumlah': 5, 'level_reorder': 1,
+            })),
+            ('stok-transaction', 'stok-transaction', 'post', lambda: (url('stok-transaction'), {
+                'stok': pilih('stok'), 'tipe': 'IN', 'jumlah': rng.randint(1, 5), 'catatan': 'benchmark',
+            })),
+            ('stok-transaction-bulk', 'stok-transaction-bulk', 'post', lambda: (url('stok-transaction-bulk'), {
+                'pergerakan': [{'stok': pilih('stok'), 'tipe': 'IN', 'jumlah': 1} for _ in range(10)],
+            })),
+            ('riwayat-stok-list', 'riwayat-stok-list', 'get', lambda: (url('riwayat-stok-list'), {'page': rng.randint(1, 5)})),
+            ('riwayat-stok-list-filter', 'riwayat-stok-list', 'get',
+             lambda: (url('riwayat-stok-list'), {'tipe': rng.choice(['IN', 'OUT']), 'gudang': pilih('gudang')})),
+            ('riwayat-stok-list-search-count-estimate', 'riwayat-stok-list', 'get',
+             lambda: (url('riwayat-stok-list'), {'search': kata(), 'count': 'estimate'})),
+            ('riwayat-stok-list-cursor', 'riwayat-stok-list', 'get', lambda: (url('riwayat-stok-list'), {'cursor': ''})),
+            ('riwayat-stok-detail', 'riwayat-stok-detail', 'get',
+             lambda: (url('riwayat-stok-detail', pk=pilih('riwayat')), None)),
+            ('riwayat-stok-export', 'riwayat-stok-export', 'get',
+             lambda: (url('riwayat-stok-export'), {'dari': hari_lalu, 'gudang': pilih('gudang')})),
+            ('stok-stream-tiket', 'stok-stream-tiket', 'post', lambda: (url('stok-stream-tiket'), None)),
+            ('current-user', 'current-user', 'get', lambda: (url('current-user'), None)),
+            ('statistik', 'statistik', 'get', lambda: (url('statistik'), {'hari': 30})),
+            ('cache-stats', 'cache-stats', 'get', lambda: (url('cache-stats'), None)),
+            ('metrik', 'metrik', 'get', lambda: (url('metrik'), None)),
+        ]
+
+    def pasangan_stok(self):
+        """(barang, gudang) milik stok yang sudah ada: create stok berjalan sebagai upsert."""
+        item = self.rng.choice(self.konteks['stok_detail'])
+        return {'barang': item['barang_id'], 'gudang': item['gudang_id']}
+
+    def jalankan(self, client, rute, metode, buat_request, iterasi, pemanasan):
+        latensi, query, ukuran, status = [], [], [], {}
+        # Seperti timeit: garbage collector dimatikan selama pengukuran agar tidak muncul sebagai lonjakan latensi
+        gc.collect()
+        gc.disable()
+        try:
+            for i in range(pemanasan + iterasi):
+                path, data = buat_request()
+                kirim = getattr(client, metode)
+                kwargs = {'format': 'json'} if metode in METODE_TULIS else {}
+                with CaptureQueriesContext(connections['default']) as tangkap:
+                    mulai = time.perf_counter()
+                    response = kirim(path, data, **kwargs)
+                    # Response streaming baru menjalankan query saat isinya dibaca
+                    isi = b''.join(response.streaming_content) if response.streaming else response.content
+                    durasi = time.perf_counter() - mulai
+                if i < pemanasan:
+                    continue
+                latensi.append(durasi * 1000)
+                query.append(len(tangkap))
+                ukuran.append(len(isi))
+                status[response.status_code] = status.get(response.status_code, 0) + 1
+        finally:
+            gc.enable()
+        latensi.sort()
+        return {
+            'rute': rute,
+            'metode': metode.upper(),
+            'p50_ms': round(persentil(latensi, 50), 3),
+            'p95_ms': round(persentil(latensi, 95), 3),
+            'p99_ms': round(persentil(latensi, 99), 3),
+            'query_rata': round(sum(query) / len(query), 2),
+            'query_maks': max(query),
+            'byte_rata': round(sum(ukuran) / len(ukuran), 1),
+            'status': ','.join(f'{kode}x{n}' for kode, n in sorted(status.items())),
+            'gagal': sum(n for kode, n in status.items() if not 200 <= kode < 300),
+        }
+
+    def bandingkan(self, baseline, hasil, ambang, ambang_ms):
+        """Cetak perbandingan dengan baseline; mengembalikan daftar skenario yang regresi."""
+        meta_lama, meta_baru = baseline.get('meta', {}), hasil['meta']
+        for kunci in ('skala', 'seed', 'database'):
+            if meta_lama.get(kunci) != meta_baru.get(kunci):
+                self.stdout.write(self.style.WARNING(
+                    f'Baseline memakai {kunci}={meta_lama.get(kunci)!r}, sekarang {meta_baru.get(kunci)!r}; '
+                    'perbandingan mungkin tidak sebanding.'
+                ))
+        regresi = []
+        for nama, baru in hasil['hasil'].items():
+            lama = baseline.get('hasil', {}).get(nama)
+            if lama is None:
+                self.stdout.write(f'{nama:<28} baru (tidak ada di baseline)')
+                continue
+            alasan = []
+            # Perlambatan nyata menggeser p50 dan p95; lonjakan tunggal hanya menggeser p95
+            if all(baru[k] > lama[k] * (1 + ambang) and baru[k] - lama[k] > ambang_ms for k in ('p50_ms', 'p95_ms')):
+                alasan.append(f"p50 {lama['p50_ms']:.2f} -> {baru['p50_ms']:.2f} ms, p95 {lama['p95_ms']:.2f} -> {baru['p95_ms']:.2f} ms")
+            # Jumlah query deterministik: kenaikan sekecil apa pun adalah regresi
+            if baru['query_maks'] > lama['query_maks']:
+                alasan.append(f"query {lama['query_maks']} -> {baru['query_maks']}")
+            if baru['byte_rata'] > lama['byte_rata'] * (1 + ambang):
+                alasan.append(f"ukuran {lama['byte_rata']:.0f} -> {baru['byte_rata']:.0f} byte")
+            if baru['gagal'] > lama.get('gagal', 0):
+                alasan.append(f"gagal {lama.get('gagal', 0)} -> {baru['gagal']}")
+            if alasan:
+                regresi.append(nama)
+                self.stdout.write(self.style.ERROR(f'{nama:<28} REGRESI: {"; ".join(alasan)}'))
+            else:
+                self.stdout.write(f"{nama:<28} ok (p95 {lama['p95_ms']:.2f} -> {baru['p95_ms']:.2f} ms)")
+        return regresi
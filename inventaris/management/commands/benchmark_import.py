@@ -0,0 +1,88 @@
+import csv
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from inventaris import importer
+from inventaris.models import RiwayatStok, Stok
+
+# Target import: 100k baris jauh di bawah satu menit
+TARGET_BARIS = 100000
+TARGET_DETIK = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Ukur throughput import barang/stok (importer.py) di atas file CSV sintetis: '
+        'putaran pertama membuat semua barang dan stok, putaran kedua meng-upsert jumlah baru.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baris', type=int, default=TARGET_BARIS, help='Jumlah baris file CSV.')
+        parser.add_argument('--gudang', type=int, default=5, help='Jumlah gudang tujuan stok.')
+        parser.add_argument('--ukuran-batch', type=int, default=importer.UKURAN_BATCH)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--ketat', action='store_true',
+                            help=f'Gagal jika perkiraan waktu per {TARGET_BARIS} baris melebihi {TARGET_DETIK} detik.')
+        parser.add_argument('--data-ada', action='store_true',
+                            help='Pakai database yang dikonfigurasi (data import ikut tersimpan).')
+
+    def handle(self, *args, **options):
+        if options['baris'] < 1 or options['gudang'] < 1 or options['ukuran_batch'] < 1:
+            raise CommandError('--baris, --gudang dan --ukuran-batch harus lebih dari 0.')
+        if options['data_ada']:
+            self.jalankan(options)
+            return
+        # Import dijalankan di database test terpisah (dibuang setelah selesai)
+        lama = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.jalankan(options)
+        finally:
+            teardown_databases(lama, verbosity=0)
+
+    def tulis_csv(self, berkas, n, gudang, rng, putaran):
+        writer = csv.writer(berkas)
+        writer.writerow(['sku', 'nama', 'kategori', 'supplier', 'satuan', 'gudang', 'jumlah', 'level_reorder'])
+        for i in range(n):
+            writer.writerow([
+                f'BENCH-{i:07d}', f'Barang Benchmark {i}', f'Kategori {i % 50}', f'Supplier {i % 20}', 'pcs',
+                f'Gudang Benchmark {i % gudang}', rng.randint(0, 500) + putaran, 10,
+            ])
+        berkas.flush()
+        berkas.seek(0)
+
+    def jalankan(self, options):
+        n, rng = options['baris'], random.Random(options['seed'])
+        riwayat_awal = RiwayatStok.objects.count()
+        terlambat = False
+        for putaran, label in ((0, 'buat'), (1, 'upsert')):
+            with tempfile.TemporaryFile('w+', newline='', encoding='utf-8') as teks:
+                self.tulis_csv(teks, n, options['gudang'], rng, putaran)
+                with open(teks.fileno(), 'rb', closefd=False) as berkas:
+                    mulai = time.perf_counter()
+                    hasil = importer.impor_berkas(
+                        berkas, 'benchmark.csv', buat_referensi=True, ukuran_batch=options['ukuran_batch'],
+                    )
+                    detik = time.perf_counter() - mulai
+            per_target = detik / n * TARGET_BARIS
+            terlambat = terlambat or per_target > TARGET_DETIK
+            self.stdout.write(
+                f"[{label}] {n} baris dalam {detik:.2f}s ({n / detik:.0f} baris/s, ~{per_target:.1f}s per "
+                f"{TARGET_BARIS} baris): barang {hasil['barang_dibuat']} dibuat / {hasil['barang_diperbarui']} "
+                f"diperbarui, stok {hasil['stok_dibuat']} dibuat / {hasil['stok_diperbarui']} diperbarui, "
+                f"{hasil['gagal']} gagal"
+            )
+            if hasil['gagal']:
+                raise CommandError(f"Import gagal untuk {hasil['gagal']} baris: {hasil['errors'][:3]}")
+
+        # Ledger tetap konsisten: setiap perubahan jumlah tercatat sebagai riwayat
+        stok = Stok.objects.filter(barang__sku__startswith='BENCH-').count()
+        riwayat = RiwayatStok.objects.count() - riwayat_awal
+        self.stdout.write(f'{stok} stok, {riwayat} riwayat import tercatat.')
+        pesan = f'Target {TARGET_BARIS} baris < {TARGET_DETIK}s: ' + ('TIDAK tercapai' if terlambat else 'tercapai')
+        if terlambat and options['ketat']:
+            raise CommandError(pesan)
+        self.stdout.write(self.style.WARNING(pesan) if terlambat else self.style.SUCCESS(pesan))
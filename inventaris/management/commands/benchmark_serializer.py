@@ -0,0 +1,82 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from inventaris import sintetis
+from inventaris.serializer_cepat import kompilasi
+from inventaris.views import BarangViewSet, RiwayatStokViewSet, StokViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Bandingkan biaya per baris serializer list: ModelSerializer (instance model) '
+        'dan serializer terkompilasi (baris .values()), sekaligus memastikan output keduanya sama.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baris', type=int, default=1000, help='Baris per halaman yang diserialisasi.')
+        parser.add_argument('--ulang', type=int, default=7, help='Pengulangan per jalur; median yang dilaporkan.')
+        parser.add_argument('--skala', choices=sorted(sintetis.SKALA), default='kecil')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--data-ada', action='store_true',
+                            help='Pakai database yang dikonfigurasi, tanpa membuat data sintetis.')
+
+    def handle(self, *args, **options):
+        if options['baris'] < 1 or options['ulang'] < 1:
+            raise CommandError('--baris dan --ulang harus lebih dari 0.')
+        if options['data_ada']:
+            self.jalankan(options)
+            return
+        # Data sintetis dibuat di database test terpisah (dibuang setelah selesai)
+        lama = setup_databases(verbosity=0, interactive=False)
+        try:
+            sintetis.buat(options['skala'], seed=options['seed'])
+            self.jalankan(options)
+        finally:
+            teardown_databases(lama, verbosity=0)
+
+    def jalankan(self, options):
+        n, ulang = options['baris'], options['ulang']
+        self.stdout.write(f"{'serializer':<24}{'jalur':<12}{'baris':>6}{'ambil us':>10}{'serial us':>11}{'total us':>10}")
+        beda = []
+        for view in (StokViewSet, RiwayatStokViewSet, BarangViewSet):
+            serializer_class = view.serializer_class
+            cepat = kompilasi(serializer_class)
+            if cepat is None:
+                self.stdout.write(self.style.WARNING(f'{serializer_class.__name__} tidak bisa dikompilasi'))
+                continue
+            queryset = view.queryset.all()
+
+            def model():
+                objek = list(queryset[:n])
+                tengah = time.perf_counter()
+                return objek, tengah, serializer_class(objek, many=True).data
+
+            def terkompilasi():
+                rows = list(cepat.values(queryset)[:n])
+                tengah = time.perf_counter()
+                return rows, tengah, cepat.serialisasi(rows)
+
+            hasil = {}
+            for jalur, fungsi in (('model', model), ('kompilasi', terkompilasi)):
+                ambil, serial = [], []
+                for _ in range(ulang):
+                    mulai = time.perf_counter()
+                    rows, tengah, data = fungsi()
+                    selesai = time.perf_counter()
+                    ambil.append(tengah - mulai)
+                    serial.append(selesai - tengah)
+                jumlah = len(rows) or 1
+                hasil[jalur] = (data, statistics.median(ambil) / jumlah * 1e6, statistics.median(serial) / jumlah * 1e6)
+                _, a, s = hasil[jalur]
+                self.stdout.write(f'{serializer_class.__name__:<24}{jalur:<12}{len(rows):>6}{a:>10.1f}{s:>11.1f}{a + s:>10.1f}')
+
+            (data_model, a1, s1), (data_cepat, a2, s2) = hasil['model'], hasil['kompilasi']
+            self.stdout.write(f'{"":<24}{"percepatan":<12}{"":>6}{a1 / a2:>9.1f}x{s1 / s2:>10.1f}x{(a1 + s1) / (a2 + s2):>9.1f}x')
+            if [dict(row) for row in data_model] != data_cepat:
+                beda.append(serializer_class.__name__)
+        if beda:
+            raise CommandError(f'Output serializer terkompilasi berbeda untuk: {", ".join(beda)}')
+        self.stdout.write(self.style.SUCCESS('Output kedua jalur identik.'))
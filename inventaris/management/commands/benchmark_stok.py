@@ -0,0 +1,193 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count, Max, Min, Q, Sum
+
+from inventaris.models import Barang, Gudang, Kategori, RiwayatStok, Stok
+from inventaris.movements import PergerakanGagal, terapkan_pergerakan, terapkan_transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark konkurensi transaksi stok: banyak thread menulis ke satu baris stok '
+        '(hot), ke banyak baris (sebar), dan mentransfer stok bolak-balik antara dua gudang '
+        '(transfer), lalu memeriksa konsistensi ledger dan tidak adanya deadlock.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--transaksi', type=int, default=2000, help='Total transaksi per skenario.')
+        parser.add_argument('--baris', type=int, default=50, help='Jumlah baris stok untuk skenario sebar.')
+        parser.add_argument('--stok-awal', type=int, default=100)
+        parser.add_argument('--skenario', choices=['hot', 'sebar', 'transfer', 'semua'], default='semua')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--simpan', action='store_true', help='Jangan hapus data benchmark setelah selesai.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        skenario = ['hot', 'sebar', 'transfer'] if options['skenario'] == 'semua' else [options['skenario']]
+        prefix = f'BENCH-{uuid.uuid4().hex[:8]}'
+        kategori = Kategori.objects.create(nama=prefix)
+        gudang = Gudang.objects.create(nama=prefix, lokasi='benchmark')
+        gudang_lain = Gudang.objects.create(nama=f'{prefix}-2', lokasi='benchmark')
+        gagal_ledger = False
+        try:
+            for nama in skenario:
+                n_baris = 1 if nama == 'hot' else options['baris']
+                stok_list = self.siapkan(f'{prefix}-{nama}', kategori, gudang, n_baris, options['stok_awal'])
+                if nama == 'transfer':
+                    stok_list += self.siapkan_tujuan(stok_list, gudang_lain, options['stok_awal'])
+                    rencana = self.rencana_transfer(stok_list, gudang, gudang_lain, options['transaksi'])
+                    laporan = self.jalankan(rencana, options['threads'], self.transfer)
+                    selisih = self.periksa_ledger(stok_list, options['stok_awal']) + self.periksa_transfer(stok_list, options['stok_awal'])
+                else:
+                    laporan = self.jalankan(self.rencana_pergerakan(stok_list, options['transaksi']), options['threads'], terapkan_pergerakan)
+                    selisih = self.periksa_ledger(stok_list, options['stok_awal'])
+                gagal_ledger |= not self.cetak(nama, n_baris, options, laporan, selisih)
+        finally:
+            if not options['simpan']:
+                kategori.delete()
+                gudang.delete()
+                gudang_lain.delete()
+        if gagal_ledger:
+            raise CommandError('Ledger stok tidak konsisten (atau terjadi deadlock) setelah benchmark.')
+
+    def siapkan(self, prefix, kategori, gudang, n_baris, stok_awal):
+        barang = Barang.objects.bulk_create([
+            Barang(sku=f'{prefix}-{i}', nama=f'Benchmark {i}', kategori=kategori, satuan='pcs')
+            for i in range(n_baris)
+        ])
+        return list(Stok.objects.bulk_create([
+            Stok(barang=b, gudang=gudang, jumlah=stok_awal, level_reorder=0) for b in barang
+        ]))
+
+    def siapkan_tujuan(self, stok_list, gudang, stok_awal):
+        return list(Stok.objects.bulk_create([
+            Stok(barang_id=s.barang_id, gudang=gudang, jumlah=stok_awal, level_reorder=0) for s in stok_list
+        ]))
+
+    # Rencana transaksi dibuat di depan agar setiap thread tidak berbagi RNG
+    def rencana_pergerakan(self, stok_list, total):
+        return [
+            {'stok': self.rng.choice(stok_list).pk, 'barang': None, 'gudang': None,
+             'tipe': self.rng.choice(('IN', 'OUT', 'OUT')), 'jumlah': self.rng.randint(1, 5), 'catatan': 'benchmark'}
+            for _ in range(total)
+        ]
+
+    def rencana_transfer(self, stok_list, gudang, gudang_lain, total):
+        """Batch 1-3 transfer dengan arah acak: dua batch bisa mengunci baris yang sama dalam urutan terbalik."""
+        barang_ids = sorted({s.barang_id for s in stok_list})
+        rencana = []
+        for _ in range(total):
+            batch = []
+            for barang_id in self.rng.sample(barang_ids, min(len(barang_ids), self.rng.randint(1, 3))):
+                dari, ke = self.rng.sample((gudang.pk, gudang_lain.pk), 2)
+                batch.append({'barang': barang_id, 'dari_gudang': dari, 'ke_gudang': ke,
+                              'jumlah': self.rng.randint(1, 5), 'catatan': 'benchmark'})
+            rencana.append(batch)
+        return rencana
+
+    def transfer(self, batch):
+        hasil, berhasil = terapkan_transfer(batch)
+        if not berhasil:
+            raise PergerakanGagal(hasil)
+
+    def jalankan(self, rencana, n_thread, terapkan):
+        latensi, hasil = [], {'ok': 0, 'ditolak': 0, 'error': 0, 'deadlock': 0}
+        lock = threading.Lock()
+        bagian = [rencana[i::n_thread] for i in range(n_thread)]
+
+        def pekerja(items):
+            lokal_latensi, lokal = [], {'ok': 0, 'ditolak': 0, 'error': 0, 'deadlock': 0}
+            for item in items:
+                mulai = time.perf_counter()
+                try:
+                    terapkan(item)
+                    lokal['ok'] += 1
+                except PergerakanGagal:
+                    lokal['ditolak'] += 1
+                except OperationalError as e:
+                    # mis. "database is locked" di SQLite saat antrean penulis terlalu panjang;
+                    # deadlock (PostgreSQL: "deadlock detected") dihitung terpisah karena harus 0
+                    lokal['deadlock' if 'deadlock' in str(e).lower() else 'error'] += 1
+                lokal_latensi.append(time.perf_counter() - mulai)
+            with lock:
+                latensi.extend(lokal_latensi)
+                for k, v in lokal.items():
+                    hasil[k] += v
+
+        def pekerja_thread(items):
+            try:
+                pekerja(items)
+            finally:
+                connection.close()
+
+        mulai = time.perf_counter()
+        if n_thread == 1:
+            pekerja(bagian[0])
+        else:
+            threads = [threading.Thread(target=pekerja_thread, args=(b,)) for b in bagian]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        durasi = time.perf_counter() - mulai
+        return {'durasi': durasi, 'latensi': sorted(latensi), **hasil}
+
+    def periksa_ledger(self, stok_list, stok_awal):
+        """Jumlah akhir setiap stok harus = awal + total IN - total OUT dan tidak negatif."""
+        ringkas = {
+            row['stok_id']: row for row in
+            RiwayatStok.objects.filter(stok__in=stok_list).values('stok_id').annotate(
+                masuk=Sum('jumlah', filter=Q(tipe='IN')), keluar=Sum('jumlah', filter=Q(tipe='OUT')),
+            )
+        }
+        selisih = []
+        for stok in Stok.objects.filter(pk__in=[s.pk for s in stok_list]):
+            row = ringkas.get(stok.pk, {})
+            harapan = stok_awal + (row.get('masuk') or 0) - (row.get('keluar') or 0)
+            if stok.jumlah != harapan or stok.jumlah < 0:
+                selisih.append((stok.pk, stok.jumlah, harapan))
+        return selisih
+
+    def periksa_transfer(self, stok_list, stok_awal):
+        """Total per barang di kedua gudang tetap, dan setiap kode_transfer punya tepat satu OUT dan satu IN."""
+        selisih = [
+            (f'barang#{row["barang_id"]}', row['total'], 2 * stok_awal) for row in
+            Stok.objects.filter(pk__in=[s.pk for s in stok_list]).values('barang_id').annotate(total=Sum('jumlah'))
+            if row['total'] != 2 * stok_awal
+        ]
+        pasangan = (
+            RiwayatStok.objects.filter(stok__in=stok_list, kode_transfer__isnull=False).values('kode_transfer')
+            .annotate(n=Count('id'), masuk=Count('id', filter=Q(tipe='IN')),
+                      jumlah_min=Min('jumlah'), jumlah_max=Max('jumlah'))
+        )
+        selisih += [
+            (f'transfer {row["kode_transfer"]}', row['n'], 2) for row in pasangan
+            if (row['n'], row['masuk']) != (2, 1) or row['jumlah_min'] != row['jumlah_max']
+        ]
+        return selisih
+
+    def cetak(self, nama, n_baris, options, laporan, selisih):
+        latensi = laporan['latensi']
+        p50 = statistics.median(latensi) * 1000 if latensi else 0
+        p99 = latensi[min(len(latensi) - 1, int(len(latensi) * 0.99))] * 1000 if latensi else 0
+        tps = (laporan['ok'] + laporan['ditolak']) / laporan['durasi'] if laporan['durasi'] else 0
+        self.stdout.write(
+            f"[{nama}] baris={n_baris} threads={options['threads']} transaksi={len(latensi)} "
+            f"ok={laporan['ok']} ditolak={laporan['ditolak']} error={laporan['error']} deadlock={laporan['deadlock']} "
+            f"durasi={laporan['durasi']:.2f}s tps={tps:.1f} p50={p50:.2f}ms p99={p99:.2f}ms"
+        )
+        if selisih:
+            self.stdout.write(self.style.ERROR(f'[{nama}] ledger TIDAK konsisten: {selisih[:10]}'))
+            return False
+        if laporan['deadlock']:
+            self.stdout.write(self.style.ERROR(f'[{nama}] {laporan["deadlock"]} transaksi gagal karena deadlock'))
+            return False
+        self.stdout.write(self.style.SUCCESS(f'[{nama}] ledger konsisten'))
+        return True
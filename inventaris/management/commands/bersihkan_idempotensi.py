@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventaris import idempotensi
+
+
+class Command(BaseCommand):
+    help = (
+        'Hapus response Idempotency-Key yang sudah melewati TTL (INVENTARIS_IDEMPOTENSI TTL_JAM). '
+        'Jalankan berkala lewat cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help='Jumlah baris per DELETE.')
+        parser.add_argument('--dry-run', action='store_true', help='Hanya hitung key kedaluwarsa.')
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError('--batch harus lebih dari 0.')
+        jumlah = idempotensi.bersihkan(options['batch'], options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{jumlah} key kedaluwarsa akan dihapus.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{jumlah} key kedaluwarsa dihapus.'))
@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventaris import checkpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Simpan checkpoint jumlah semua stok (jalankan terjadwal, mis. setiap malam lewat cron) '
+        'agar query stok pada waktu tertentu (?as_of=) tidak perlu menelusuri seluruh riwayat.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hapus-lebih-dari', type=int, metavar='HARI',
+                            help='Hapus checkpoint yang lebih tua dari jumlah hari ini.')
+
+    def handle(self, *args, **options):
+        jumlah, waktu = checkpoint.buat_checkpoint()
+        self.stdout.write(self.style.SUCCESS(f'Checkpoint {waktu.isoformat()}: {jumlah} baris stok disimpan.'))
+
+        hari = options['hapus_lebih_dari']
+        if hari is not None:
+            if hari < 1:
+                raise CommandError('--hapus-lebih-dari harus lebih dari 0.')
+            dihapus = checkpoint.hapus_checkpoint_sebelum(timezone.now() - datetime.timedelta(days=hari))
+            self.stdout.write(f'{dihapus} baris checkpoint lama dihapus.')
@@ -0,0 +1,41 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventaris import importer
+
+
+class Command(BaseCommand):
+    help = 'Import barang dan stok dari file CSV/XLSX (upsert berdasarkan SKU dan barang+gudang).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('berkas', help='Path file .csv atau .xlsx')
+        parser.add_argument('--buat-referensi', action='store_true',
+                            help='Buat kategori/supplier/gudang yang belum ada.')
+        parser.add_argument('--ukuran-batch', type=int, default=importer.UKURAN_BATCH)
+        parser.add_argument('--laporan', help='Tulis error per baris ke file CSV ini.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['berkas'], 'rb') as berkas:
+                hasil = importer.impor_berkas(
+                    berkas, options['berkas'],
+                    buat_referensi=options['buat_referensi'], ukuran_batch=options['ukuran_batch'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        errors = hasil.pop('errors')
+        if options['laporan'] and errors:
+            with open(options['laporan'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['baris', 'sku', 'errors'])
+                for e in errors:
+                    writer.writerow([e['baris'], e['sku'], json.dumps(e['errors'], ensure_ascii=False)])
+        for e in errors[:20]:
+            self.stdout.write(self.style.WARNING(f"Baris {e['baris']} ({e['sku']}): {e['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            'Selesai dalam {durasi}s: {baris} baris, barang {barang_dibuat} dibuat / {barang_diperbarui} diperbarui, '
+            'stok {stok_dibuat} dibuat / {stok_diperbarui} diperbarui, {gagal} gagal.'.format(**hasil)
+        ))
@@ -0,0 +1,128 @@
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from inventaris import tugas
+
+
+def _inisialisasi_proses():
+    # Proses anak hasil spawn (bukan fork) harus menyiapkan Django sendiri
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Jalankan pekerja tugas latar (export, hapus kategori besar, bangun rekap, rekonsiliasi stok) '
+        'dari tabel Tugas. '
+        'Beberapa pekerja boleh berjalan bersamaan; hentikan dengan Ctrl+C/SIGTERM '
+        '(tugas yang sedang berjalan diselesaikan lebih dulu).'
+    )
+
+    def add_arguments(self, parser):
+        conf = tugas.konfigurasi()
+        parser.add_argument('--konkurensi', type=int, default=conf['KONKURENSI'],
+                            help='Jumlah tugas yang dijalankan bersamaan (default INVENTARIS_TUGAS KONKURENSI).')
+        parser.add_argument('--mode', choices=('thread', 'proses'), default='thread',
+                            help='Pool thread (default) atau proses (untuk tugas yang berat di CPU).')
+        parser.add_argument('--jenis', action='append', default=None,
+                            help='Hanya ambil tugas jenis ini (boleh diulang). Default semua jenis terdaftar.')
+        parser.add_argument('--interval', type=float, default=conf['INTERVAL'],
+                            help='Detik antar pemeriksaan antrian.')
+        parser.add_argument('--sekali', action='store_true',
+                            help='Berhenti setelah antrian kosong dan semua tugas selesai.')
+        parser.add_argument('--sinkron', action='store_true',
+                            help='Jalankan tugas satu per satu di proses ini tanpa pool (untuk debug/test); '
+                                 'menyiratkan --sekali.')
+
+    def handle(self, *args, **options):
+        if options['konkurensi'] < 1 or options['interval'] <= 0:
+            raise CommandError('--konkurensi dan --interval harus lebih dari 0.')
+        tidak_dikenal = set(options['jenis'] or ()) - set(tugas.semua_jenis())
+        if tidak_dikenal:
+            raise CommandError(f'Jenis tugas tidak dikenal: {", ".join(sorted(tidak_dikenal))}')
+
+        self.pekerja = tugas.nama_pekerja()
+        dihapus = tugas.bersihkan()
+        if dihapus:
+            self.stdout.write(f'{dihapus} tugas lama dibersihkan.')
+        if options['sinkron']:
+            self.jalankan_sinkron(options)
+        else:
+            self.jalankan_pool(options)
+
+    def lapor(self, tugas_id, status):
+        gaya = self.style.SUCCESS if status == 'selesai' else self.style.WARNING
+        self.stdout.write(gaya(f'Tugas #{tugas_id}: {status}'))
+
+    def jalankan_sinkron(self, options):
+        tugas.pulihkan_macet()
+        while True:
+            ids = tugas.klaim(self.pekerja, 1, options['jenis'])
+            if not ids:
+                break
+            self.lapor(ids[0], tugas.jalankan(ids[0]))
+
+    def jalankan_pool(self, options):
+        konkurensi, interval = options['konkurensi'], options['interval']
+        berhenti = threading.Event()
+
+        def hentikan(signum, frame):
+            self.stdout.write('Berhenti setelah tugas yang sedang berjalan selesai...')
+            berhenti.set()
+        signal.signal(signal.SIGTERM, hentikan)
+        signal.signal(signal.SIGINT, hentikan)
+
+        if options['mode'] == 'proses':
+            # Koneksi database tidak boleh ikut diwariskan ke proses anak
+            connections.close_all()
+            pool = ProcessPoolExecutor(konkurensi, mp_context=multiprocessing.get_context(),
+                                       initializer=_inisialisasi_proses)
+        else:
+            pool = ThreadPoolExecutor(konkurensi, thread_name_prefix='tugas')
+
+        jeda_detak = max(1.0, tugas.konfigurasi()['BATAS_DETAK'] / 10)
+        detak_terakhir = 0.0
+        berjalan = {}
+        self.stdout.write(f'Pekerja {self.pekerja} berjalan ({options["mode"]}, konkurensi {konkurensi}).')
+        try:
+            while not berhenti.is_set():
+                sekarang = time.monotonic()
+                if sekarang - detak_terakhir >= jeda_detak:
+                    tugas.detak(berjalan.values())
+                    tugas.pulihkan_macet()
+                    detak_terakhir = sekarang
+                ids = tugas.klaim(self.pekerja, konkurensi - len(berjalan), options['jenis'])
+                if options['mode'] == 'proses':
+                    connections.close_all()
+                for tugas_id in ids:
+                    berjalan[pool.submit(tugas.jalankan_terisolasi, tugas_id)] = tugas_id
+                if options['sekali'] and not berjalan:
+                    break
+                if berjalan:
+                    selesai, _ = wait(berjalan, timeout=interval, return_when=FIRST_COMPLETED)
+                else:
+                    selesai = ()
+                    berhenti.wait(interval)
+                for future in selesai:
+                    tugas_id = berjalan.pop(future)
+                    try:
+                        self.lapor(tugas_id, future.result())
+                    except Exception as e:
+                        # Error di luar fungsi tugas (mis. koneksi database putus);
+                        # tugasnya akan dipulihkan lewat detak yang kedaluwarsa
+                        self.stderr.write(f'Tugas #{tugas_id}: pekerja error: {e}')
+        finally:
+            # Tugas yang sedang berjalan tetap diselesaikan; detaknya terus diperbarui
+            while berjalan:
+                selesai, _ = wait(berjalan, timeout=jeda_detak, return_when=FIRST_COMPLETED)
+                for future in selesai:
+                    tugas_id = berjalan.pop(future)
+                    self.lapor(tugas_id, future.result() if future.exception() is None else 'error')
+                tugas.detak(berjalan.values())
+            pool.shutdown()
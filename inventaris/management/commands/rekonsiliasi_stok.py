@@ -0,0 +1,75 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventaris import rekonsiliasi
+from inventaris.models import Gudang
+
+
+class Command(BaseCommand):
+    help = (
+        'Cocokkan Stok.jumlah dengan total IN - OUT riwayatnya (aktif + arsip), dihitung di database '
+        'per chunk stok dan dibagi per gudang ke pool proses. Dengan --perbaiki, selisih dicatat '
+        'sebagai riwayat penyesuaian (Stok.jumlah tidak diubah).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gudang', type=int, action='append', default=None,
+                            help='Batasi ke gudang ini (id, boleh diulang). Default semua gudang.')
+        parser.add_argument('--pekerja', type=int, default=os.cpu_count() or 1,
+                            help='Jumlah gudang yang diperiksa bersamaan (default jumlah CPU).')
+        parser.add_argument('--mode', choices=('proses', 'thread'), default='proses',
+                            help='Pool proses (default) atau thread.')
+        parser.add_argument('--chunk', type=int, default=rekonsiliasi.UKURAN_CHUNK,
+                            help='Jumlah stok per query agregasi.')
+        parser.add_argument('--perbaiki', action='store_true',
+                            help='Tulis riwayat penyesuaian untuk setiap selisih.')
+        parser.add_argument('--user', help='Username pencatat riwayat penyesuaian.')
+        parser.add_argument('--tampilkan', type=int, default=20,
+                            help='Jumlah selisih yang ditampilkan per gudang.')
+
+    def handle(self, *args, **options):
+        if options['pekerja'] < 1 or options['chunk'] < 1:
+            raise CommandError('--pekerja dan --chunk harus lebih dari 0.')
+        gudang = options['gudang']
+        if gudang:
+            tidak_ada = set(gudang) - set(Gudang.objects.filter(pk__in=gudang).values_list('id', flat=True))
+            if tidak_ada:
+                raise CommandError(f'Gudang tidak ditemukan: {", ".join(map(str, sorted(tidak_ada)))}')
+        user_id = None
+        if options['user']:
+            try:
+                user_id = get_user_model().objects.get(username=options['user']).pk
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'User {options["user"]} tidak ditemukan.')
+
+        mulai = time.monotonic()
+        semua = rekonsiliasi.rekonsiliasi(
+            gudang, pekerja=options['pekerja'], mode=options['mode'], ukuran_chunk=options['chunk'],
+            perbaiki=options['perbaiki'], user_id=user_id, callback=self.lapor_gudang,
+        )
+        for hasil in semua:
+            if not hasil['selisih']:
+                continue
+            self.stdout.write(self.style.ERROR(f"Gudang {hasil['gudang']}: {len(hasil['selisih'])} stok selisih"))
+            for stok_id, jumlah, total in hasil['selisih'][:options['tampilkan']]:
+                self.stdout.write(f'  stok={stok_id} jumlah={jumlah} riwayat={total}')
+
+        stok = sum(h['stok'] for h in semua)
+        selisih = sum(len(h['selisih']) for h in semua)
+        detik = time.monotonic() - mulai
+        self.stdout.write(f'{len(semua)} gudang, {stok} stok diperiksa dalam {detik:.1f} detik, {selisih} selisih.')
+        if options['perbaiki']:
+            if selisih:
+                self.stdout.write(self.style.SUCCESS(f'{selisih} riwayat penyesuaian dicatat.'))
+        elif selisih:
+            raise CommandError('Ledger stok tidak konsisten; jalankan dengan --perbaiki untuk mencatat penyesuaian.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Stok.jumlah cocok dengan riwayat.'))
+
+    def lapor_gudang(self, hasil):
+        self.stdout.write(
+            f"Gudang {hasil['gudang']}: {hasil['stok']} stok, {len(hasil['selisih'])} selisih ({hasil['detik']} detik)"
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventaris import arsip
+
+
+class Command(BaseCommand):
+    help = (
+        'Pastikan riwayat aktif + arsip masih cocok dengan rekap harian dan Stok.jumlah '
+        '(tidak ada riwayat yang hilang atau terduplikasi saat pengarsipan).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gudang', type=int, help='Batasi ke satu gudang (id).')
+        parser.add_argument('--abaikan-ledger', action='store_true',
+                            help='Jangan gagal jika Stok.jumlah berbeda dengan total riwayat '
+                                 '(mis. stok awal yang diisi tanpa riwayat).')
+
+    def handle(self, *args, **options):
+        hasil = arsip.verifikasi(options['gudang'])
+        self.stdout.write(f"{hasil['stok']} stok diperiksa, {hasil['arsip']} riwayat di arsip.")
+
+        gagal = False
+        for kunci, judul, label in (
+            ('duplikat', 'Riwayat ada di tabel aktif dan arsip sekaligus', None),
+            ('rekap_selisih', 'Total rekap harian != total riwayat aktif + arsip', ('rekap', 'riwayat')),
+            ('ledger_selisih', 'Stok.jumlah != total riwayat aktif + arsip', ('jumlah', 'riwayat')),
+        ):
+            baris = hasil[kunci]
+            if not baris:
+                continue
+            if kunci != 'ledger_selisih' or not options['abaikan_ledger']:
+                gagal = True
+            self.stdout.write(self.style.ERROR(f'{judul}: {len(baris)}'))
+            for item in baris[:20]:
+                if label is None:
+                    self.stdout.write(f'  id={item}')
+                else:
+                    self.stdout.write(f'  stok={item[0]} {label[0]}={item[1]} {label[1]}={item[2]}')
+
+        if gagal:
+            raise CommandError('Verifikasi arsip gagal.')
+        self.stdout.write(self.style.SUCCESS('Arsip dan riwayat aktif konsisten.'))
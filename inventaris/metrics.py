@@ -0,0 +1,358 @@
+"""Instrumentasi performa per request: header Server-Timing dan metrik Prometheus.
+
+`MetrikMiddleware` (lihat MIDDLEWARE di settings) mengukur setiap request:
+  - jumlah dan total waktu query SQL, lewat `execute_wrapper` di semua koneksi
+    database, beserta beberapa statement terlambat;
+  - waktu fase `auth` (TokenAuthentication), `serializer` (serializer
+    inventaris) dan `render` (renderer DRF). Waktu fase tidak termasuk SQL yang
+    berjalan di dalamnya; sisanya (view, filter, middleware) dilaporkan sebagai
+    `app`, sehingga db + fase + app = total.
+
+Hasilnya dikirim sebagai header `Server-Timing` (terlihat di tab Network
+browser; teks SQL hanya untuk user staff atau saat DEBUG) dan diagregasi per
+rute (nama URL) menjadi histogram yang bisa di-scrape dari `/api/metrics/`
+dalam format teks Prometheus. Request yang lebih lambat dari `AMBANG_LAMBAT_MS`
+dicatat ke logger `inventaris.metrics` (sebagian saja jika `SAMPEL_LAMBAT` < 1).
+
+Biaya per request: dua `perf_counter()` per query, beberapa per fase, dan satu
+lock saat mencatat ke histogram. Metrik disimpan di memori proses; jika server
+berjalan multi-proses, setiap proses melaporkan angkanya sendiri. Middleware
+ini hybrid: di bawah ASGI ia berjalan sebagai coroutine tanpa adaptasi
+sync_to_async di sekitarnya.
+"""
+import bisect
+import contextvars
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+KONFIGURASI_DEFAULT = {
+    'AKTIF': True,
+    'SERVER_TIMING': True,
+    'AMBANG_LAMBAT_MS': 500,
+    # Proporsi request lambat yang ditulis ke log (1.0 = semua)
+    'SAMPEL_LAMBAT': 1.0,
+    # Banyaknya statement terlambat yang disimpan per request
+    'SQL_TERLAMBAT': 3,
+}
+BUCKET_DETIK = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKET_QUERY = (0, 1, 2, 5, 10, 20, 50, 100)
+RUTE_TIDAK_DIKENAL = 'tidak-dikenal'
+
+logger = logging.getLogger(__name__)
+
+# Rekaman request yang sedang berjalan; None di luar request (command, shell)
+_rekaman = contextvars.ContextVar('inventaris_metrik', default=None)
+
+
+def konfigurasi():
+    return {**KONFIGURASI_DEFAULT, **getattr(settings, 'INVENTARIS_METRICS', {})}
+
+
+class Rekaman:
+    """Pengukuran satu request. Dipasang sebagai execute_wrapper di setiap koneksi."""
+
+    def __init__(self, batas_sql):
+        self.mulai = time.perf_counter()
+        self.batas_sql = batas_sql
+        self.query = 0
+        self.waktu_sql = 0.0
+        self.sql_terlambat = []  # min-heap (durasi, urutan, sql)
+        self.fase = None
+        self.mulai_fase = 0.0
+        self.waktu_fase = {}
+        self.sql_fase = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        mulai = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            durasi = time.perf_counter() - mulai
+            self.query += 1
+            self.waktu_sql += durasi
+            if self.fase is not None:
+                self.sql_fase[self.fase] = self.sql_fase.get(self.fase, 0.0) + durasi
+            if len(self.sql_terlambat) < self.batas_sql:
+                heapq.heappush(self.sql_terlambat, (durasi, self.query, sql))
+            elif self.sql_terlambat and durasi > self.sql_terlambat[0][0]:
+                heapq.heapreplace(self.sql_terlambat, (durasi, self.query, sql))
+
+    def masuk_fase(self, fase):
+        # Fase tidak bersarang: blok di dalam fase lain dihitung sebagai fase luarnya
+        if self.fase is not None:
+            return False
+        self.fase = fase
+        self.mulai_fase = time.perf_counter()
+        return True
+
+    def keluar_fase(self):
+        if self.fase is not None:
+            self.waktu_fase[self.fase] = self.waktu_fase.get(self.fase, 0.0) + time.perf_counter() - self.mulai_fase
+            self.fase = None
+
+    def rincian(self):
+        """(total, {fase: detik}) dengan waktu fase di luar SQL dan sisa waktu sebagai `app`."""
+        total = time.perf_counter() - self.mulai
+        fase = {'db': self.waktu_sql}
+        for nama, durasi in self.waktu_fase.items():
+            fase[nama] = max(durasi - self.sql_fase.get(nama, 0.0), 0.0)
+        fase['app'] = max(total - sum(fase.values()), 0.0)
+        return total, fase
+
+    def terlambat(self):
+        return [(durasi, sql) for durasi, _, sql in sorted(self.sql_terlambat, reverse=True)]
+
+
+@contextmanager
+def ukur(fase):
+    """Catat waktu blok sebagai `fase` pada request yang sedang diukur.
+
+    Tidak melakukan apa pun di luar request atau di dalam fase lain.
+    """
+    rekaman = _rekaman.get()
+    if rekaman is None or not rekaman.masuk_fase(fase):
+        yield
+        return
+    try:
+        yield
+    finally:
+        rekaman.keluar_fase()
+
+
+def _pasang(rekaman):
+    stack = ExitStack()
+    for koneksi in connections.all():
+        stack.enter_context(koneksi.execute_wrapper(rekaman))
+    return stack
+
+
+def _teks_desc(teks, panjang=100):
+    # Tanda kutip identifier dibuang agar muat di quoted-string header
+    teks = ' '.join(str(teks).replace('"', '').replace('\\', '').split())[:panjang]
+    return teks.encode('ascii', 'replace').decode('ascii')
+
+
+def server_timing(rekaman, total, fase, dengan_sql):
+    bagian = [f'db;dur={fase["db"] * 1000:.2f};desc="{rekaman.query} query"']
+    bagian += [f'{nama};dur={durasi * 1000:.2f}' for nama, durasi in fase.items() if nama != 'db']
+    bagian.append(f'total;dur={total * 1000:.2f}')
+    if dengan_sql:
+        bagian += [
+            f'sql-{i};dur={durasi * 1000:.2f};desc="{_teks_desc(sql)}"'
+            for i, (durasi, sql) in enumerate(rekaman.terlambat(), start=1)
+        ]
+    return ', '.join(bagian)
+
+
+def _rute(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name if match is not None else None) or RUTE_TIDAK_DIKENAL
+
+
+class _Histogram:
+    __slots__ = ('batas', 'bucket', 'jumlah', 'total')
+
+    def __init__(self, batas):
+        self.batas = batas
+        self.bucket = [0] * (len(batas) + 1)
+        self.jumlah = 0
+        self.total = 0.0
+
+    def amati(self, nilai):
+        self.bucket[bisect.bisect_left(self.batas, nilai)] += 1
+        self.jumlah += 1
+        self.total += nilai
+
+    def kumulatif(self):
+        hasil, berjalan = [], 0
+        for batas, n in zip((*self.batas, '+Inf'), self.bucket):
+            berjalan += n
+            hasil.append((batas, berjalan))
+        return hasil
+
+
+class _DataRute:
+    __slots__ = ('durasi', 'query', 'fase', 'lambat')
+
+    def __init__(self):
+        self.durasi = _Histogram(BUCKET_DETIK)
+        self.query = _Histogram(BUCKET_QUERY)
+        self.fase = {}
+        self.lambat = 0
+
+
+def _label(**label):
+    isi = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in label.items()
+    )
+    return '{' + isi + '}'
+
+
+class Registri:
+    """Agregat metrik per (rute, method) di memori proses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._rute = {}
+        self._status = {}
+
+    def catat(self, rute, metode, status, total, query, fase, lambat=False):
+        with self._lock:
+            data = self._rute.get((rute, metode))
+            if data is None:
+                data = self._rute[(rute, metode)] = _DataRute()
+            data.durasi.amati(total)
+            data.query.amati(query)
+            for nama, durasi in fase.items():
+                data.fase[nama] = data.fase.get(nama, 0.0) + durasi
+            data.lambat += lambat
+            kunci = (rute, metode, status)
+            self._status[kunci] = self._status.get(kunci, 0) + 1
+
+    def teks_prometheus(self):
+        with self._lock:
+            rute = sorted(self._rute.items())
+            status = sorted(self._status.items())
+            baris = []
+
+            def histogram(nama, bantuan, ambil):
+                baris.extend((f'# HELP {nama} {bantuan}', f'# TYPE {nama} histogram'))
+                for (r, m), data in rute:
+                    h = ambil(data)
+                    for batas, n in h.kumulatif():
+                        baris.append(f'{nama}_bucket{_label(route=r, method=m, le=batas)} {n}')
+                    baris.append(f'{nama}_sum{_label(route=r, method=m)} {h.total:.6f}')
+                    baris.append(f'{nama}_count{_label(route=r, method=m)} {h.jumlah}')
+
+            histogram('inventaris_http_request_duration_seconds', 'Lama request per rute.', lambda d: d.durasi)
+            histogram('inventaris_http_request_queries', 'Jumlah query SQL per request.', lambda d: d.query)
+
+            baris.extend(('# HELP inventaris_http_request_phase_seconds_total Total waktu per fase (db, auth, serializer, render, app).',
+                          '# TYPE inventaris_http_request_phase_seconds_total counter'))
+            for (r, m), data in rute:
+                for fase, durasi in sorted(data.fase.items()):
+                    baris.append(f'inventaris_http_request_phase_seconds_total{_label(route=r, method=m, phase=fase)} {durasi:.6f}')
+
+            baris.extend(('# HELP inventaris_http_slow_requests_total Request yang melewati ambang lambat.',
+                          '# TYPE inventaris_http_slow_requests_total counter'))
+            for (r, m), data in rute:
+                baris.append(f'inventaris_http_slow_requests_total{_label(route=r, method=m)} {data.lambat}')
+
+            baris.extend(('# HELP inventaris_http_requests_total Jumlah request per status.',
+                          '# TYPE inventaris_http_requests_total counter'))
+            for (r, m, s), n in status:
+                baris.append(f'inventaris_http_requests_total{_label(route=r, method=m, status=s)} {n}')
+        return '\n'.join(baris) + '\n'
+
+
+registri = Registri()
+
+
+def _selesai(rekaman, request, response, rute, conf):
+    total, fase = rekaman.rincian()
+    lambat = total * 1000 >= conf['AMBANG_LAMBAT_MS']
+    registri.catat(rute, request.method, response.status_code, total, rekaman.query, fase, lambat)
+    if lambat and random.random() < conf['SAMPEL_LAMBAT']:
+        logger.warning(
+            'Request lambat %s %s (%s) status=%s total=%.1fms query=%d fase=%s sql_terlambat=%s',
+            request.method, request.get_full_path(), rute, response.status_code, total * 1000, rekaman.query,
+            {nama: round(durasi * 1000, 2) for nama, durasi in fase.items()},
+            [(round(durasi * 1000, 2), sql[:500]) for durasi, sql in rekaman.terlambat()],
+        )
+
+
+def _alirkan(isi, rekaman, selesai):
+    # Query export streaming berjalan saat isinya dialirkan, setelah middleware selesai
+    iterator = iter(isi)
+    try:
+        while True:
+            with _pasang(rekaman):
+                try:
+                    bagian = next(iterator)
+                except StopIteration:
+                    return
+            yield bagian
+    finally:
+        selesai()
+
+
+class MetrikMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        conf = konfigurasi()
+        if not conf['AKTIF']:
+            return self.get_response(request)
+
+        rekaman = Rekaman(conf['SQL_TERLAMBAT'])
+        token = _rekaman.set(rekaman)
+        try:
+            with _pasang(rekaman):
+                response = self.get_response(request)
+        finally:
+            rekaman.keluar_fase()
+            _rekaman.reset(token)
+        return self._akhiri(request, response, rekaman, conf)
+
+    async def __acall__(self, request):
+        conf = konfigurasi()
+        if not conf['AKTIF']:
+            return await self.get_response(request)
+
+        rekaman = Rekaman(conf['SQL_TERLAMBAT'])
+        token = _rekaman.set(rekaman)
+        try:
+            # Query ORM di bawah ASGI berjalan di thread sync_to_async (thread_sensitive,
+            # satu thread per request), jadi execute_wrapper dipasang di koneksi thread itu.
+            stack = await sync_to_async(_pasang)(rekaman)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            rekaman.keluar_fase()
+            _rekaman.reset(token)
+        # request.user bisa masih lazy (query sesi), jadi header dan histogram diisi di thread sync
+        return await sync_to_async(self._akhiri)(request, response, rekaman, conf)
+
+    def _akhiri(self, request, response, rekaman, conf):
+        rute = _rute(request)
+        if conf['SERVER_TIMING']:
+            user = getattr(request, 'user', None)
+            dengan_sql = settings.DEBUG or bool(user is not None and user.is_staff)
+            response['Server-Timing'] = server_timing(rekaman, *rekaman.rincian(), dengan_sql)
+        if response.streaming and not getattr(response, 'is_async', False):
+            # Header sudah terkirim; histogram mencatat sampai isi selesai dialirkan
+            response.streaming_content = _alirkan(
+                response.streaming_content, rekaman, lambda: _selesai(rekaman, request, response, rute, conf))
+        else:
+            _selesai(rekaman, request, response, rute, conf)
+        return response
+
+    def process_template_response(self, request, response):
+        # Response DRF di-render setelah middleware ini; callback menutup fase render
+        rekaman = _rekaman.get()
+        if rekaman is not None and rekaman.masuk_fase('render'):
+            response.add_post_render_callback(lambda r: rekaman.keluar_fase())
+        return response
+
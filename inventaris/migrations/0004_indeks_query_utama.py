@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0003_alter_barang_gambar_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='barang',
+            index=models.Index(fields=['-dibuat_pada'], name='barang_dibuat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riwayatstok',
+            index=models.Index(fields=['-dibuat_pada', '-id'], name='riwayat_dibuat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riwayatstok',
+            index=models.Index(fields=['tipe', '-dibuat_pada', '-id'], name='riwayat_tipe_dibuat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riwayatstok',
+            index=models.Index(fields=['dibuat_oleh', '-dibuat_pada', '-id'], name='riwayat_petugas_dibuat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stok',
+            index=models.Index(condition=models.Q(('jumlah__gt', 0)), fields=['-diperbarui_pada', '-id'], name='stok_tersedia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stok',
+            index=models.Index(condition=models.Q(('jumlah__gt', 0)), fields=['gudang', '-diperbarui_pada', '-id'], name='stok_gudang_tersedia_idx'),
+        ),
+    ]
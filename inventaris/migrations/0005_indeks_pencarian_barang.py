@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def buat_index(apps, schema_editor):
+    # FTS5 hanya ada di SQLite; database lain tetap memakai pencarian icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS inventaris_barang_fts '
+        'USING fts5(sku, nama, kategori, supplier, tokenize="unicode61 remove_diacritics 2")'
+    )
+    schema_editor.execute(
+        'INSERT INTO inventaris_barang_fts (rowid, sku, nama, kategori, supplier) '
+        "SELECT b.id, b.sku, b.nama, k.nama, COALESCE(s.nama, '') "
+        'FROM inventaris_barang b '
+        'INNER JOIN inventaris_kategori k ON k.id = b.kategori_id '
+        'LEFT OUTER JOIN inventaris_supplier s ON s.id = b.supplier_id'
+    )
+
+
+def hapus_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS inventaris_barang_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0004_indeks_query_utama'),
+    ]
+
+    operations = [
+        migrations.RunPython(buat_index, hapus_index),
+    ]
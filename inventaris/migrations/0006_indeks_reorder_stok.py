@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0005_indeks_pencarian_barang'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stok',
+            index=models.Index(condition=models.Q(('jumlah__lte', models.F('level_reorder'))), fields=['gudang', 'barang'], name='stok_reorder_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0006_indeks_reorder_stok'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RekapPergerakanHarian',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField(verbose_name='Tanggal')),
+                ('tipe', models.CharField(choices=[('IN', 'Masuk'), ('OUT', 'Keluar')], max_length=3, verbose_name='Tipe Pergerakan')),
+                ('total_jumlah', models.BigIntegerField(default=0, verbose_name='Total Jumlah Barang')),
+                ('jumlah_transaksi', models.IntegerField(default=0, verbose_name='Jumlah Transaksi')),
+                ('barang', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rekap_harian', to='inventaris.barang', verbose_name='Barang')),
+                ('gudang', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rekap_harian', to='inventaris.gudang', verbose_name='Gudang')),
+                ('stok', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rekap_harian', to='inventaris.stok', verbose_name='Stok Barang')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gudang', 'tanggal'], name='rekap_gudang_tanggal_idx')],
+                'unique_together': {('tanggal', 'stok', 'tipe')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0007_rekap_pergerakan_harian'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='barang',
+            index=models.Index(fields=['diperbarui_pada'], name='barang_diperbarui_idx'),
+        ),
+    ]
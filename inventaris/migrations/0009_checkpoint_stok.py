@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0008_indeks_etag_barang'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckpointStok',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jumlah', models.PositiveIntegerField(verbose_name='Jumlah Stok')),
+                ('waktu', models.DateTimeField(verbose_name='Waktu Checkpoint')),
+                ('riwayat_terakhir', models.BigIntegerField(default=0, verbose_name='ID Riwayat Terakhir')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='riwayatstok',
+            index=models.Index(fields=['stok', 'dibuat_pada', 'id'], name='riwayat_stok_dibuat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stok',
+            index=models.Index(fields=['gudang', 'id'], name='stok_gudang_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='checkpointstok',
+            name='stok',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint', to='inventaris.stok', verbose_name='Stok Barang'),
+        ),
+        migrations.AddIndex(
+            model_name='checkpointstok',
+            index=models.Index(fields=['waktu'], name='checkpoint_waktu_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='checkpointstok',
+            unique_together={('stok', 'waktu')},
+        ),
+    ]
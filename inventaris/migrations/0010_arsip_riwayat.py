@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+KOLOM = 'id, stok_id, tipe, jumlah, catatan, dibuat_oleh_id, dibuat_pada'
+
+BUAT_VIEW = f"""
+CREATE VIEW inventaris_riwayatstok_semua AS
+SELECT {KOLOM} FROM inventaris_riwayatstok
+UNION ALL
+SELECT {KOLOM} FROM inventaris_riwayatstokarsip
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventaris', '0009_checkpoint_stok'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiwayatStokSemua',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipe', models.CharField(choices=[('IN', 'Masuk'), ('OUT', 'Keluar')], max_length=3, verbose_name='Tipe Pergerakan')),
+                ('jumlah', models.PositiveIntegerField(verbose_name='Jumlah Barang')),
+                ('catatan', models.TextField(blank=True, verbose_name='Catatan Pergerakan')),
+                ('dibuat_pada', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'inventaris_riwayatstok_semua',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RiwayatStokArsip',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipe', models.CharField(choices=[('IN', 'Masuk'), ('OUT', 'Keluar')], max_length=3, verbose_name='Tipe Pergerakan')),
+                ('jumlah', models.PositiveIntegerField(verbose_name='Jumlah Barang')),
+                ('catatan', models.TextField(blank=True, verbose_name='Catatan Pergerakan')),
+                ('dibuat_pada', models.DateTimeField()),
+                ('dibuat_oleh', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Petugas')),
+                ('stok', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='riwayat_arsip', to='inventaris.stok', verbose_name='Stok Barang')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-dibuat_pada', '-id'], name='arsip_dibuat_idx'), models.Index(fields=['stok', 'dibuat_pada', 'id'], name='arsip_stok_dibuat_idx')],
+            },
+        ),
+        migrations.RunSQL(BUAT_VIEW, 'DROP VIEW inventaris_riwayatstok_semua'),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventaris', '0010_arsip_riwayat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tugas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jenis', models.CharField(max_length=50, verbose_name='Jenis Tugas')),
+                ('parameter', models.JSONField(blank=True, default=dict, verbose_name='Parameter')),
+                ('status', models.CharField(choices=[('antri', 'Antri'), ('berjalan', 'Berjalan'), ('selesai', 'Selesai'), ('gagal', 'Gagal'), ('batal', 'Dibatalkan')], default='antri', max_length=10, verbose_name='Status')),
+                ('progres', models.PositiveSmallIntegerField(default=0, verbose_name='Progres (%)')),
+                ('pesan', models.CharField(blank=True, max_length=255, verbose_name='Pesan Progres')),
+                ('hasil', models.JSONField(blank=True, null=True, verbose_name='Hasil')),
+                ('berkas_hasil', models.FileField(blank=True, upload_to='tugas/', verbose_name='Berkas Hasil')),
+                ('error', models.TextField(blank=True, verbose_name='Error Terakhir')),
+                ('percobaan', models.PositiveSmallIntegerField(default=0, verbose_name='Percobaan')),
+                ('maks_percobaan', models.PositiveSmallIntegerField(default=3, verbose_name='Maksimal Percobaan')),
+                ('batal_diminta', models.BooleanField(default=False, verbose_name='Pembatalan Diminta')),
+                ('dibuat_pada', models.DateTimeField(auto_now_add=True)),
+                ('jalan_setelah', models.DateTimeField(verbose_name='Jalan Setelah')),
+                ('mulai_pada', models.DateTimeField(blank=True, null=True)),
+                ('selesai_pada', models.DateTimeField(blank=True, null=True)),
+                ('pekerja', models.CharField(blank=True, max_length=100, verbose_name='Pekerja')),
+                ('detak', models.DateTimeField(blank=True, null=True, verbose_name='Detak Terakhir')),
+                ('dibuat_oleh', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tugas', to=settings.AUTH_USER_MODEL, verbose_name='Pembuat')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'jalan_setelah'], name='tugas_antrian_idx'), models.Index(fields=['dibuat_oleh', '-dibuat_pada'], name='tugas_pembuat_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+KOLOM_LAMA = 'id, stok_id, tipe, jumlah, catatan, dibuat_oleh_id, dibuat_pada'
+KOLOM = KOLOM_LAMA + ', kode_transfer'
+
+VIEW = """
+CREATE VIEW inventaris_riwayatstok_semua AS
+SELECT {kolom} FROM inventaris_riwayatstok
+UNION ALL
+SELECT {kolom} FROM inventaris_riwayatstokarsip
+"""
+HAPUS_VIEW = 'DROP VIEW inventaris_riwayatstok_semua'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0011_tugas'),
+    ]
+
+    operations = [
+        # View gabungan dibuat ulang agar ikut memuat kolom baru (lihat 0010_arsip_riwayat)
+        migrations.RunSQL(HAPUS_VIEW, VIEW.format(kolom=KOLOM_LAMA)),
+        migrations.AddField(
+            model_name='riwayatstok',
+            name='kode_transfer',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True, verbose_name='Kode Transfer'),
+        ),
+        migrations.AddField(
+            model_name='riwayatstokarsip',
+            name='kode_transfer',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True, verbose_name='Kode Transfer'),
+        ),
+        migrations.RunSQL(VIEW.format(kolom=KOLOM), HAPUS_VIEW),
+    ]
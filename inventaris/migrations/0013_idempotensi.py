@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:35
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventaris', '0012_kode_transfer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KunciIdempotensi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kunci', models.CharField(max_length=255, verbose_name='Idempotency-Key')),
+                ('sidik', models.CharField(max_length=64, verbose_name='Sidik Request')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Status Response')),
+                ('respons', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Body Response')),
+                ('header', models.JSONField(default=dict, verbose_name='Header Response')),
+                ('dibuat_pada', models.DateTimeField(auto_now_add=True)),
+                ('kedaluwarsa', models.DateTimeField(verbose_name='Kedaluwarsa')),
+                ('pengguna', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Pengguna')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kedaluwarsa'], name='idempotensi_kedaluwarsa_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='kunciidempotensi',
+            constraint=models.UniqueConstraint(fields=('pengguna', 'kunci'), name='idempotensi_pengguna_kunci_uniq'),
+        ),
+    ]
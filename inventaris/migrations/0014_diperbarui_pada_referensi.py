@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventaris', '0013_idempotensi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gudang',
+            name='diperbarui_pada',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='kategori',
+            name='diperbarui_pada',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='diperbarui_pada',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RemoveIndex(
+            model_name='barang',
+            name='barang_diperbarui_idx',
+        ),
+        migrations.AddIndex(
+            model_name='barang',
+            index=models.Index(fields=['diperbarui_pada', 'kategori', 'supplier'], name='barang_etag_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -6,6 +7,7 @@ class Kategori(models.Model):
     nama = models.CharField(max_length=100, unique=True, verbose_name="Nama Kategori")
     deskripsi = models.TextField(blank=True, verbose_name="Deskripsi Kategori")
     dibuat_pada = models.DateTimeField(auto_now_add=True)
+    diperbarui_pada = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nama
@@ -18,6 +20,7 @@ class Supplier(models.Model):
     email = models.EmailField(blank=True, verbose_name="Email")
     alamat = models.TextField(blank=True, verbose_name="Alamat")
     dibuat_pada = models.DateTimeField(auto_now_add=True)
+    diperbarui_pada = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nama
@@ -35,6 +38,15 @@ class Barang(models.Model):
     dibuat_pada = models.DateTimeField(auto_now_add=True)
     diperbarui_pada = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Urutan default BarangViewSet
+            models.Index(fields=['-dibuat_pada'], name='barang_dibuat_idx'),
+            # MAX(diperbarui_pada) + COUNT untuk ETag list barang; kategori/supplier ikut
+            # agar JOIN ke timestamp keduanya tetap dilayani index (covering)
+            models.Index(fields=['diperbarui_pada', 'kategori', 'supplier'], name='barang_etag_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sku} - {self.nama}"
 
@@ -44,6 +56,7 @@ class Gudang(models.Model):
     lokasi = models.CharField(max_length=200, verbose_name="Lokasi Gudang")
     deskripsi = models.TextField(blank=True, verbose_name="Deskripsi Gudang")
     dibuat_pada = models.DateTimeField(auto_now_add=True)
+    diperbarui_pada = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nama
@@ -58,6 +71,18 @@ class Stok(models.Model):
 
     class Meta:
         unique_together = ('barang', 'gudang')  # Tidak duplikat stok barang di gudang yang sama
+        indexes = [
+            # Filter + urutan default StokViewSet (jumlah > 0, terbaru dulu); partial
+            # index sehingga stok kosong tidak ikut memperbesar index
+            models.Index(fields=['-diperbarui_pada', '-id'], condition=models.Q(jumlah__gt=0), name='stok_tersedia_idx'),
+            models.Index(fields=['gudang', '-diperbarui_pada', '-id'], condition=models.Q(jumlah__gt=0), name='stok_gudang_tersedia_idx'),
+            # Hanya berisi stok yang perlu reorder. Database memperbarui index ini
+            # sendiri setiap kali jumlah/level_reorder berubah, dari jalur manapun
+            # (save, update(), bulk_update), sehingga tidak perlu flag terpisah.
+            models.Index(fields=['gudang', 'barang'], condition=models.Q(jumlah__lte=models.F('level_reorder')), name='stok_reorder_idx'),
+            # Semua stok per gudang termasuk yang kosong (list stok ?as_of=)
+            models.Index(fields=['gudang', 'id'], name='stok_gudang_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.barang.nama} - {self.gudang.nama}: {self.jumlah} {self.barang.satuan}"
@@ -74,6 +99,164 @@ class RiwayatStok(models.Model):
     catatan = models.TextField(blank=True, verbose_name="Catatan Pergerakan")
     dibuat_oleh = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name="Petugas")
     dibuat_pada = models.DateTimeField(auto_now_add=True)
+    # Pasangan OUT (gudang asal) dan IN (gudang tujuan) dari satu transfer antar gudang
+    kode_transfer = models.UUIDField(null=True, blank=True, db_index=True, editable=False, verbose_name="Kode Transfer")
+
+    class Meta:
+        indexes = [
+            # Urutan default RiwayatStokViewSet dan filter tipe / petugas
+            models.Index(fields=['-dibuat_pada', '-id'], name='riwayat_dibuat_idx'),
+            models.Index(fields=['tipe', '-dibuat_pada', '-id'], name='riwayat_tipe_dibuat_idx'),
+            models.Index(fields=['dibuat_oleh', '-dibuat_pada', '-id'], name='riwayat_petugas_dibuat_idx'),
+            # Pergerakan satu stok dalam rentang waktu (stok pada waktu tertentu, histori per stok)
+            models.Index(fields=['stok', 'dibuat_pada', 'id'], name='riwayat_stok_dibuat_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipe} - {self.stok.barang.nama} ({self.jumlah})"
+
+# Model Rekap Pergerakan Harian (agregat RiwayatStok per hari, diperbarui setiap ada pergerakan)
+class RekapPergerakanHarian(models.Model):
+    tanggal = models.DateField(verbose_name="Tanggal")
+    stok = models.ForeignKey(Stok, on_delete=models.CASCADE, related_name="rekap_harian", verbose_name="Stok Barang")
+    barang = models.ForeignKey(Barang, on_delete=models.CASCADE, related_name="rekap_harian", verbose_name="Barang")
+    gudang = models.ForeignKey(Gudang, on_delete=models.CASCADE, related_name="rekap_harian", verbose_name="Gudang")
+    tipe = models.CharField(max_length=3, choices=RiwayatStok.TIPE_PERGERAKAN, verbose_name="Tipe Pergerakan")
+    total_jumlah = models.BigIntegerField(default=0, verbose_name="Total Jumlah Barang")
+    jumlah_transaksi = models.IntegerField(default=0, verbose_name="Jumlah Transaksi")
+
+    class Meta:
+        unique_together = ('tanggal', 'stok', 'tipe')
+        indexes = [
+            models.Index(fields=['gudang', 'tanggal'], name='rekap_gudang_tanggal_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tanggal} {self.tipe} stok#{self.stok_id}: {self.total_jumlah}"
+
+# Model Checkpoint Stok (snapshot jumlah stok berkala untuk query stok pada waktu tertentu)
+class CheckpointStok(models.Model):
+    stok = models.ForeignKey(Stok, on_delete=models.CASCADE, related_name="checkpoint", verbose_name="Stok Barang")
+    jumlah = models.PositiveIntegerField(verbose_name="Jumlah Stok")
+    waktu = models.DateTimeField(verbose_name="Waktu Checkpoint")
+    # id RiwayatStok terbesar yang sudah tercermin di `jumlah`
+    riwayat_terakhir = models.BigIntegerField(default=0, verbose_name="ID Riwayat Terakhir")
+
+    class Meta:
+        unique_together = ('stok', 'waktu')
+        indexes = [
+            models.Index(fields=['waktu'], name='checkpoint_waktu_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.waktu:%Y-%m-%d %H:%M} stok#{self.stok_id}: {self.jumlah}"
+
+# Model Arsip Riwayat Stok (riwayat lama yang dipindahkan dari tabel RiwayatStok)
+class RiwayatStokArsip(models.Model):
+    # id sama dengan id aslinya di RiwayatStok
+    id = models.BigIntegerField(primary_key=True)
+    stok = models.ForeignKey(Stok, on_delete=models.CASCADE, related_name="riwayat_arsip", verbose_name="Stok Barang")
+    tipe = models.CharField(max_length=3, choices=RiwayatStok.TIPE_PERGERAKAN, verbose_name="Tipe Pergerakan")
+    jumlah = models.PositiveIntegerField(verbose_name="Jumlah Barang")
+    catatan = models.TextField(blank=True, verbose_name="Catatan Pergerakan")
+    dibuat_oleh = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="+", verbose_name="Petugas")
+    dibuat_pada = models.DateTimeField()
+    kode_transfer = models.UUIDField(null=True, blank=True, db_index=True, editable=False, verbose_name="Kode Transfer")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-dibuat_pada', '-id'], name='arsip_dibuat_idx'),
+            models.Index(fields=['stok', 'dibuat_pada', 'id'], name='arsip_stok_dibuat_idx'),
+        ]
+
+    def __str__(self):
+        return f"[arsip] {self.tipe} stok#{self.stok_id} ({self.jumlah})"
+
+# Gabungan RiwayatStok dan RiwayatStokArsip (database view, hanya untuk dibaca)
+class RiwayatStokSemua(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    stok = models.ForeignKey(Stok, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+", verbose_name="Stok Barang")
+    tipe = models.CharField(max_length=3, choices=RiwayatStok.TIPE_PERGERAKAN, verbose_name="Tipe Pergerakan")
+    jumlah = models.PositiveIntegerField(verbose_name="Jumlah Barang")
+    catatan = models.TextField(blank=True, verbose_name="Catatan Pergerakan")
+    dibuat_oleh = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name="+", verbose_name="Petugas")
+    dibuat_pada = models.DateTimeField()
+    kode_transfer = models.UUIDField(null=True, blank=True, editable=False, verbose_name="Kode Transfer")
+
+    class Meta:
+        managed = False
+        db_table = 'inventaris_riwayatstok_semua'
+
+    def __str__(self):
+        return f"{self.tipe} stok#{self.stok_id} ({self.jumlah})"
+
+# Tugas latar (export besar, hapus kategori besar, bangun ulang rekap) yang
+# dijalankan oleh `python manage.py jalankan_tugas` (lihat inventaris/tugas.py)
+class Tugas(models.Model):
+    ANTRI = 'antri'
+    BERJALAN = 'berjalan'
+    SELESAI = 'selesai'
+    GAGAL = 'gagal'
+    BATAL = 'batal'
+    STATUS = [
+        (ANTRI, 'Antri'),
+        (BERJALAN, 'Berjalan'),
+        (SELESAI, 'Selesai'),
+        (GAGAL, 'Gagal'),
+        (BATAL, 'Dibatalkan'),
+    ]
+    STATUS_AKHIR = (SELESAI, GAGAL, BATAL)
+
+    jenis = models.CharField(max_length=50, verbose_name="Jenis Tugas")
+    parameter = models.JSONField(default=dict, blank=True, verbose_name="Parameter")
+    status = models.CharField(max_length=10, choices=STATUS, default=ANTRI, verbose_name="Status")
+    progres = models.PositiveSmallIntegerField(default=0, verbose_name="Progres (%)")
+    pesan = models.CharField(max_length=255, blank=True, verbose_name="Pesan Progres")
+    hasil = models.JSONField(null=True, blank=True, verbose_name="Hasil")
+    berkas_hasil = models.FileField(upload_to='tugas/', blank=True, verbose_name="Berkas Hasil")
+    error = models.TextField(blank=True, verbose_name="Error Terakhir")
+    percobaan = models.PositiveSmallIntegerField(default=0, verbose_name="Percobaan")
+    maks_percobaan = models.PositiveSmallIntegerField(default=3, verbose_name="Maksimal Percobaan")
+    batal_diminta = models.BooleanField(default=False, verbose_name="Pembatalan Diminta")
+    dibuat_oleh = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="tugas", verbose_name="Pembuat")
+    dibuat_pada = models.DateTimeField(auto_now_add=True)
+    jalan_setelah = models.DateTimeField(verbose_name="Jalan Setelah")
+    mulai_pada = models.DateTimeField(null=True, blank=True)
+    selesai_pada = models.DateTimeField(null=True, blank=True)
+    # Pekerja yang memegang tugas dan detak terakhirnya; detak yang terlalu
+    # lama berarti pekerjanya mati dan tugas dikembalikan ke antrian
+    pekerja = models.CharField(max_length=100, blank=True, verbose_name="Pekerja")
+    detak = models.DateTimeField(null=True, blank=True, verbose_name="Detak Terakhir")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'jalan_setelah'], name='tugas_antrian_idx'),
+            models.Index(fields=['dibuat_oleh', '-dibuat_pada'], name='tugas_pembuat_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.jenis}#{self.pk} ({self.status})"
+
+# Response tersimpan untuk header Idempotency-Key pada endpoint transaksi stok
+# (lihat inventaris/idempotensi.py); dibersihkan oleh `bersihkan_idempotensi`
+class KunciIdempotensi(models.Model):
+    pengguna = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", verbose_name="Pengguna")
+    kunci = models.CharField(max_length=255, verbose_name="Idempotency-Key")
+    # Hash method, path dan body request: key yang sama untuk request lain ditolak
+    sidik = models.CharField(max_length=64, verbose_name="Sidik Request")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Status Response")
+    respons = models.JSONField(null=True, encoder=DjangoJSONEncoder, verbose_name="Body Response")
+    header = models.JSONField(default=dict, verbose_name="Header Response")
+    dibuat_pada = models.DateTimeField(auto_now_add=True)
+    kedaluwarsa = models.DateTimeField(verbose_name="Kedaluwarsa")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pengguna', 'kunci'], name='idempotensi_pengguna_kunci_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kedaluwarsa'], name='idempotensi_kedaluwarsa_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.tipe} - {self.stok.barang.nama} ({self.jumlah})"
\ No newline at end of file
+        return f"{self.kunci} ({self.status_code})"
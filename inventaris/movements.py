@@ -0,0 +1,437 @@
+"""Logika pergerakan stok (IN/OUT) dan transfer antar gudang yang dipakai oleh endpoint transaksi stok."""
+import uuid
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import realtime, rekap
+from .models import Barang, Gudang, Stok, RiwayatStok
+
+TIPE_VALID = ('IN', 'OUT')
+# Batas jumlah baris dalam satu request batch
+MAKS_BARIS_BATCH = 1000
+UKURAN_BATCH_DB = 500
+
+PESAN_STOK_KURANG = 'Jumlah keluar melebihi stok tersedia'
+
+
+def riwayat_tercatat(riwayat_list):
+    """Titik tunggal setelah RiwayatStok baru tersimpan (satuan maupun bulk).
+
+    Dipanggil oleh signal post_save untuk penyimpanan biasa dan langsung oleh
+    `terapkan_batch` karena `bulk_create` tidak memicu signal.
+    """
+    rekap.tambah(riwayat_list)
+    realtime.publikasikan(riwayat_list)
+
+
+def parse_pergerakan(data):
+    """Validasi satu baris pergerakan.
+
+    Mengembalikan `(item, errors)`; `errors` berisi dict pesan kesalahan dengan
+    format yang sama seperti response 400 StokTransactionAPIView, atau None.
+    """
+    tipe = (data.get('tipe') or '').upper()
+    try:
+        jumlah = int(data.get('jumlah'))
+    except Exception:
+        return None, {'jumlah': ['Jumlah harus berupa angka']}
+
+    if tipe not in TIPE_VALID:
+        return None, {'tipe': ['Tipe harus IN atau OUT']}
+    if jumlah <= 0:
+        return None, {'jumlah': ['Jumlah harus lebih besar dari 0']}
+
+    item = {'tipe': tipe, 'jumlah': jumlah, 'catatan': data.get('catatan') or ''}
+    try:
+        for key in ('stok', 'barang', 'gudang'):
+            item[key] = int(data[key]) if data.get(key) else None
+    except (TypeError, ValueError):
+        return None, {'detail': 'stok, barang dan gudang harus berupa id'}
+    if not item['stok'] and not (item['barang'] and item['gudang']):
+        return None, {'detail': 'stok id atau barang+gudang harus diberikan'}
+    return item, None
+
+
+class PergerakanGagal(Exception):
+    """Pergerakan ditolak; `status` adalah kode HTTP, `errors` body response-nya."""
+
+    def __init__(self, errors, status=400):
+        super().__init__(errors)
+        self.errors = errors
+        self.status = status
+
+
+def _ubah_jumlah(filter_stok, tipe, jumlah):
+    """UPDATE bersyarat satu baris stok; mengembalikan jumlah baris yang berubah.
+
+    OUT hanya berhasil jika `jumlah >= n` pada saat UPDATE dijalankan, sehingga
+    dua penulis bersamaan tidak bisa membuat stok negatif dan tidak ada update
+    yang hilang: database yang menghitung `jumlah - n`, bukan Python.
+    """
+    qs = Stok.objects.filter(**filter_stok)
+    if tipe == 'OUT':
+        return qs.filter(jumlah__gte=jumlah).update(jumlah=F('jumlah') - jumlah, diperbarui_pada=timezone.now())
+    return qs.update(jumlah=F('jumlah') + jumlah, diperbarui_pada=timezone.now())
+
+
+def terapkan_pergerakan(item, user=None):
+    """Terapkan satu pergerakan hasil `parse_pergerakan` tanpa select_for_update.
+
+    Perubahan jumlah dilakukan dengan satu `UPDATE ... SET jumlah = jumlah +/- n
+    WHERE ... [AND jumlah >= n]`. Baris stok baru dibaca ulang setelah UPDATE
+    (masih di transaksi yang sama, jadi nilainya milik transaksi ini) untuk
+    saldo di response dan riwayat. Stok untuk pasangan barang+gudang baru
+    dibuat otomatis pada IN.
+
+    Mengembalikan `(stok, riwayat)`; melempar `PergerakanGagal` jika ditolak.
+    """
+    tipe, jumlah = item['tipe'], item['jumlah']
+    if item['stok']:
+        filter_stok = {'pk': item['stok']}
+    else:
+        filter_stok = {'barang_id': item['barang'], 'gudang_id': item['gudang']}
+
+    with transaction.atomic():
+        if not _ubah_jumlah(filter_stok, tipe, jumlah):
+            ada = Stok.objects.filter(**filter_stok).exists()
+            if item['stok'] and not ada:
+                raise PergerakanGagal({'detail': 'Stok tidak ditemukan'}, status=404)
+            if tipe == 'OUT':
+                # Stok ada tapi kurang, atau barang belum pernah ada di gudang (stok 0)
+                raise PergerakanGagal({'detail': PESAN_STOK_KURANG})
+            if not (Barang.objects.filter(pk=item['barang']).exists() and Gudang.objects.filter(pk=item['gudang']).exists()):
+                raise PergerakanGagal({'detail': 'Barang atau gudang tidak ditemukan'})
+            try:
+                with transaction.atomic():
+                    Stok.objects.create(jumlah=jumlah, level_reorder=10, **filter_stok)
+            except IntegrityError:
+                # Request lain membuat stok yang sama lebih dulu
+                _ubah_jumlah(filter_stok, tipe, jumlah)
+
+        stok = Stok.objects.select_related('barang', 'gudang').get(**filter_stok)
+        riwayat = RiwayatStok.objects.create(
+            stok=stok, tipe=tipe, jumlah=jumlah, catatan=item['catatan'],
+            dibuat_oleh=user if user and user.is_authenticated else None,
+        )
+    return stok, riwayat
+
+
+def _hasil_error(index, errors):
+    return {'index': index, 'status': 'error', 'errors': errors}
+
+
+def _batalkan(hasil, valid):
+    for index, _ in valid:
+        if hasil[index] is None or hasil[index]['status'] == 'ok':
+            hasil[index] = {'index': index, 'status': 'batal'}
+    return hasil, False
+
+
+def _kunci_tulis_sqlite():
+    """Di SQLite, ambil kunci tulis database di awal transaksi.
+
+    SQLite tidak punya kunci baris: transaksi yang membaca dulu lalu menulis
+    harus menaikkan kuncinya, dan jika penulis lain sedang menunggu, kenaikan
+    itu langsung gagal ("database is locked") alih-alih antre. Dengan menulis
+    lebih dulu (UPDATE tanpa baris), transaksi antre di awal seperti
+    `_ubah_jumlah`. Di database lain urutan `_kunci_stok` sudah cukup.
+    """
+    koneksi = connections[router.db_for_write(Stok)]
+    if koneksi.vendor == 'sqlite':
+        with koneksi.cursor() as cursor:
+            cursor.execute(f'UPDATE {koneksi.ops.quote_name(Stok._meta.db_table)} SET jumlah = jumlah WHERE 0 = 1')
+
+
+def _kunci_stok(stok_ids):
+    """Kunci baris stok dengan select_for_update dalam urutan pk.
+
+    Semua penulis mengunci dalam urutan yang sama, jadi dua transaksi yang
+    menyentuh baris yang sama (mis. transfer A->B dan B->A) tidak bisa saling
+    menunggu: yang datang belakangan antre di baris pertama yang sama.
+    """
+    return {
+        stok.pk: stok for stok in
+        Stok.objects.select_for_update().filter(pk__in=stok_ids).order_by('pk')
+    }
+
+
+def _simpan(diubah, riwayat):
+    """Tulis stok yang berubah dan riwayatnya secara bulk; mengembalikan riwayat yang dibuat."""
+    # bulk_update tidak menjalankan auto_now, jadi diperbarui_pada diisi manual
+    sekarang = timezone.now()
+    for stok in diubah.values():
+        stok.diperbarui_pada = sekarang
+    Stok.objects.bulk_update(list(diubah.values()), ['jumlah', 'diperbarui_pada'], batch_size=UKURAN_BATCH_DB)
+    dibuat = RiwayatStok.objects.bulk_create(riwayat, batch_size=UKURAN_BATCH_DB)
+    riwayat_tercatat(dibuat)
+    return dibuat
+
+
+def terapkan_batch(baris, user=None, atomik=True):
+    """Terapkan banyak pergerakan stok dalam satu transaksi database.
+
+    Semua baris `Stok` yang terlibat dikunci dengan `select_for_update` dalam
+    urutan primary key supaya dua batch yang berjalan bersamaan tidak saling
+    deadlock. Perubahan jumlah ditulis dengan `bulk_update` dan riwayatnya
+    dengan `bulk_create`.
+
+    Jika `atomik` True, satu baris gagal membatalkan seluruh batch. Jika False,
+    baris yang gagal dilewati dan baris lain tetap disimpan.
+
+    Mengembalikan `(hasil, berhasil)`: `hasil` adalah list hasil per baris
+    (urutan sama dengan input), `berhasil` False jika batch dibatalkan.
+    """
+    hasil = [None] * len(baris)
+    valid = []
+    for index, data in enumerate(baris):
+        item, errors = parse_pergerakan(data if isinstance(data, dict) else {})
+        if errors:
+            hasil[index] = _hasil_error(index, errors)
+        else:
+            valid.append((index, item))
+
+    def batalkan():
+        return _batalkan(hasil, valid)
+
+    if atomik and len(valid) < len(baris):
+        return batalkan()
+
+    with transaction.atomic():
+        _kunci_tulis_sqlite()
+        # Pastikan barang & gudang yang dirujuk memang ada
+        barang_ids = {item['barang'] for _, item in valid if not item['stok']}
+        gudang_ids = {item['gudang'] for _, item in valid if not item['stok']}
+        barang_ada = set(Barang.objects.filter(pk__in=barang_ids).values_list('pk', flat=True))
+        gudang_ada = set(Gudang.objects.filter(pk__in=gudang_ids).values_list('pk', flat=True))
+
+        pasangan = {}
+        if barang_ada and gudang_ada:
+            pasangan = {
+                (b, g): pk for pk, b, g in Stok.objects.filter(
+                    barang_id__in=barang_ada, gudang_id__in=gudang_ada,
+                ).values_list('pk', 'barang_id', 'gudang_id')
+            }
+
+        # Buat Stok baru (jumlah 0) untuk pasangan barang+gudang yang menerima IN
+        baru = set()
+        for index, item in valid:
+            if item['stok']:
+                continue
+            key = (item['barang'], item['gudang'])
+            if item['barang'] not in barang_ada or item['gudang'] not in gudang_ada:
+                hasil[index] = _hasil_error(index, {'detail': 'Barang atau gudang tidak ditemukan'})
+            elif key not in pasangan and item['tipe'] == 'IN':
+                baru.add(key)
+        if baru:
+            Stok.objects.bulk_create(
+                [Stok(barang_id=b, gudang_id=g, jumlah=0, level_reorder=10) for b, g in baru],
+                ignore_conflicts=True,
+            )
+            pasangan.update({
+                (b, g): pk for pk, b, g in Stok.objects.filter(
+                    barang_id__in={b for b, _ in baru}, gudang_id__in={g for _, g in baru},
+                ).values_list('pk', 'barang_id', 'gudang_id')
+            })
+
+        for index, item in valid:
+            if not item['stok'] and hasil[index] is None:
+                item['stok'] = pasangan.get((item['barang'], item['gudang']))
+                item['via_pasangan'] = True
+
+        terkunci = _kunci_stok({item['stok'] for _, item in valid if item['stok']})
+
+        diubah = {}
+        riwayat = []
+        for index, item in valid:
+            if hasil[index] is not None:
+                continue
+            stok = terkunci.get(item['stok'])
+            if stok is None:
+                # Barang belum pernah ada di gudang tersebut berarti stoknya 0
+                pesan = PESAN_STOK_KURANG if item.get('via_pasangan') else 'Stok tidak ditemukan'
+                hasil[index] = _hasil_error(index, {'detail': pesan})
+                continue
+            if item['tipe'] == 'OUT':
+                if item['jumlah'] > stok.jumlah:
+                    hasil[index] = _hasil_error(index, {'detail': PESAN_STOK_KURANG})
+                    continue
+                stok.jumlah -= item['jumlah']
+            else:
+                stok.jumlah += item['jumlah']
+            diubah[stok.pk] = stok
+            riwayat.append((index, RiwayatStok(
+                stok=stok, tipe=item['tipe'], jumlah=item['jumlah'], catatan=item['catatan'],
+                dibuat_oleh=user if user and user.is_authenticated else None,
+            )))
+            hasil[index] = {
+                'index': index, 'status': 'ok', 'stok': stok.pk,
+                'tipe': item['tipe'], 'jumlah': item['jumlah'], 'saldo': stok.jumlah,
+            }
+
+        if atomik and any(h['status'] == 'error' for h in hasil):
+            transaction.set_rollback(True)
+            return batalkan()
+
+        dibuat = _simpan(diubah, [r for _, r in riwayat])
+        for (index, _), r in zip(riwayat, dibuat):
+            hasil[index]['riwayat'] = r.pk
+
+    return hasil, True
+
+
+def parse_transfer(data):
+    """Validasi satu baris transfer antar gudang.
+
+    Stok asal dipilih lewat `stok` (id) atau `barang` + `dari_gudang`;
+    tujuannya `ke_gudang`. Mengembalikan `(item, errors)` seperti
+    `parse_pergerakan`.
+    """
+    try:
+        jumlah = int(data.get('jumlah'))
+    except Exception:
+        return None, {'jumlah': ['Jumlah harus berupa angka']}
+    if jumlah <= 0:
+        return None, {'jumlah': ['Jumlah harus lebih besar dari 0']}
+
+    item = {'jumlah': jumlah, 'catatan': data.get('catatan') or ''}
+    try:
+        for key in ('stok', 'barang', 'dari_gudang', 'ke_gudang'):
+            item[key] = int(data[key]) if data.get(key) else None
+    except (TypeError, ValueError):
+        return None, {'detail': 'stok, barang, dari_gudang dan ke_gudang harus berupa id'}
+    if not item['ke_gudang']:
+        return None, {'ke_gudang': ['Gudang tujuan harus diberikan']}
+    if not item['stok'] and not (item['barang'] and item['dari_gudang']):
+        return None, {'detail': 'stok id atau barang+dari_gudang harus diberikan'}
+    if item['dari_gudang'] == item['ke_gudang']:
+        return None, {'ke_gudang': ['Gudang tujuan harus berbeda dengan gudang asal']}
+    return item, None
+
+
+def _stok_pasangan(kunci):
+    """Map (barang_id, gudang_id) -> pk stok untuk pasangan di `kunci` yang sudah punya stok."""
+    if not kunci:
+        return {}
+    return {
+        (b, g): pk for pk, b, g in Stok.objects.filter(
+            barang_id__in={b for b, _ in kunci}, gudang_id__in={g for _, g in kunci},
+        ).values_list('pk', 'barang_id', 'gudang_id')
+        if (b, g) in kunci
+    }
+
+
+def terapkan_transfer(baris, user=None, atomik=True):
+    """Pindahkan stok antar gudang: OUT di gudang asal dan IN di gudang tujuan dalam satu transaksi.
+
+    Baris stok asal dan tujuan yang sudah ada dikunci sekaligus dalam urutan
+    pk (lihat `_kunci_stok`), sehingga transfer berlawanan arah yang berjalan
+    bersamaan tidak deadlock. Saldo setiap baris diperiksa lebih dulu; stok
+    tujuan yang belum ada baru dibuat (jumlah 0) untuk baris yang lolos, jadi
+    baris yang gagal tidak meninggalkan stok kosong. Setiap transfer menulis
+    sepasang RiwayatStok dengan `kode_transfer` yang sama.
+
+    `atomik` dan bentuk hasilnya sama dengan `terapkan_batch`; hasil baris
+    yang berhasil berisi `kode_transfer`, `asal`, `tujuan`, `saldo_asal`,
+    `saldo_tujuan` dan `riwayat` (id OUT dan IN).
+    """
+    hasil = [None] * len(baris)
+    valid = []
+    for index, data in enumerate(baris):
+        item, errors = parse_transfer(data if isinstance(data, dict) else {})
+        if errors:
+            hasil[index] = _hasil_error(index, errors)
+        else:
+            valid.append((index, item))
+
+    if atomik and len(valid) < len(baris):
+        return _batalkan(hasil, valid)
+
+    with transaction.atomic():
+        _kunci_tulis_sqlite()
+        # Stok asal yang dirujuk lewat id menentukan barang dan gudang asalnya
+        asal_info = {
+            pk: (b, g) for pk, b, g in Stok.objects.filter(
+                pk__in={item['stok'] for _, item in valid if item['stok']},
+            ).values_list('pk', 'barang_id', 'gudang_id')
+        }
+        for index, item in valid:
+            if not item['stok']:
+                continue
+            if item['stok'] not in asal_info:
+                hasil[index] = _hasil_error(index, {'detail': 'Stok tidak ditemukan'})
+                continue
+            item['barang'], item['dari_gudang'] = asal_info[item['stok']]
+            if item['dari_gudang'] == item['ke_gudang']:
+                hasil[index] = _hasil_error(index, {'ke_gudang': ['Gudang tujuan harus berbeda dengan gudang asal']})
+
+        aktif = [(index, item) for index, item in valid if hasil[index] is None]
+        barang_ada = set(Barang.objects.filter(pk__in={item['barang'] for _, item in aktif}).values_list('pk', flat=True))
+        gudang_ada = set(Gudang.objects.filter(
+            pk__in={item[k] for _, item in aktif for k in ('dari_gudang', 'ke_gudang')},
+        ).values_list('pk', flat=True))
+        for index, item in aktif:
+            if item['barang'] not in barang_ada or not {item['dari_gudang'], item['ke_gudang']} <= gudang_ada:
+                hasil[index] = _hasil_error(index, {'detail': 'Barang atau gudang tidak ditemukan'})
+        aktif = [(index, item) for index, item in aktif if hasil[index] is None]
+
+        tujuan = {(item['barang'], item['ke_gudang']) for _, item in aktif}
+        pasangan = _stok_pasangan(tujuan | {(item['barang'], item['dari_gudang']) for _, item in aktif})
+        terkunci = _kunci_stok(set(pasangan.values()))
+
+        # Saldo diperiksa berurutan sebelum stok tujuan dibuat: stok yang belum ada
+        # bersaldo 0, dan tujuan baris sebelumnya boleh menjadi asal baris berikutnya.
+        saldo = {kunci: terkunci[pk].jumlah for kunci, pk in pasangan.items()}
+        berhasil = []
+        for index, item in aktif:
+            dari, ke = (item['barang'], item['dari_gudang']), (item['barang'], item['ke_gudang'])
+            if item['jumlah'] > saldo.get(dari, 0):
+                # Barang belum pernah ada di gudang asal berarti stoknya 0
+                hasil[index] = _hasil_error(index, {'detail': PESAN_STOK_KURANG})
+                continue
+            saldo[dari] -= item['jumlah']
+            saldo[ke] = saldo.get(ke, 0) + item['jumlah']
+            berhasil.append((index, item))
+
+        if atomik and len(berhasil) < len(valid):
+            transaction.set_rollback(True)
+            return _batalkan(hasil, valid)
+
+        # Stok tujuan hanya dibuat untuk baris yang berhasil, di transaksi yang sama
+        # dengan pergerakannya (ikut batal jika penyimpanan gagal)
+        baru = sorted({(item['barang'], item['ke_gudang']) for _, item in berhasil} - set(pasangan))
+        if baru:
+            # Urutan insert juga dibuat tetap agar dua transfer yang membuat stok tujuan sama tidak saling menunggu
+            Stok.objects.bulk_create(
+                [Stok(barang_id=b, gudang_id=g, jumlah=0, level_reorder=10) for b, g in baru],
+                ignore_conflicts=True,
+            )
+            pasangan_baru = _stok_pasangan(set(baru))
+            pasangan.update(pasangan_baru)
+            terkunci.update(_kunci_stok(set(pasangan_baru.values())))
+
+        diubah, riwayat = {}, []
+        petugas = user if user and user.is_authenticated else None
+        for index, item in berhasil:
+            asal = terkunci[pasangan[(item['barang'], item['dari_gudang'])]]
+            ke = terkunci[pasangan[(item['barang'], item['ke_gudang'])]]
+            asal.jumlah -= item['jumlah']
+            ke.jumlah += item['jumlah']
+            diubah[asal.pk], diubah[ke.pk] = asal, ke
+            kode = uuid.uuid4()
+            riwayat.append((index, [
+                RiwayatStok(stok=s, tipe=tipe, jumlah=item['jumlah'], catatan=item['catatan'],
+                            dibuat_oleh=petugas, kode_transfer=kode)
+                for s, tipe in ((asal, 'OUT'), (ke, 'IN'))
+            ]))
+            hasil[index] = {
+                'index': index, 'status': 'ok', 'kode_transfer': str(kode), 'jumlah': item['jumlah'],
+                'asal': asal.pk, 'tujuan': ke.pk, 'saldo_asal': asal.jumlah, 'saldo_tujuan': ke.jumlah,
+            }
+
+        dibuat = _simpan(diubah, [r for _, pasang in riwayat for r in pasang])
+        for i, (index, _) in enumerate(riwayat):
+            hasil[index]['riwayat'] = [r.pk for r in dibuat[2 * i:2 * i + 2]]
+
+    return hasil, True
@@ -0,0 +1,283 @@
+"""Kelas paginasi untuk API inventaris."""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+KONFIGURASI_DEFAULT = {
+    # Strategi jika klien tidak mengirim ?count=
+    'COUNT_DEFAULT': 'exact',
+    # Umur (detik) hasil COUNT untuk ?count=cached
+    'COUNT_CACHE_TTL': 30,
+    'COUNT_CACHE_ALIAS': 'default',
+    # Estimasi planner di bawah ini diganti COUNT exact (murah, dan estimasi tabel kecil tidak akurat)
+    'ESTIMASI_MIN': 1000,
+}
+STRATEGI_COUNT = ('exact', 'cached', 'estimate', 'none')
+
+
+def konfigurasi():
+    return {**KONFIGURASI_DEFAULT, **getattr(settings, 'INVENTARIS_PAGINATION', {})}
+
+
+def _query_count(queryset):
+    # Kolom, urutan dan select_related tidak memengaruhi jumlah baris
+    return queryset.order_by().values('pk')
+
+
+def count_cached(queryset):
+    """COUNT exact yang disimpan `COUNT_CACHE_TTL` detik, dengan key dari SQL dan parameter filter."""
+    konfig = konfigurasi()
+    sql, params = _query_count(queryset).query.sql_with_params()
+    ringkas = hashlib.sha1(f'{queryset.db}|{sql}|{params!r}'.encode('utf-8')).hexdigest()
+    key = f'inventaris:count:{ringkas}'
+    store = caches[konfig['COUNT_CACHE_ALIAS']]
+    jumlah = store.get(key)
+    if jumlah is None:
+        jumlah = queryset.count()
+        store.set(key, jumlah, konfig['COUNT_CACHE_TTL'])
+    return jumlah
+
+
+def estimasi_count(queryset):
+    """Perkiraan jumlah baris dari statistik planner database, atau None jika tidak tersedia.
+
+    PostgreSQL: `Plan Rows` dari EXPLAIN, berlaku juga untuk queryset terfilter.
+    SQLite hanya menyimpan jumlah baris per tabel (`sqlite_stat1`, hasil
+    ANALYZE), jadi hanya dipakai untuk queryset tanpa filter.
+    """
+    connection = connections[queryset.db]
+    query = _query_count(queryset).query
+    try:
+        if connection.vendor == 'postgresql':
+            sql, params = query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        if connection.vendor == 'sqlite' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND stat IS NOT NULL LIMIT 1',
+                               [queryset.model._meta.db_table])
+                baris = cursor.fetchone()
+            return int(baris[0].split()[0]) if baris else None
+    except DatabaseError:
+        # Mis. sqlite_stat1 belum ada karena ANALYZE belum pernah dijalankan
+        return None
+    return None
+
+
+class KeysetPagination(BasePagination):
+    """Paginasi keyset (cursor) berdasarkan pasangan (kolom waktu, id), urutan menurun.
+
+    Halaman berikutnya diambil dengan `WHERE (waktu, id) < (posisi terakhir)`
+    sehingga biayanya sebanding dengan ukuran halaman, berapapun kedalamannya,
+    tanpa COUNT(*) maupun OFFSET. Baris yang ditambahkan saat klien sedang
+    menelusuri tidak membuat baris lain bergeser atau muncul dua kali.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor tidak valid.'
+
+    def __init__(self, kolom, page_size):
+        self.kolom = kolom
+        self.page_size = page_size
+
+    def encode_cursor(self, obj):
+        # Baris bisa berupa instance model atau dict `.values()` (serializer_cepat)
+        if isinstance(obj, dict):
+            waktu, pk = obj[self.kolom], obj['id']
+        else:
+            waktu, pk = getattr(obj, self.kolom), obj.pk
+        posisi = f'{waktu.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(posisi.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        try:
+            waktu, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split('|')
+            waktu = parse_datetime(waktu)
+            pk = int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if waktu is None:
+            raise NotFound(self.invalid_cursor_message)
+        return waktu, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        # Urutan keyset selalu dipakai; parameter `ordering` diabaikan di mode ini
+        queryset = queryset.order_by(f'-{self.kolom}', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            waktu, pk = self.decode_cursor(cursor)
+            # Bentuk `waktu <= x AND (waktu < x OR id < y)` agar index (waktu, id) tetap terpakai
+            queryset = queryset.filter(
+                Q(**{f'{self.kolom}__lte': waktu}) & (Q(**{f'{self.kolom}__lt': waktu}) | Q(id__lt=pk))
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+
+class InventarisPagination(PageNumberPagination):
+    """Paginasi default API.
+
+    Berperilaku seperti PageNumberPagination biasa. ViewSet yang mendefinisikan
+    `keyset_field` juga mendukung mode cursor (opt-in): kirim `?cursor=` (kosong
+    untuk halaman pertama) lalu ikuti link `next`.
+
+    Di mode nomor halaman, `?count=` memilih cara menghitung `count`:
+      - exact (default, lihat `COUNT_DEFAULT`): COUNT(*) setiap request;
+      - cached: COUNT(*) yang disimpan beberapa detik per kombinasi filter;
+      - estimate: perkiraan planner database (exact jika tabel kecil atau
+        database tidak punya estimasi, lihat `estimasi_count`);
+      - none: tanpa COUNT, `count` bernilai null.
+    Selain exact, halaman diambil `page_size + 1` baris sehingga link `next`
+    selalu tepat walaupun count-nya perkiraan, dan response membawa
+    `count_tipe` berisi strategi yang benar-benar dipakai. Di halaman
+    terakhir count selalu exact karena bisa dihitung dari offset.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    count_query_param = 'count'
+    # Jumlah total yang sudah dihitung view (mis. oleh ConditionalMixin); jika
+    # diisi, paginator tidak menjalankan COUNT(*) sendiri.
+    jumlah_diketahui = None
+    # Queryset untuk COUNT jika berbeda dari queryset yang dipaginasi (mis.
+    # baris `.values()` serializer_cepat yang membawa JOIN tambahan)
+    queryset_hitung = None
+
+    def django_paginator_class(self, queryset, page_size):
+        paginator = DjangoPaginator(queryset, page_size)
+        if self.jumlah_diketahui is not None:
+            paginator.count = self.jumlah_diketahui
+        elif self.queryset_hitung is not None:
+            paginator.count = self.queryset_hitung.count()
+        return paginator
+
+    def pakai_cursor(self, request, view):
+        return bool(getattr(view, 'keyset_field', None)) and KeysetPagination.cursor_query_param in request.query_params
+
+    def strategi_count(self, request):
+        strategi = request.query_params.get(self.count_query_param) or konfigurasi()['COUNT_DEFAULT']
+        if strategi not in STRATEGI_COUNT:
+            raise ValidationError({self.count_query_param: [f'Pilih salah satu: {", ".join(STRATEGI_COUNT)}']})
+        return strategi
+
+    def pakai_count_exact(self, request, view):
+        """True jika halaman ini menjalankan COUNT exact biasa (mode nomor halaman, ?count=exact)."""
+        return not self.pakai_cursor(request, view) and self.strategi_count(request) == 'exact'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.count_tipe = 'exact'
+        if self.pakai_cursor(request, view):
+            self.keyset = KeysetPagination(view.keyset_field, self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        strategi = self.strategi_count(request)
+        if strategi == 'exact':
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_tanpa_count(queryset, request, strategi)
+
+    # ---------- mode count selain exact ----------
+    def paginate_tanpa_count(self, queryset, request, strategi):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.request = request
+        self.page = None
+        nilai = request.query_params.get(self.page_query_param) or 1
+        try:
+            self.nomor = int(nilai)
+            if self.nomor < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(page_number=nilai, message='Nomor halaman tidak valid.'))
+
+        awal = (self.nomor - 1) * page_size
+        rows = list(queryset[awal:awal + page_size + 1])
+        if not rows and self.nomor > 1:
+            raise NotFound(self.invalid_page_message.format(page_number=nilai, message='Halaman tidak berisi data.'))
+        self.ada_berikutnya = len(rows) > page_size
+        rows = rows[:page_size]
+
+        hitung = self.queryset_hitung if self.queryset_hitung is not None else queryset
+        if not self.ada_berikutnya:
+            self.jumlah = awal + len(rows)
+        elif strategi == 'none':
+            self.jumlah, self.count_tipe = None, 'none'
+        else:
+            self.jumlah, self.count_tipe = self.hitung(hitung, strategi, awal + len(rows) + 1)
+        return rows
+
+    def hitung(self, queryset, strategi, minimal):
+        """(count, tipe) untuk strategi cached/estimate; `minimal` = baris yang terbukti ada."""
+        if strategi == 'estimate':
+            estimasi = estimasi_count(queryset)
+            if estimasi is not None:
+                if estimasi < konfigurasi()['ESTIMASI_MIN']:
+                    return queryset.count(), 'exact'
+                return max(estimasi, minimal), 'estimate'
+        return count_cached(queryset), 'cached'
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        if self.page is not None:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.jumlah,
+            'count_tipe': self.count_tipe,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        if self.page is not None:
+            return super().get_next_link()
+        if not self.ada_berikutnya:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.nomor + 1)
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return None
+        if self.page is not None:
+            return super().get_previous_link()
+        if self.nomor <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.nomor == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.nomor - 1)
@@ -0,0 +1,262 @@
+"""Stream pergerakan stok real-time (server-sent events) lewat ASGI.
+
+Setiap RiwayatStok yang tersimpan diubah menjadi event dan dipublikasikan ke
+broker setelah transaksinya commit (`publikasikan`, dipanggil dari
+`movements.riwayat_tercatat`). Endpoint `stream_pergerakan` adalah view async:
+setiap koneksi hanya berupa satu `asyncio.Queue` di event loop, bukan satu
+thread, sehingga satu worker ASGI (mis. `uvicorn gudang_proyek.asgi:application`)
+sanggup menahan ribuan koneksi idle.
+
+Broker dipilih lewat setting `INVENTARIS_REALTIME_BROKER` (dotted path).
+Default `InProcessBroker` membagikan event ke subscriber di proses yang sama;
+untuk beberapa proses/server, buat broker dengan method `subscribe`,
+`unsubscribe` dan `publish` yang sama di atas Redis/PostgreSQL LISTEN dsb.
+
+EventSource di browser tidak bisa mengirim header Authorization, tetapi token
+API tidak boleh ikut di URL (tercatat di log akses/proxy dan riwayat browser).
+Browser meminta tiket stream dulu (`POST /api/stok/stream/tiket/` dengan
+header token), lalu membuka `/api/stok/stream/?tiket=...`. Tiket ditandatangani
+(`django.core.signing`, salt khusus stream sehingga tidak berlaku di tempat
+lain), kedaluwarsa setelah `TTL_TIKET` detik dan ikut batal jika token
+pembuatnya dihapus (logout). Klien non-browser tetap boleh memakai header
+`Authorization: Token ...`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .models import Stok
+
+logger = logging.getLogger(__name__)
+
+BROKER_DEFAULT = 'inventaris.realtime.InProcessBroker'
+# Interval komentar heartbeat agar proxy tidak menutup koneksi idle
+INTERVAL_HEARTBEAT = 15
+# Django 4.2 belum memberi tahu generator saat klien memutus koneksi, jadi
+# stream ditutup setelah durasi ini; EventSource akan reconnect otomatis.
+MAKS_DURASI = 300
+# Event yang belum terkirim per subscriber; subscriber lambat kehilangan event tertua
+MAKS_ANTRIAN = 1000
+# Masa berlaku tiket stream (detik); cukup untuk membuka koneksi dan reconnect singkat
+TTL_TIKET = 60
+SALT_TIKET = 'inventaris.realtime.tiket-stream'
+
+
+class Langganan:
+    """Satu subscriber: antrian asyncio milik event loop koneksi tersebut."""
+
+    def __init__(self, gudang=None):
+        self.gudang = set(gudang) if gudang else None
+        self.loop = asyncio.get_running_loop()
+        self.antrian = asyncio.Queue(MAKS_ANTRIAN)
+        self.terlewat = 0
+
+    def cocok(self, event):
+        return self.gudang is None or event['gudang'] in self.gudang
+
+    def _masukkan(self, event):
+        # Berjalan di event loop subscriber
+        if self.antrian.full():
+            self.antrian.get_nowait()
+            self.terlewat += 1
+        self.antrian.put_nowait(event)
+
+    def kirim(self, event):
+        """Thread-safe: boleh dipanggil dari thread request sync mana pun."""
+        try:
+            self.loop.call_soon_threadsafe(self._masukkan, event)
+        except RuntimeError:
+            # Event loop sudah ditutup; koneksi akan dibersihkan oleh unsubscribe
+            pass
+
+
+class InProcessBroker:
+    """Fan-out event ke subscriber di proses yang sama."""
+
+    def __init__(self):
+        self._langganan = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, gudang=None):
+        langganan = Langganan(gudang)
+        with self._lock:
+            self._langganan.add(langganan)
+        return langganan
+
+    def unsubscribe(self, langganan):
+        with self._lock:
+            self._langganan.discard(langganan)
+
+    def publish(self, events):
+        with self._lock:
+            penerima = list(self._langganan)
+        for event in events:
+            for langganan in penerima:
+                if langganan.cocok(event):
+                    langganan.kirim(event)
+
+    @property
+    def jumlah_subscriber(self):
+        return len(self._langganan)
+
+
+_broker = None
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'INVENTARIS_REALTIME_BROKER', BROKER_DEFAULT))()
+    return _broker
+
+
+@receiver(setting_changed)
+def _setting_berubah(setting, **kwargs):
+    global _broker
+    if setting == 'INVENTARIS_REALTIME_BROKER':
+        _broker = None
+
+
+def buat_event(riwayat_list):
+    """Ubah RiwayatStok menjadi dict event berisi saldo stok terbaru."""
+    stok_map = {}
+    for riwayat in riwayat_list:
+        if type(riwayat).stok.is_cached(riwayat):
+            stok_map[riwayat.stok_id] = riwayat.stok
+    kurang = {r.stok_id for r in riwayat_list} - stok_map.keys()
+    if kurang:
+        stok_map.update(Stok.objects.in_bulk(kurang))
+    events = []
+    for riwayat in riwayat_list:
+        stok = stok_map.get(riwayat.stok_id)
+        if stok is None:
+            continue
+        events.append({
+            'id': riwayat.pk,
+            'stok': stok.pk,
+            'barang': stok.barang_id,
+            'gudang': stok.gudang_id,
+            'tipe': riwayat.tipe,
+            'jumlah': riwayat.jumlah,
+            'jumlah_stok': stok.jumlah,
+            'dibuat_pada': riwayat.dibuat_pada.isoformat() if riwayat.dibuat_pada else None,
+        })
+    return events
+
+
+def publikasikan(riwayat_list):
+    """Publikasikan event setelah transaksi yang sedang berjalan commit.
+
+    Jika transaksi di-rollback, `on_commit` tidak dijalankan dan tidak ada
+    event yang terkirim.
+    """
+    events = buat_event(riwayat_list)
+    if not events:
+        return
+
+    def kirim():
+        try:
+            broker().publish(events)
+        except Exception:
+            # Kegagalan broker tidak boleh menggagalkan transaksi stok yang sudah commit
+            logger.exception('Gagal mempublikasikan event pergerakan stok')
+
+    transaction.on_commit(kirim)
+
+
+def _sidik_token(key):
+    return hashlib.sha256(key.encode()).hexdigest()[:16] if key else None
+
+
+def ttl_tiket():
+    return getattr(settings, 'INVENTARIS_REALTIME_TIKET_TTL', TTL_TIKET)
+
+
+def buat_tiket(user, token=None):
+    """Tiket stream bertanda tangan untuk `user`, terikat ke token API yang memintanya."""
+    return signing.dumps({'u': user.pk, 't': _sidik_token(getattr(token, 'key', None))}, salt=SALT_TIKET)
+
+
+@sync_to_async
+def _user_dari_request(request):
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Token '):
+        token = Token.objects.select_related('user').filter(key=header[6:].strip()).first()
+        if token is None or not token.user.is_active:
+            return None
+        return token.user
+
+    tiket = request.GET.get('tiket', '')
+    if not tiket:
+        return None
+    try:
+        isi = signing.loads(tiket, salt=SALT_TIKET, max_age=ttl_tiket())
+    except signing.BadSignature:
+        # Termasuk SignatureExpired
+        return None
+    user = get_user_model().objects.filter(pk=isi['u'], is_active=True).first()
+    if user is None:
+        return None
+    if isi['t'] is not None:
+        # Tiket dari token yang sudah dihapus (logout) ikut batal
+        keys = Token.objects.filter(user=user).values_list('key', flat=True)
+        if isi['t'] not in {_sidik_token(key) for key in keys}:
+            return None
+    return user
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: pergerakan\ndata: {json.dumps(event)}\n\n"
+
+
+async def _aliran(gudang):
+    # Subscribe di dalam generator: jika response tidak pernah dialirkan,
+    # tidak ada langganan yang tertinggal di broker.
+    langganan = broker().subscribe(gudang)
+    loop = asyncio.get_running_loop()
+    selesai = loop.time() + MAKS_DURASI
+    try:
+        yield 'retry: 5000\n\n'
+        while loop.time() < selesai:
+            try:
+                event = await asyncio.wait_for(langganan.antrian.get(), INTERVAL_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        # Dijalankan saat klien memutus koneksi (generator dibatalkan/ditutup)
+        broker().unsubscribe(langganan)
+
+
+async def stream_pergerakan(request):
+    """GET /api/stok/stream/?gudang=1,2 — event `pergerakan` dalam format SSE."""
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    user = await _user_dari_request(request)
+    if user is None:
+        return JsonResponse({'detail': 'Autentikasi diperlukan.'}, status=401)
+    try:
+        gudang = [int(g) for g in request.GET.get('gudang', '').split(',') if g]
+    except ValueError:
+        return JsonResponse({'gudang': ['Harus berupa daftar id gudang']}, status=400)
+
+    response = StreamingHttpResponse(_aliran(gudang), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Nonaktifkan buffering di nginx agar event langsung terkirim
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,205 @@
+"""Pemeliharaan tabel rekap pergerakan harian (RekapPergerakanHarian).
+
+Setiap RiwayatStok baru menambah satu baris rekap per (tanggal, stok, tipe)
+memakai `UPDATE ... SET total = total + n`, sehingga statistik dashboard bisa
+dijawab dari tabel rekap tanpa membaca log riwayat mentah.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import arsip
+from .models import RekapPergerakanHarian, RiwayatStok, Stok
+
+UKURAN_BATCH = 1000
+
+
+def _kunci(riwayat):
+    return (timezone.localdate(riwayat.dibuat_pada), riwayat.stok_id, riwayat.tipe)
+
+
+def tambah(riwayat_list, faktor=1):
+    """Tambahkan riwayat ke rekap harian (`faktor=-1` untuk mengurangi).
+
+    Riwayat dengan kunci yang sama digabung dulu. Penambahan di SQLite/PostgreSQL
+    memakai satu `INSERT ... ON CONFLICT DO UPDATE` (executemany) untuk seluruh
+    batch; selain itu satu UPDATE per (tanggal, stok, tipe).
+    """
+    agregat = defaultdict(lambda: [0, 0])
+    stok_info = {}
+    for riwayat in riwayat_list:
+        nilai = agregat[_kunci(riwayat)]
+        nilai[0] += riwayat.jumlah
+        nilai[1] += 1
+        if RiwayatStok.stok.is_cached(riwayat):
+            stok_info[riwayat.stok_id] = (riwayat.stok.barang_id, riwayat.stok.gudang_id)
+    if not agregat:
+        return
+
+    kurang = {stok_id for _, stok_id, _ in agregat} - stok_info.keys()
+    if kurang:
+        stok_info.update({
+            pk: (barang_id, gudang_id) for pk, barang_id, gudang_id in
+            Stok.objects.filter(pk__in=kurang).values_list('pk', 'barang_id', 'gudang_id')
+        })
+
+    using = router.db_for_write(RekapPergerakanHarian)
+    if faktor > 0 and connections[using].vendor in ('sqlite', 'postgresql'):
+        _upsert(agregat, stok_info, using)
+        return
+    for (tanggal, stok_id, tipe), (total, banyak) in agregat.items():
+        _ubah(tanggal, stok_id, tipe, total * faktor, banyak * faktor, stok_info.get(stok_id))
+
+
+def _upsert(agregat, stok_info, using):
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    tabel = qn(RekapPergerakanHarian._meta.db_table)
+    sql = (
+        f'INSERT INTO {tabel} (tanggal, stok_id, barang_id, gudang_id, tipe, total_jumlah, jumlah_transaksi) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s) '
+        'ON CONFLICT (tanggal, stok_id, tipe) DO UPDATE SET '
+        f'total_jumlah = {tabel}.total_jumlah + EXCLUDED.total_jumlah, '
+        f'jumlah_transaksi = {tabel}.jumlah_transaksi + EXCLUDED.jumlah_transaksi'
+    )
+    params = [
+        (connection.ops.adapt_datefield_value(tanggal), stok_id, *stok_info[stok_id], tipe, total, banyak)
+        for (tanggal, stok_id, tipe), (total, banyak) in agregat.items()
+        if stok_id in stok_info
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _ubah(tanggal, stok_id, tipe, total, banyak, info):
+    def update():
+        return RekapPergerakanHarian.objects.filter(tanggal=tanggal, stok_id=stok_id, tipe=tipe).update(
+            total_jumlah=F('total_jumlah') + total,
+            jumlah_transaksi=F('jumlah_transaksi') + banyak,
+        )
+
+    if update() or total < 0 or info is None:
+        return
+    try:
+        # Savepoint agar IntegrityError (baris dibuat transaksi lain) tidak
+        # membatalkan transaksi pemanggil
+        with transaction.atomic():
+            RekapPergerakanHarian.objects.create(
+                tanggal=tanggal, stok_id=stok_id, barang_id=info[0], gudang_id=info[1],
+                tipe=tipe, total_jumlah=total, jumlah_transaksi=banyak,
+            )
+    except IntegrityError:
+        update()
+
+
+def bangun_ulang(dari=None):
+    """Hitung ulang rekap dari log riwayat dengan agregasi di database.
+
+    Jika `dari` (date) diberikan, hanya rekap mulai tanggal tersebut yang
+    dihapus dan dihitung ulang. Mengembalikan jumlah baris rekap yang dibuat.
+    """
+    awal = timezone.make_aware(datetime.combine(dari, time.min)) if dari is not None else None
+    # Riwayat yang sudah diarsipkan tetap dihitung
+    riwayat = arsip.riwayat_sejak(awal)
+    rekap = RekapPergerakanHarian.objects.all()
+    if dari is not None:
+        riwayat = riwayat.filter(dibuat_pada__gte=awal)
+        rekap = rekap.filter(tanggal__gte=dari)
+
+    baris = (
+        riwayat.annotate(tanggal=TruncDate('dibuat_pada'))
+        .values('tanggal', 'stok_id', 'stok__barang_id', 'stok__gudang_id', 'tipe')
+        .annotate(total=Sum('jumlah'), banyak=Count('id'))
+        .order_by()
+    )
+    dibuat = 0
+    with transaction.atomic():
+        rekap.delete()
+        batch = []
+        for row in baris.iterator(chunk_size=UKURAN_BATCH):
+            batch.append(RekapPergerakanHarian(
+                tanggal=row['tanggal'], stok_id=row['stok_id'], barang_id=row['stok__barang_id'],
+                gudang_id=row['stok__gudang_id'], tipe=row['tipe'],
+                total_jumlah=row['total'], jumlah_transaksi=row['banyak'],
+            ))
+            if len(batch) >= UKURAN_BATCH:
+                dibuat += len(RekapPergerakanHarian.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            dibuat += len(RekapPergerakanHarian.objects.bulk_create(batch))
+    return dibuat
+
+
+# Jendela waktu ringkasan volume: nama -> jumlah hari (termasuk hari ini)
+JENDELA = (('hari_ini', 1), ('7_hari', 7), ('30_hari', 30))
+
+
+def statistik(hari=30, gudang=None, top=5):
+    """Ringkasan untuk dashboard admin.
+
+    Total per gudang/kategori diambil dari tabel Stok (saldo terkini), sedangkan
+    volume pergerakan, deret harian dan barang teratas dari tabel rekap. Tidak
+    ada query ke log RiwayatStok.
+    """
+    hari_ini = timezone.localdate()
+    awal_deret = hari_ini - timedelta(days=hari - 1)
+    awal_jendela = hari_ini - timedelta(days=max(n for _, n in JENDELA) - 1)
+
+    stok = Stok.objects.all()
+    rekap = RekapPergerakanHarian.objects.all()
+    if gudang is not None:
+        stok = stok.filter(gudang_id=gudang)
+        rekap = rekap.filter(gudang_id=gudang)
+
+    perlu_reorder = Count('id', filter=Q(jumlah__lte=F('level_reorder')))
+    per_gudang = list(
+        stok.values('gudang_id', nama=F('gudang__nama'))
+        .annotate(total_jumlah=Sum('jumlah'), jumlah_stok=Count('id'), perlu_reorder=perlu_reorder)
+        .order_by('nama')
+    )
+    per_kategori = list(
+        stok.values(kategori_id=F('barang__kategori_id'), nama=F('barang__kategori__nama'))
+        .annotate(total_jumlah=Sum('jumlah'), jumlah_stok=Count('id'), perlu_reorder=perlu_reorder)
+        .order_by('nama')
+    )
+
+    def jumlah_sejak(awal):
+        return Sum(Case(When(tanggal__gte=awal, then='total_jumlah'), default=0, output_field=IntegerField()))
+
+    volume = {nama: {'IN': 0, 'OUT': 0} for nama, _ in JENDELA}
+    baris = (
+        rekap.filter(tanggal__gte=awal_jendela, tanggal__lte=hari_ini)
+        .values('tipe')
+        .annotate(**{nama: jumlah_sejak(hari_ini - timedelta(days=n - 1)) for nama, n in JENDELA})
+        .order_by()
+    )
+    for row in baris:
+        for nama, _ in JENDELA:
+            volume[nama][row['tipe']] = row[nama] or 0
+
+    deret = {awal_deret + timedelta(days=i): {'IN': 0, 'OUT': 0} for i in range(hari)}
+    for row in (
+        rekap.filter(tanggal__gte=awal_deret, tanggal__lte=hari_ini)
+        .values('tanggal', 'tipe').annotate(total=Sum('total_jumlah')).order_by()
+    ):
+        deret[row['tanggal']][row['tipe']] = row['total']
+
+    top_keluar = list(
+        rekap.filter(tipe='OUT', tanggal__gte=awal_deret, tanggal__lte=hari_ini)
+        .values('barang_id', sku=F('barang__sku'), nama=F('barang__nama'))
+        .annotate(total_jumlah=Sum('total_jumlah'), jumlah_transaksi=Sum('jumlah_transaksi'))
+        .order_by('-total_jumlah', 'barang_id')[:top]
+    )
+
+    return {
+        'hari': hari,
+        'per_gudang': per_gudang,
+        'per_kategori': per_kategori,
+        'volume': volume,
+        'harian': [{'tanggal': t, 'masuk': v['IN'], 'keluar': v['OUT']} for t, v in deret.items()],
+        'top_keluar': top_keluar,
+    }
@@ -0,0 +1,154 @@
+"""Rekonsiliasi ledger: cocokkan `Stok.jumlah` dengan total IN - OUT riwayatnya.
+
+`Stok.jumlah` bisa berubah tanpa RiwayatStok (upsert `StokViewSet.create`,
+edit lewat admin), sehingga saldo tercatat dan log pergerakannya bisa
+menyimpang. `periksa_gudang(gudang)` menghitung saldo yang diharapkan untuk
+setiap stok satu gudang:
+
+  - stok dibagi per rentang id (`ukuran_chunk` stok per query) dan total
+    pergerakannya dihitung di database dengan GROUP BY (`arsip.net_per_stok`,
+    tabel arsip ikut dijumlahkan jika ada), jadi baris riwayat tidak pernah
+    dimuat ke Python;
+  - stok yang selisih diperiksa ulang di dalam transaksi dengan baris stoknya
+    dikunci, supaya pergerakan yang commit di antara dua query tidak
+    dilaporkan sebagai selisih;
+  - jika `perbaiki`, selisihnya dicatat sebagai riwayat penyesuaian (IN atau
+    OUT sebesar selisih) tanpa mengubah `Stok.jumlah`, di transaksi yang sama.
+    Riwayat penyesuaian melewati `riwayat_tercatat`, jadi rekap harian dan
+    stream real-time ikut diperbarui.
+
+`rekonsiliasi(gudang_ids, pekerja)` menjalankan `periksa_gudang` untuk banyak
+gudang sekaligus di pool proses (atau thread). Setelah penyesuaian ditulis,
+checkpoint stok baru dibuat agar `checkpoint.level_pada` tidak menghitung
+penyesuaian dua kali (jumlah di checkpoint lama sudah mengandung selisihnya).
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import django
+from django.db import connections, transaction
+
+from . import arsip, checkpoint
+from .models import CheckpointStok, Gudang, RiwayatStok, Stok
+from .movements import UKURAN_BATCH_DB, _kunci_stok, _kunci_tulis_sqlite, riwayat_tercatat
+
+UKURAN_CHUNK = 5000
+CATATAN_PENYESUAIAN = 'Penyesuaian rekonsiliasi ledger'
+
+
+def _chunk_stok(gudang_id, ukuran_chunk):
+    """(id_awal, id_akhir, banyak) untuk setiap `ukuran_chunk` stok satu gudang, urut id."""
+    stok = Stok.objects.filter(gudang_id=gudang_id).order_by('id')
+    terakhir = 0
+    while True:
+        ids = list(stok.filter(id__gt=terakhir).values_list('id', flat=True)[:ukuran_chunk])
+        if not ids:
+            return
+        yield ids[0], ids[-1], len(ids)
+        terakhir = ids[-1]
+
+
+def _selisih(gudang_id, awal, akhir):
+    """List (stok_id, jumlah, total_riwayat) yang tidak cocok di rentang id stok ini."""
+    filter_stok = {'stok__gudang_id': gudang_id, 'stok_id__gte': awal, 'stok_id__lte': akhir}
+    riwayat = arsip.net_per_stok(None, **filter_stok)
+    return [
+        (stok_id, jumlah, riwayat.get(stok_id, 0))
+        for stok_id, jumlah in Stok.objects.filter(gudang_id=gudang_id, id__gte=awal, id__lte=akhir)
+        .order_by('id').values_list('id', 'jumlah')
+        if jumlah != riwayat.get(stok_id, 0)
+    ]
+
+
+def _periksa_ulang(stok_ids, perbaiki, user_id):
+    """Hitung ulang selisih dengan stok terkunci; tulis riwayat penyesuaian jika `perbaiki`."""
+    with transaction.atomic():
+        if perbaiki:
+            _kunci_tulis_sqlite()
+        terkunci = _kunci_stok(stok_ids)
+        riwayat = arsip.net_per_stok(None, stok_id__in=list(terkunci))
+        selisih = [
+            (stok.pk, stok.jumlah, riwayat.get(stok.pk, 0))
+            for stok in terkunci.values() if stok.jumlah != riwayat.get(stok.pk, 0)
+        ]
+        if perbaiki and selisih:
+            penyesuaian = [
+                RiwayatStok(
+                    stok_id=stok_id, tipe='IN' if jumlah > total else 'OUT', jumlah=abs(jumlah - total),
+                    catatan=f'{CATATAN_PENYESUAIAN} (jumlah {jumlah}, riwayat {total})', dibuat_oleh_id=user_id,
+                )
+                for stok_id, jumlah, total in selisih
+            ]
+            riwayat_tercatat(RiwayatStok.objects.bulk_create(penyesuaian, batch_size=UKURAN_BATCH_DB))
+    return selisih
+
+
+def periksa_gudang(gudang_id, ukuran_chunk=UKURAN_CHUNK, perbaiki=False, user_id=None):
+    """Rekonsiliasi semua stok satu gudang.
+
+    Mengembalikan dict `gudang`, `stok` (jumlah stok diperiksa), `selisih`
+    (list (stok_id, jumlah, total_riwayat)), `diperbaiki` dan `detik`.
+    """
+    mulai = time.monotonic()
+    diperiksa, selisih = 0, []
+    for awal, akhir, banyak in _chunk_stok(gudang_id, ukuran_chunk):
+        diperiksa += banyak
+        kandidat = [stok_id for stok_id, _, _ in _selisih(gudang_id, awal, akhir)]
+        for i in range(0, len(kandidat), UKURAN_BATCH_DB):
+            selisih.extend(_periksa_ulang(kandidat[i:i + UKURAN_BATCH_DB], perbaiki, user_id))
+    return {
+        'gudang': gudang_id,
+        'stok': diperiksa,
+        'selisih': sorted(selisih),
+        'diperbaiki': len(selisih) if perbaiki else 0,
+        'detik': round(time.monotonic() - mulai, 3),
+    }
+
+
+def periksa_gudang_terisolasi(*args, **kwargs):
+    """`periksa_gudang` untuk pool thread/proses: koneksi database ditutup setelahnya."""
+    try:
+        return periksa_gudang(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def _inisialisasi_proses():
+    # Proses anak hasil spawn (bukan fork) harus menyiapkan Django sendiri
+    django.setup()
+
+
+def rekonsiliasi(gudang_ids=None, pekerja=1, mode='proses', ukuran_chunk=UKURAN_CHUNK,
+                 perbaiki=False, user_id=None, callback=None):
+    """Rekonsiliasi banyak gudang, paralel per gudang jika `pekerja` > 1.
+
+    `callback(hasil)` dipanggil setiap satu gudang selesai (urutan selesai,
+    bukan urutan id). Mengembalikan list hasil `periksa_gudang` urut id gudang.
+    """
+    if gudang_ids is None:
+        gudang_ids = list(Gudang.objects.order_by('id').values_list('id', flat=True))
+    argumen = dict(ukuran_chunk=ukuran_chunk, perbaiki=perbaiki, user_id=user_id)
+    semua = []
+    if pekerja <= 1 or len(gudang_ids) <= 1:
+        for gudang_id in gudang_ids:
+            semua.append(periksa_gudang(gudang_id, **argumen))
+            if callback:
+                callback(semua[-1])
+    else:
+        if mode == 'proses':
+            # Koneksi database tidak boleh ikut diwariskan ke proses anak
+            connections.close_all()
+            pool = ProcessPoolExecutor(min(pekerja, len(gudang_ids)), mp_context=multiprocessing.get_context(),
+                                       initializer=_inisialisasi_proses)
+        else:
+            pool = ThreadPoolExecutor(min(pekerja, len(gudang_ids)), thread_name_prefix='rekonsiliasi')
+        with pool:
+            futures = [pool.submit(periksa_gudang_terisolasi, gudang_id, **argumen) for gudang_id in gudang_ids]
+            for future in as_completed(futures):
+                semua.append(future.result())
+                if callback:
+                    callback(semua[-1])
+    if perbaiki and any(h['diperbaiki'] for h in semua) and CheckpointStok.objects.exists():
+        checkpoint.buat_checkpoint()
+    return sorted(semua, key=lambda h: h['gudang'])
@@ -0,0 +1,146 @@
+"""Pencarian full-text barang memakai index SQLite FTS5.
+
+Index `inventaris_barang_fts` menyimpan dokumen denormalisasi per barang
+(sku, nama, nama kategori, nama supplier) dengan rowid = id barang. Index
+dijaga tetap sinkron lewat signal di `inventaris/signals.py`.
+
+Di database selain SQLite index tidak dibuat dan pencarian kembali memakai
+`icontains` bawaan SearchFilter.
+"""
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+FTS_TABEL = 'inventaris_barang_fts'
+
+# Lookup field relatif terhadap Barang -> kolom di index FTS
+KOLOM_FTS = {
+    'sku': 'sku',
+    'nama': 'nama',
+    'kategori__nama': 'kategori',
+    'supplier__nama': 'supplier',
+}
+
+SQL_ISI = (
+    f'INSERT INTO {FTS_TABEL} (rowid, sku, nama, kategori, supplier) '
+    'SELECT b.id, b.sku, b.nama, k.nama, COALESCE(s.nama, \'\') '
+    'FROM inventaris_barang b '
+    'INNER JOIN inventaris_kategori k ON k.id = b.kategori_id '
+    'LEFT OUTER JOIN inventaris_supplier s ON s.id = b.supplier_id'
+)
+
+
+def fts_tersedia(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def _indeks_ulang(where, params, using='default'):
+    """Hapus lalu tulis ulang dokumen FTS untuk barang yang memenuhi `where` (SQL atas alias b)."""
+    if not fts_tersedia(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABEL} WHERE rowid IN (SELECT b.id FROM inventaris_barang b WHERE {where})',
+            params,
+        )
+        cursor.execute(f'{SQL_ISI} WHERE {where}', params)
+
+
+def indeks_barang(barang_ids, using='default'):
+    barang_ids = list(barang_ids)
+    if barang_ids:
+        placeholder = ', '.join(['%s'] * len(barang_ids))
+        _indeks_ulang(f'b.id IN ({placeholder})', barang_ids, using)
+
+
+def indeks_barang_kategori(kategori_id, using='default'):
+    _indeks_ulang('b.kategori_id = %s', [kategori_id], using)
+
+
+def indeks_barang_supplier(supplier_id, using='default'):
+    _indeks_ulang('b.supplier_id = %s', [supplier_id], using)
+
+
+def hapus_barang(barang_ids, using='default'):
+    barang_ids = list(barang_ids)
+    if not barang_ids or not fts_tersedia(using):
+        return
+    placeholder = ', '.join(['%s'] * len(barang_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABEL} WHERE rowid IN ({placeholder})', barang_ids)
+
+
+def bangun_ulang(using='default'):
+    """Isi ulang seluruh index dari tabel barang."""
+    if not fts_tersedia(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABEL}')
+        cursor.execute(SQL_ISI)
+
+
+def ekspresi_match(term, kolom=None, operator=' '):
+    """Ubah kata pencarian menjadi ekspresi MATCH FTS5 dengan prefix matching.
+
+    Setiap kata di-quote (agar karakter seperti '-' di SKU tidak dibaca sebagai
+    operator) dan diberi `*` sehingga 'kop' cocok dengan 'kopi'. Kata-kata
+    digabung dengan `operator` (default spasi = AND).
+    """
+    kata = operator.join('"{}"*'.format(k.replace('"', '""')) for k in term.split())
+    if kolom:
+        return '{%s} : (%s)' % (' '.join(kolom), kata)
+    return kata
+
+
+class FullTextSearchFilter(SearchFilter):
+    """SearchFilter yang memakai index FTS untuk field barang.
+
+    ViewSet mengaktifkannya dengan `fts_prefix`: path relasi dari model viewset
+    ke Barang ('' untuk BarangViewSet, 'barang__' untuk StokViewSet). Field di
+    `search_fields` yang ada di index dicari lewat FTS, field lain (mis.
+    `gudang__nama`) tetap memakai icontains. Tanpa `?ordering=`, hasil diurutkan
+    berdasarkan relevansi (bm25).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = getattr(view, 'fts_prefix', None)
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if prefix is None or not search_fields or not search_terms or not fts_tersedia(queryset.db):
+            return super().filter_queryset(request, queryset, view)
+
+        kolom, sisa = [], []
+        for field in search_fields:
+            relatif = field[len(prefix):] if field.startswith(prefix) else None
+            if relatif in KOLOM_FTS:
+                kolom.append(KOLOM_FTS[relatif])
+            else:
+                sisa.append(field)
+        if not kolom:
+            return super().filter_queryset(request, queryset, view)
+        if len(kolom) == len(KOLOM_FTS):
+            kolom = None
+
+        field_id = f'{prefix}id' if prefix else 'id'
+        for term in search_terms:
+            kondisi = Q(**{f'{field_id}__in': RawSQL(
+                f'SELECT rowid FROM {FTS_TABEL} WHERE {FTS_TABEL} MATCH %s',
+                [ekspresi_match(term, kolom)],
+            )})
+            for field in sisa:
+                kondisi |= Q(**{self.construct_search(field): term})
+            queryset = queryset.filter(kondisi)
+
+        if not request.query_params.get('ordering'):
+            # Peringkat relevansi: rank FTS5 bernilai negatif, makin kecil makin relevan.
+            # Baris yang cocok hanya lewat field non-FTS mendapat 0 (di urutan akhir).
+            opts = queryset.model._meta
+            kolom_id = opts.get_field(prefix[:-2]).column if prefix else opts.pk.column
+            expr = ekspresi_match(' '.join(search_terms), kolom, operator=' OR ')
+            queryset = queryset.annotate(relevansi=RawSQL(
+                f'COALESCE((SELECT rank FROM {FTS_TABEL} WHERE {FTS_TABEL} MATCH %s '
+                f'AND rowid = "{opts.db_table}"."{kolom_id}"), 0)',
+                [expr],
+            )).order_by('relevansi', *queryset.query.order_by)
+        return queryset
@@ -0,0 +1,218 @@
+"""Serialisasi read-only cepat untuk list besar.
+
+`kompilasi(SerializerClass)` menganalisis field ModelSerializer sekali, lalu
+menghasilkan `SerializerTerkompilasi` yang membaca baris `.values()` (tanpa
+membuat instance model) dan mengubahnya ke dict dengan accessor yang sudah
+dihitung di depan: `source='barang.nama'` menjadi kolom `barang__nama` hasil
+JOIN, relasi primary key menjadi kolom id-nya, dan datetime diformat langsung.
+Output sama persis dengan `SerializerClass(many=True).data`, termasuk field
+yang dilewati DRF ketika relasi nullable di tengah `source` bernilai NULL.
+Relasi yang diekspansi lewat `?expand=` (fieldsets.py) dikompilasi menjadi
+kolom JOIN dengan prefix relasinya.
+
+Field yang tidak bisa dikompilasi (SerializerMethodField, serializer bersarang
+selain ekspansi ModelSerializer, relasi many, source ke property/method) membuat `kompilasi` mengembalikan None
+dan view tetap memakai serializer biasa. ViewSet mengaktifkannya lewat
+`SerializerCepatMixin`.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import ForeignKey, OneToOneField
+from django.utils import timezone
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.fields import empty
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import metrics
+
+# Field DRF yang to_representation-nya tidak mengubah nilai dari database
+_TANPA_KONVERSI = (
+    drf_fields.IntegerField.to_representation,
+    drf_fields.CharField.to_representation,
+    drf_fields.ReadOnlyField.to_representation,
+)
+_LEWATI = object()
+MAKS_CACHE = 256
+_cache = {}
+
+
+class TidakDidukung(Exception):
+    pass
+
+
+def path_model(model, source_attrs):
+    """(lookup values(), penjaga relasi nullable, field model terakhir) untuk `source_attrs`."""
+    bagian, penjaga = [], []
+    for i, attr in enumerate(source_attrs):
+        if model is None:
+            raise TidakDidukung(attr)
+        if attr == 'pk':
+            attr = model._meta.pk.name
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            raise TidakDidukung(attr)
+        if not field.concrete or field.many_to_many:
+            raise TidakDidukung(attr)
+        bagian.append(attr)
+        if i < len(source_attrs) - 1:
+            if not isinstance(field, (ForeignKey, OneToOneField)):
+                raise TidakDidukung(attr)
+            if field.null:
+                penjaga.append('__'.join(bagian))
+            model = field.related_model
+        else:
+            return '__'.join(bagian), tuple(penjaga), field
+    raise TidakDidukung('source kosong')
+
+
+def _nilai_kosong(field):
+    """Perilaku DRF jika relasi di tengah `source` NULL (lihat Field.get_attribute)."""
+    if field.default is not empty:
+        return field.get_default()
+    if field.allow_null:
+        return None
+    if not field.required:
+        return _LEWATI
+    raise TidakDidukung(field.field_name)
+
+
+class SerializerTerkompilasi:
+    def __init__(self, serializer_class, rencana=None):
+        serializer = serializer_class(rencana=rencana) if rencana is not None else serializer_class()
+        self.serializer_class = serializer_class
+        self.kolom = []
+        self.langkah = self._kompilasi(serializer, serializer.Meta.model, '')
+
+    def _kompilasi(self, serializer, model, prefix):
+        langkah = []
+        for nama, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ModelSerializer):
+                # Relasi yang diekspansi (fieldsets.py): kolom objek bersarang ikut di-JOIN
+                lookup, penjaga, field_model = path_model(model, field.source_attrs)
+                if not field_model.is_relation or penjaga:
+                    raise TidakDidukung(nama)
+                self._tambah_kolom(prefix + lookup)
+                anak = self._kompilasi(field, field_model.related_model, f'{prefix}{lookup}__')
+                langkah.append((nama, prefix + lookup, field, None, None, anak))
+                continue
+            if isinstance(field, (relations.ManyRelatedField, drf_fields.SerializerMethodField,
+                                  serializers.BaseSerializer)) or field.source == '*':
+                raise TidakDidukung(nama)
+            if isinstance(field, relations.RelatedField) and not (
+                    isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None):
+                raise TidakDidukung(nama)
+            lookup, penjaga, field_model = path_model(model, field.source_attrs)
+            if field_model.is_relation and not isinstance(field, relations.PrimaryKeyRelatedField):
+                raise TidakDidukung(nama)
+            lookup, penjaga = prefix + lookup, tuple(prefix + p for p in penjaga)
+            for kunci in (lookup, *penjaga):
+                self._tambah_kolom(kunci)
+            langkah.append((nama, lookup, field, penjaga or None, _nilai_kosong(field) if penjaga else None, None))
+        return langkah
+
+    def _tambah_kolom(self, kunci):
+        if kunci not in self.kolom:
+            self.kolom.append(kunci)
+
+    def values(self, queryset, tambahan=()):
+        """Queryset `.values()` dengan kolom yang dibutuhkan (plus `tambahan`, mis. kolom cursor)."""
+        return queryset.values(*self.kolom, *(k for k in tambahan if k not in self.kolom))
+
+    def _konverter(self, field):
+        to_rep = type(field).to_representation
+        if isinstance(field, relations.PrimaryKeyRelatedField) or to_rep in _TANPA_KONVERSI:
+            return None
+        if to_rep is drf_fields.DateTimeField.to_representation:
+            format_ = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            zona = field.timezone if hasattr(field, 'timezone') else (
+                timezone.get_current_timezone() if settings.USE_TZ else None)
+            if format_ is None or format_.lower() != drf_fields.ISO_8601 or zona is None:
+                return field.to_representation
+
+            def datetime_iso(nilai, zona=zona, umum=field.to_representation):
+                if isinstance(nilai, str) or nilai.tzinfo is None:
+                    return umum(nilai)
+                teks = nilai.astimezone(zona).isoformat()
+                return teks[:-6] + 'Z' if teks.endswith('+00:00') else teks
+            return datetime_iso
+        return field.to_representation
+
+    def _siapkan(self, langkah):
+        return [
+            (nama, lookup, None if anak is not None else self._konverter(field), penjaga, kosong,
+             self._siapkan(anak) if anak is not None else None)
+            for nama, lookup, field, penjaga, kosong, anak in langkah
+        ]
+
+    def serialisasi(self, rows):
+        """List dict untuk baris hasil `values()`; sama dengan `Serializer(many=True).data`."""
+        with metrics.ukur('serializer'):
+            langkah = self._siapkan(self.langkah)
+            return [_baris(row, langkah) for row in rows]
+
+
+def _baris(row, langkah):
+    data = {}
+    for nama, lookup, ubah, penjaga, kosong, anak in langkah:
+        if penjaga is not None and any(row[k] is None for k in penjaga):
+            if kosong is not _LEWATI:
+                data[nama] = kosong
+            continue
+        nilai = row[lookup]
+        if anak is not None:
+            # Relasi nullable yang kosong menjadi null, sama seperti serializer bersarang DRF
+            data[nama] = None if nilai is None else _baris(row, anak)
+        else:
+            data[nama] = nilai if nilai is None or ubah is None else ubah(nilai)
+    return data
+
+
+def kompilasi(serializer_class, rencana=None):
+    """SerializerTerkompilasi (di-cache per kelas dan rencana fieldset), atau None jika tidak didukung."""
+    kunci = (serializer_class, rencana.kunci if rencana is not None else None)
+    if kunci not in _cache:
+        if len(_cache) >= MAKS_CACHE:
+            # Kombinasi ?fields=/?expand= berasal dari klien; batasi ukuran cache
+            _cache.clear()
+        try:
+            _cache[kunci] = SerializerTerkompilasi(serializer_class, rencana)
+        except TidakDidukung:
+            _cache[kunci] = None
+    return _cache[kunci]
+
+
+class SerializerCepatMixin:
+    """Aksi list di `serializer_cepat_aksi` memakai serializer terkompilasi.
+
+    Queryset view (filter, search, ordering, paginasi) tetap sama; hanya baris
+    yang diambil sebagai `.values()` dan diserialisasi tanpa instance model.
+    Jika serializer view tidak bisa dikompilasi, list biasa yang dipakai.
+    """
+    serializer_cepat_aksi = ('list',)
+
+    def serializer_terkompilasi(self):
+        if self.action not in self.serializer_cepat_aksi:
+            return None
+        rencana_fieldset = getattr(self, 'rencana_fieldset', None)
+        return kompilasi(self.get_serializer_class(), rencana_fieldset() if rencana_fieldset else None)
+
+    def list(self, request, *args, **kwargs):
+        cepat = self.serializer_terkompilasi()
+        if cepat is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is not None and hasattr(self.paginator, 'queryset_hitung'):
+            # COUNT dihitung dari queryset model: JOIN untuk kolom values() tidak ikut ke COUNT
+            self.paginator.queryset_hitung = queryset
+        # Kolom cursor ikut diambil agar paginasi keyset bisa membuat cursor berikutnya
+        tambahan = ('id', self.keyset_field) if getattr(self, 'keyset_field', None) else ()
+        queryset = cepat.values(queryset, tambahan)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(cepat.serialisasi(page))
+        return Response(cepat.serialisasi(queryset))
@@ -1,48 +1,96 @@
 from rest_framework import serializers
 from urllib.parse import urlparse, urlunparse, parse_qsl
-from .models import Kategori, Supplier, Barang, Gudang, Stok, RiwayatStok
+from . import metrics
+from django.urls import reverse
+from .models import Kategori, Supplier, Barang, Gudang, Stok, RiwayatStok, Tugas
 
-class KategoriSerializer(serializers.ModelSerializer):
+def bersihkan_gambar_url(value):
+    """Sanitize image URL by removing common tracking query params (utm_*, fbclid, gclid)."""
+    if not value:
+        return value
+    try:
+        p = urlparse(value)
+        if not p.scheme or not p.netloc:
+            return value
+        # Filter out tracking params
+        q = parse_qsl(p.query, keep_blank_values=True)
+        q = [(k, v) for (k, v) in q if not (k.startswith('utm_') or k in ('fbclid', 'gclid'))]
+        newq = '&'.join([f"{k}={v}" for k, v in q])
+        cleaned = urlunparse((p.scheme, p.netloc, p.path or '', p.params or '', newq, p.fragment or ''))
+        return cleaned
+    except Exception:
+        return value
+
+class ListSerializerTerukur(serializers.ListSerializer):
+    @property
+    def data(self):
+        with metrics.ukur('serializer'):
+            return super().data
+
+class ModelSerializerTerukur(serializers.ModelSerializer):
+    """ModelSerializer yang waktu serialisasinya tercatat sebagai fase `serializer` (lihat metrics.py)."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = ListSerializerTerukur
+
+    def __init__(self, *args, rencana=None, **kwargs):
+        # Pilihan ?fields= / ?expand= dari request (lihat fieldsets.py)
+        self.rencana = rencana
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def relasi_ekspansi(cls):
+        """{nama field relasi: serializer} yang boleh diekspansi lewat `?expand=` (Meta.ekspansi)."""
+        ekspansi = getattr(cls.Meta, 'ekspansi', {})
+        return {nama: globals()[kelas] if isinstance(kelas, str) else kelas for nama, kelas in ekspansi.items()}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.rencana is None:
+            return fields
+        # Relasi yang diekspansi diganti objek bersarang (read-only) di posisi yang sama
+        for nama, anak in self.rencana.expand.items():
+            fields[nama] = anak.serializer_class(read_only=True, rencana=anak)
+        if self.rencana.fields is not None:
+            fields = type(fields)((nama, field) for nama, field in fields.items() if nama in self.rencana.fields)
+        return fields
+
+    @property
+    def data(self):
+        with metrics.ukur('serializer'):
+            return super().data
+
+class KategoriSerializer(ModelSerializerTerukur):
     class Meta:
         model = Kategori
         fields = ['id', 'nama', 'deskripsi', 'dibuat_pada']
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(ModelSerializerTerukur):
     class Meta:
         model = Supplier
         fields = ['id', 'nama', 'kontak', 'telepon', 'email', 'alamat', 'dibuat_pada']
 
-class BarangSerializer(serializers.ModelSerializer):
+class BarangSerializer(ModelSerializerTerukur):
     kategori_nama = serializers.CharField(source='kategori.nama', read_only=True)
     supplier_nama = serializers.CharField(source='supplier.nama', read_only=True)
     
     class Meta:
         model = Barang
         fields = ['id', 'sku', 'nama', 'deskripsi', 'kategori', 'kategori_nama', 'supplier', 'supplier_nama', 'satuan', 'gambar_url', 'dibuat_pada', 'diperbarui_pada']
+        ekspansi = {'kategori': 'KategoriSerializer', 'supplier': 'SupplierSerializer'}
 
     def validate_gambar_url(self, value):
-        """Sanitize image URL by removing common tracking query params (utm_*, fbclid, gclid)."""
-        if not value:
-            return value
-        try:
-            p = urlparse(value)
-            if not p.scheme or not p.netloc:
-                return value
-            # Filter out tracking params
-            q = parse_qsl(p.query, keep_blank_values=True)
-            q = [(k, v) for (k, v) in q if not (k.startswith('utm_') or k in ('fbclid', 'gclid'))]
-            newq = '&'.join([f"{k}={v}" for k, v in q])
-            cleaned = urlunparse((p.scheme, p.netloc, p.path or '', p.params or '', newq, p.fragment or ''))
-            return cleaned
-        except Exception:
-            return value
+        return bersihkan_gambar_url(value)
 
-class GudangSerializer(serializers.ModelSerializer):
+class GudangSerializer(ModelSerializerTerukur):
     class Meta:
         model = Gudang
         fields = ['id', 'nama', 'lokasi', 'deskripsi', 'dibuat_pada']
 
-class StokSerializer(serializers.ModelSerializer):
+class StokSerializer(ModelSerializerTerukur):
     barang_nama = serializers.CharField(source='barang.nama', read_only=True)
     barang_sku = serializers.CharField(source='barang.sku', read_only=True)
     gudang_nama = serializers.CharField(source='gudang.nama', read_only=True)
@@ -52,12 +100,32 @@ class StokSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stok
         fields = ['id', 'barang', 'barang_nama', 'barang_sku', 'gudang', 'gudang_nama', 'jumlah', 'level_reorder', 'diperbarui_pada', 'barang_satuan','barang_gambar']
+        ekspansi = {'barang': 'BarangSerializer', 'gudang': 'GudangSerializer'}
 
-class RiwayatStokSerializer(serializers.ModelSerializer):
+class RiwayatStokSerializer(ModelSerializerTerukur):
     stok_barang = serializers.CharField(source='stok.barang.nama', read_only=True)
     stok_gudang = serializers.CharField(source='stok.gudang.nama', read_only=True)
     dibuat_oleh_nama = serializers.CharField(source='dibuat_oleh.username', read_only=True)
     
     class Meta:
         model = RiwayatStok
-        fields = ['id', 'stok', 'stok_barang', 'stok_gudang', 'tipe', 'jumlah', 'catatan', 'dibuat_oleh', 'dibuat_oleh_nama', 'dibuat_pada']
\ No newline at end of file
+        fields = ['id', 'stok', 'stok_barang', 'stok_gudang', 'tipe', 'jumlah', 'catatan', 'dibuat_oleh', 'dibuat_oleh_nama', 'dibuat_pada', 'kode_transfer']
+        ekspansi = {'stok': 'StokSerializer'}
+
+class TugasSerializer(ModelSerializerTerukur):
+    dibuat_oleh_nama = serializers.CharField(source='dibuat_oleh.username', read_only=True, default=None)
+    url_hasil = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tugas
+        fields = ['id', 'jenis', 'parameter', 'status', 'progres', 'pesan', 'hasil', 'error', 'percobaan',
+                  'maks_percobaan', 'dibuat_oleh', 'dibuat_oleh_nama', 'dibuat_pada', 'jalan_setelah',
+                  'mulai_pada', 'selesai_pada', 'url_hasil']
+        read_only_fields = [f for f in fields if f not in ('jenis', 'parameter')]
+
+    def get_url_hasil(self, obj):
+        if obj.status != Tugas.SELESAI or not obj.berkas_hasil:
+            return None
+        url = reverse('tugas-hasil', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
@@ -0,0 +1,82 @@
+"""Signal receiver aplikasi inventaris (didaftarkan di InventarisConfig.ready)."""
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache, movements, rekap, search
+from .models import Barang, Gudang, Kategori, Supplier, RiwayatStok
+
+
+# ---------- Sinkronisasi index pencarian full-text barang ----------
+@receiver(post_save, sender=Barang)
+def fts_simpan_barang(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        search.indeks_barang([instance.pk], using)
+
+
+@receiver(post_delete, sender=Barang)
+def fts_hapus_barang(sender, instance, using='default', **kwargs):
+    search.hapus_barang([instance.pk], using)
+
+
+@receiver(post_save, sender=Kategori)
+def fts_simpan_kategori(sender, instance, created=False, raw=False, using='default', **kwargs):
+    # Kategori baru belum punya barang; penghapusan kategori ikut menghapus
+    # barangnya (CASCADE) sehingga ditangani receiver Barang di atas.
+    if not created and not raw:
+        search.indeks_barang_kategori(instance.pk, using)
+
+
+@receiver(post_save, sender=Supplier)
+def fts_simpan_supplier(sender, instance, created=False, raw=False, using='default', **kwargs):
+    if not created and not raw:
+        search.indeks_barang_supplier(instance.pk, using)
+
+
+@receiver(pre_delete, sender=Supplier)
+def fts_catat_barang_supplier(sender, instance, **kwargs):
+    # Setelah supplier dihapus, supplier_id barangnya sudah NULL (SET_NULL),
+    # jadi daftar barangnya dicatat lebih dulu.
+    instance._fts_barang_ids = list(instance.barang.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Supplier)
+def fts_hapus_supplier(sender, instance, using='default', **kwargs):
+    search.indeks_barang(getattr(instance, '_fts_barang_ids', []), using)
+
+
+# ---------- Rekap pergerakan harian ----------
+@receiver(pre_save, sender=RiwayatStok)
+def rekap_catat_riwayat_lama(sender, instance, raw=False, using='default', **kwargs):
+    # Riwayat yang diedit: simpan versi lama agar kontribusinya bisa dikurangi
+    instance._rekap_lama = None
+    if instance.pk and not raw:
+        instance._rekap_lama = sender.objects.using(using).filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=RiwayatStok)
+def rekap_simpan_riwayat(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    lama = getattr(instance, '_rekap_lama', None)
+    if lama is not None:
+        rekap.tambah([lama], faktor=-1)
+    if created:
+        movements.riwayat_tercatat([instance])
+    else:
+        rekap.tambah([instance])
+
+
+@receiver(post_delete, sender=RiwayatStok)
+def rekap_hapus_riwayat(sender, instance, **kwargs):
+    rekap.tambah([instance], faktor=-1)
+
+
+# ---------- Invalidasi cache response data referensi ----------
+@receiver(post_save, sender=Kategori)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Gudang)
+@receiver(post_delete, sender=Kategori)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Gudang)
+def cache_invalidasi_referensi(sender, **kwargs):
+    cache.naikkan_versi(sender)
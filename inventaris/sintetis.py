@@ -0,0 +1,133 @@
+"""Data sintetis (deterministik per seed) untuk benchmark dan uji beban.
+
+`buat(skala, seed)` mengisi kategori, supplier, gudang, barang, stok dan
+riwayat stok dengan bulk insert. Riwayat dibuat berurutan waktu dalam rentang
+`hari` terakhir, dan pergerakan OUT hanya dibuat jika saldonya cukup, sehingga
+`Stok.jumlah` selalu sama dengan total IN - OUT riwayatnya. Rekap harian
+diisi per batch lewat `rekap.tambah` dan index pencarian dibangun ulang di
+akhir, jadi data hasil generator konsisten dengan data yang ditulis lewat API.
+
+Riwayat ditulis dengan INSERT langsung (executemany) karena `dibuat_pada`
+memakai `auto_now_add`, yang akan menimpa waktu hasil generator jika memakai
+`bulk_create`; signal RiwayatStok juga tidak terpicu.
+"""
+import datetime
+import random
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import cache, rekap, search
+from .models import Barang, Gudang, Kategori, RiwayatStok, Stok, Supplier
+
+SKALA = {
+    'kecil': {'kategori': 10, 'supplier': 10, 'gudang': 3, 'barang': 500, 'stok_per_barang': 2, 'riwayat': 5000},
+    'sedang': {'kategori': 50, 'supplier': 50, 'gudang': 10, 'barang': 20000, 'stok_per_barang': 3, 'riwayat': 200000},
+    'besar': {'kategori': 200, 'supplier': 200, 'gudang': 20, 'barang': 100000, 'stok_per_barang': 5, 'riwayat': 2000000},
+}
+UKURAN_BATCH = 5000
+
+KATA_BARANG = (
+    'Baut', 'Mur', 'Kabel', 'Pipa', 'Lampu', 'Saklar', 'Kertas', 'Tinta', 'Semen', 'Cat',
+    'Kuas', 'Obeng', 'Palu', 'Gunting', 'Lem', 'Selang', 'Kran', 'Sekrup', 'Engsel', 'Gembok',
+)
+KATA_SIFAT = ('Besar', 'Kecil', 'Putih', 'Hitam', 'Baja', 'Plastik', 'Tembaga', 'Premium', 'Ekonomis', 'Tahan Air')
+SATUAN = ('pcs', 'kg', 'liter', 'meter', 'box')
+
+
+def ukuran(skala):
+    """Ukuran data untuk nama skala (`kecil`/`sedang`/`besar`) atau dict yang menimpa sebagian isinya."""
+    if isinstance(skala, str):
+        if skala not in SKALA:
+            raise ValueError(f'Skala tidak dikenal: {skala}')
+        return dict(SKALA[skala])
+    return {**SKALA['kecil'], **skala}
+
+
+def buat(skala='kecil', seed=0, prefix='SIN', hari=90, pengguna=None, ukuran_batch=UKURAN_BATCH):
+    """Isi database dengan data sintetis. Mengembalikan dict jumlah baris per tabel."""
+    n = ukuran(skala)
+    rng = random.Random(seed)
+    with transaction.atomic(using=router.db_for_write(RiwayatStok)):
+        kategori = Kategori.objects.bulk_create([
+            Kategori(nama=f'{prefix} Kategori {i}', deskripsi=f'Kategori sintetis {i}') for i in range(n['kategori'])
+        ], batch_size=ukuran_batch)
+        supplier = Supplier.objects.bulk_create([
+            Supplier(nama=f'{prefix} Supplier {i}', kontak=f'Kontak {i}', telepon=f'08{rng.randrange(10**9, 10**10)}',
+                     email=f'supplier{i}@contoh.test')
+            for i in range(n['supplier'])
+        ], batch_size=ukuran_batch)
+        gudang = Gudang.objects.bulk_create([
+            Gudang(nama=f'{prefix} Gudang {i}', lokasi=f'Kota {i}') for i in range(n['gudang'])
+        ], batch_size=ukuran_batch)
+        barang = Barang.objects.bulk_create([
+            Barang(
+                sku=f'{prefix}-{i:07d}',
+                nama=f'{rng.choice(KATA_BARANG)} {rng.choice(KATA_SIFAT)} {i}',
+                kategori=rng.choice(kategori),
+                supplier=rng.choice(supplier) if supplier and rng.random() < 0.9 else None,
+                satuan=rng.choice(SATUAN),
+            )
+            for i in range(n['barang'])
+        ], batch_size=ukuran_batch)
+
+        per_barang = min(n['stok_per_barang'], len(gudang))
+        pasangan = [(b, g) for b in barang for g in rng.sample(gudang, per_barang)]
+        rencana, saldo = _rencana_riwayat(rng, len(pasangan), n['riwayat'])
+        stok = Stok.objects.bulk_create([
+            Stok(barang=b, gudang=g, jumlah=saldo[i], level_reorder=rng.randint(0, 20))
+            for i, (b, g) in enumerate(pasangan)
+        ], batch_size=ukuran_batch)
+        jumlah_riwayat = _tulis_riwayat(rencana, stok, hari, pengguna, ukuran_batch)
+
+    # bulk_create tidak memicu signal index pencarian dan cache
+    if search.fts_tersedia():
+        search.bangun_ulang()
+    for model in (Kategori, Supplier, Gudang):
+        cache.naikkan_versi(model)
+    return {
+        'kategori': len(kategori), 'supplier': len(supplier), 'gudang': len(gudang),
+        'barang': len(barang), 'stok': len(stok), 'riwayat': jumlah_riwayat,
+    }
+
+
+def _rencana_riwayat(rng, n_stok, n_riwayat):
+    """Daftar (indeks stok, tipe, jumlah) urut waktu, dan saldo akhir per stok.
+
+    Saldo dihitung di depan agar Stok bisa langsung dibuat dengan jumlah akhirnya.
+    """
+    saldo = [0] * n_stok
+    rencana = []
+    for _ in range(n_riwayat if n_stok else 0):
+        s = rng.randrange(n_stok)
+        jumlah = rng.randint(1, 20)
+        tipe = 'OUT' if saldo[s] >= jumlah and rng.random() < 0.45 else 'IN'
+        saldo[s] += jumlah if tipe == 'IN' else -jumlah
+        rencana.append((s, tipe, jumlah))
+    return rencana, saldo
+
+
+def _tulis_riwayat(rencana, stok, hari, pengguna, ukuran_batch):
+    """Tulis riwayat dengan `dibuat_pada` tersebar merata sepanjang `hari` terakhir."""
+    koneksi = connections[router.db_for_write(RiwayatStok)]
+    qn = koneksi.ops.quote_name
+    kolom = ('stok_id', 'tipe', 'jumlah', 'catatan', 'dibuat_oleh_id', 'dibuat_pada')
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(RiwayatStok._meta.db_table), ', '.join(qn(k) for k in kolom), ', '.join(['%s'] * len(kolom)),
+    )
+    pengguna_id = pengguna.pk if pengguna is not None else None
+    awal = timezone.now() - datetime.timedelta(days=hari)
+    langkah = datetime.timedelta(days=hari) / max(len(rencana), 1)
+    with koneksi.cursor() as cursor:
+        for mulai in range(0, len(rencana), ukuran_batch):
+            batch = [
+                RiwayatStok(stok=stok[s], tipe=tipe, jumlah=jumlah, catatan='sintetis',
+                            dibuat_oleh_id=pengguna_id, dibuat_pada=awal + langkah * i)
+                for i, (s, tipe, jumlah) in enumerate(rencana[mulai:mulai + ukuran_batch], start=mulai)
+            ]
+            cursor.executemany(sql, [
+                (r.stok_id, r.tipe, r.jumlah, r.catatan, r.dibuat_oleh_id, koneksi.ops.adapt_datetimefield_value(r.dibuat_pada))
+                for r in batch
+            ])
+            rekap.tambah(batch)
+    return len(rencana)
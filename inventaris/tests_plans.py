@@ -0,0 +1,147 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Kategori, Barang, Gudang, Stok, RiwayatStok
+
+# Tabel yang bisa berukuran sangat besar; query ke tabel ini tidak boleh full scan
+TABEL_BESAR = ('inventaris_stok', 'inventaris_riwayatstok', 'inventaris_barang', 'inventaris_checkpointstok',
+               'inventaris_riwayatstokarsip')
+
+
+def masalah_plan_sqlite(sql):
+    """Jalankan EXPLAIN QUERY PLAN dan kembalikan daftar langkah plan yang bermasalah."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        detail = [row[-1] for row in cursor.fetchall()]
+    masalah = []
+    for langkah in detail:
+        if 'USE TEMP B-TREE' in langkah:
+            masalah.append(langkah)
+        match = re.match(r'SCAN (\w+)', langkah)
+        if match and match.group(1) in TABEL_BESAR and 'INDEX' not in langkah:
+            masalah.append(langkah)
+    return masalah
+
+
+def _node_plan(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _node_plan(child)
+
+
+def masalah_plan_postgresql(sql):
+    """Padanan PostgreSQL: Seq Scan pada tabel besar atau node Sort.
+
+    `enable_seqscan` dimatikan sementara sehingga Seq Scan yang tersisa berarti
+    memang tidak ada index yang bisa dipakai (bukan karena tabel test kecil).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    masalah = []
+    for node in _node_plan(plan[0]['Plan']):
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in TABEL_BESAR:
+            masalah.append(f"Seq Scan on {node['Relation Name']}")
+        if node['Node Type'] in ('Sort', 'Incremental Sort'):
+            masalah.append(f"{node['Node Type']} {node.get('Sort Key')}")
+    return masalah
+
+
+class QueryPlanTest(APITestCase):
+    """Regresi plan query: setiap endpoint utama harus dilayani oleh index.
+
+    Setiap SELECT yang dijalankan endpoint di-EXPLAIN; test gagal jika ada full
+    table scan pada tabel besar atau sort memakai temp B-tree.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('plan', 'p@example.com', 'password', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        kategori = Kategori.objects.create(nama='Plan')
+        self.gudang = Gudang.objects.create(nama='G', lokasi='L')
+        for i in range(3):
+            barang = Barang.objects.create(sku=f'P-{i}', nama=f'Plan {i}', kategori=kategori, satuan='pcs')
+            stok = Stok.objects.create(barang=barang, gudang=self.gudang, jumlah=5)
+            RiwayatStok.objects.create(stok=stok, tipe='IN', jumlah=5, dibuat_oleh=self.user)
+
+    def periksa_plan(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(url, params or {})
+        self.assertEqual(r.status_code, 200)
+        if connection.vendor == 'sqlite':
+            periksa = masalah_plan_sqlite
+        elif connection.vendor == 'postgresql':
+            periksa = masalah_plan_postgresql
+        else:
+            self.skipTest(f'EXPLAIN belum didukung untuk {connection.vendor}')
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(t in sql for t in TABEL_BESAR):
+                continue
+            masalah = periksa(sql)
+            self.assertEqual(masalah, [], f'Plan buruk untuk {url} {params or ""}:\n{sql}')
+        return r
+
+    def test_stok_list(self):
+        self.periksa_plan(reverse('stok-list'))
+
+    def test_stok_list_dengan_expand(self):
+        self.periksa_plan(reverse('stok-list'), {'expand': 'barang,gudang,kategori', 'fields': 'id,jumlah,barang'})
+
+    def test_stok_list_per_gudang(self):
+        self.periksa_plan(reverse('stok-list'), {'gudang': self.gudang.id})
+
+    def test_stok_list_cursor(self):
+        r = self.periksa_plan(reverse('stok-list'), {'cursor': '', 'page_size': 1})
+        self.periksa_plan(r.json()['next'])
+
+    def test_stok_reorder(self):
+        Stok.objects.update(level_reorder=10)
+        self.periksa_plan(reverse('stok-reorder'))
+        self.periksa_plan(reverse('stok-reorder'), {'gudang': self.gudang.id})
+
+    def test_stok_as_of_dan_histori(self):
+        from . import checkpoint
+
+        self.periksa_plan(reverse('stok-list'), {'as_of': '2026-01-01'})
+        checkpoint.buat_checkpoint()
+        self.periksa_plan(reverse('stok-list'), {'as_of': '2026-01-01', 'gudang': self.gudang.id})
+        self.periksa_plan(reverse('stok-list'), {'as_of': '2999-01-01'})
+        self.periksa_plan(reverse('stok-histori', args=[Stok.objects.first().pk]))
+
+    def test_riwayat_stok_list_dengan_arsip(self):
+        import datetime
+        from django.utils import timezone
+        from . import arsip
+
+        RiwayatStok.objects.update(dibuat_pada=timezone.now() - datetime.timedelta(days=400))
+        arsip.arsipkan(timezone.now() - datetime.timedelta(days=365))
+        self.periksa_plan(reverse('riwayat-stok-list'), {'dari': '2000-01-01'})
+        self.periksa_plan(reverse('riwayat-stok-list'), {'dari': '2000-01-01', 'tipe': 'OUT'})
+        self.periksa_plan(reverse('stok-list'), {'as_of': '2000-01-01'})
+
+    def test_barang_list(self):
+        self.periksa_plan(reverse('barang-list'))
+
+    def test_riwayat_stok_list(self):
+        self.periksa_plan(reverse('riwayat-stok-list'))
+
+    def test_riwayat_stok_list_per_tipe(self):
+        self.periksa_plan(reverse('riwayat-stok-list'), {'tipe': 'OUT'})
+
+    def test_riwayat_stok_list_per_petugas(self):
+        self.periksa_plan(reverse('riwayat-stok-list'), {'dibuat_oleh': self.user.id})
+
+    def test_riwayat_stok_list_cursor(self):
+        r = self.periksa_plan(reverse('riwayat-stok-list'), {'cursor': '', 'page_size': 1})
+        self.periksa_plan(r.json()['next'])
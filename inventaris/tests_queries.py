@@ -0,0 +1,111 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Kategori, Supplier, Barang, Gudang, Stok, RiwayatStok
+
+
+class QueryBudgetTest(APITestCase):
+    """Jumlah query setiap endpoint list/detail harus tetap, berapapun isi halamannya.
+
+    Jika serializer mulai mengakses relasi yang tidak di-`select_related`,
+    jumlah query akan naik seiring jumlah baris dan test ini gagal.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('budget', 'b@example.com', 'password', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def buat_data(self, n):
+        offset = Barang.objects.count()
+        for i in range(offset, offset + n):
+            kategori = Kategori.objects.create(nama=f'Kat {i}')
+            supplier = Supplier.objects.create(nama=f'Sup {i}')
+            gudang = Gudang.objects.create(nama=f'Gudang {i}', lokasi='L')
+            barang = Barang.objects.create(sku=f'Q-{i}', nama=f'Barang {i}', kategori=kategori, supplier=supplier, satuan='pcs')
+            stok = Stok.objects.create(barang=barang, gudang=gudang, jumlah=5)
+            RiwayatStok.objects.create(stok=stok, tipe='IN', jumlah=5, dibuat_oleh=self.user)
+
+    def hitung_query(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(url, params or {})
+        self.assertEqual(r.status_code, 200)
+        # StreamingHttpResponse: konsumsi isi agar query ikut terhitung
+        if r.streaming:
+            with CaptureQueriesContext(connection) as ctx_stream:
+                b''.join(r.streaming_content)
+            return len(ctx) + len(ctx_stream)
+        return len(ctx)
+
+    def assertBudgetList(self, nama_url, budget, params=None):
+        self.buat_data(2)
+        sedikit = self.hitung_query(reverse(nama_url), params)
+        self.buat_data(8)
+        banyak = self.hitung_query(reverse(nama_url), params)
+        self.assertEqual(sedikit, banyak, f'{nama_url}: jumlah query naik mengikuti jumlah baris')
+        self.assertLessEqual(banyak, budget, f'{nama_url}: {banyak} query melebihi budget {budget}')
+
+    # Satu query COUNT untuk paginasi + satu query SELECT halaman
+    def test_kategori_list(self):
+        self.assertBudgetList('kategori-list', 2)
+
+    def test_supplier_list(self):
+        self.assertBudgetList('supplier-list', 2)
+
+    def test_gudang_list(self):
+        self.assertBudgetList('gudang-list', 2)
+
+    def test_barang_list(self):
+        self.assertBudgetList('barang-list', 2)
+
+    def test_barang_list_dengan_search(self):
+        self.assertBudgetList('barang-list', 2, {'search': 'Barang'})
+
+    def test_stok_list(self):
+        self.assertBudgetList('stok-list', 2)
+
+    def test_stok_list_dengan_filter(self):
+        self.assertBudgetList('stok-list', 2, {'search': 'Barang', 'ordering': 'jumlah'})
+
+    def test_stok_list_dengan_expand(self):
+        self.assertBudgetList('stok-list', 2, {'expand': 'barang,gudang,kategori,supplier'})
+
+    def test_stok_list_dengan_fields(self):
+        self.assertBudgetList('stok-list', 2, {'fields': 'id,jumlah,barang.nama', 'expand': 'barang'})
+
+    # ?count=none: hanya query SELECT halaman (page_size + 1 baris)
+    def test_stok_list_tanpa_count(self):
+        self.assertBudgetList('stok-list', 1, {'search': 'Barang', 'count': 'none', 'page_size': 5})
+
+    def test_riwayat_stok_list(self):
+        self.assertBudgetList('riwayat-stok-list', 2)
+
+    def test_riwayat_stok_list_tanpa_count(self):
+        self.assertBudgetList('riwayat-stok-list', 1, {'search': 'Barang', 'count': 'none', 'page_size': 5})
+
+    def test_riwayat_stok_list_dengan_expand(self):
+        self.assertBudgetList('riwayat-stok-list', 2, {'expand': 'stok.barang.kategori'})
+
+    def test_stok_export(self):
+        self.assertBudgetList('stok-export', 1)
+
+    def test_riwayat_stok_export(self):
+        self.assertBudgetList('riwayat-stok-export', 1)
+
+    def test_detail(self):
+        self.buat_data(1)
+        stok = Stok.objects.get()
+        riwayat = RiwayatStok.objects.get()
+        for nama_url, pk in [
+            ('kategori-detail', stok.barang.kategori_id),
+            ('supplier-detail', stok.barang.supplier_id),
+            ('gudang-detail', stok.gudang_id),
+            ('barang-detail', stok.barang_id),
+            ('stok-detail', stok.pk),
+            ('riwayat-stok-detail', riwayat.pk),
+        ]:
+            with self.subTest(nama_url):
+                self.assertEqual(self.hitung_query(reverse(nama_url, args=[pk])), 1)
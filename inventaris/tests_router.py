@@ -0,0 +1,105 @@
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from .db_router import ReplicaRouter, ReplicaRoutingMiddleware, pakai_primary
+from .models import Stok
+from .views import StokViewSet
+
+router = ReplicaRouter()
+
+
+def catat_db(hasil):
+    """get_response palsu yang mencatat ke mana query baca akan dikirim."""
+    def get_response(request):
+        hasil.append(router.db_for_read(Stok))
+        return HttpResponse()
+    return get_response
+
+
+@override_settings(INVENTARIS_DATABASE_REPLICAS=['replica1'], INVENTARIS_REPLICA_JENDELA_LENGKET=10)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.hasil = []
+        self.middleware = ReplicaRoutingMiddleware(catat_db(self.hasil))
+
+    def request(self, method, token='Token a'):
+        return getattr(self.factory, method)('/api/stok/', HTTP_AUTHORIZATION=token)
+
+    def test_baca_ke_replica_tulis_lengket_ke_primary(self):
+        self.middleware(self.request('get'))
+        self.middleware(self.request('post'))
+        # Klien yang baru menulis membaca dari primary; klien lain tetap ke replica
+        self.middleware(self.request('get'))
+        self.middleware(self.request('get', token='Token b'))
+        self.assertEqual(self.hasil, ['replica1', 'default', 'default', 'replica1'])
+        self.assertEqual(router.db_for_read(Stok), 'default')
+        self.assertEqual(router.db_for_write(Stok), 'default')
+
+    def test_override_per_view_dan_pakai_primary(self):
+        view = StokViewSet.as_view({'get': 'list', 'post': 'create'})
+
+        def get_response(request):
+            with pakai_primary():
+                self.hasil.append(router.db_for_read(Stok))
+            self.hasil.append(router.db_for_read(Stok))
+            return HttpResponse()
+
+        def dengan_view(request):
+            middleware.process_view(request, view, (), {})
+            return get_response(request)
+
+        middleware = ReplicaRoutingMiddleware(dengan_view)
+        middleware(self.request('get'))
+        self.assertEqual(self.hasil, ['default', 'replica1'])
+
+        # Aksi yang terdaftar di baca_dari_primary selalu membaca dari primary
+        class StokSegar(StokViewSet):
+            baca_dari_primary = ('list',)
+
+        view = StokSegar.as_view({'get': 'list'})
+        self.hasil.clear()
+        middleware(self.request('get', token='Token c'))
+        self.assertEqual(self.hasil, ['default', 'default'])
+
+    async def test_middleware_async(self):
+        async def get_response(request):
+            self.hasil.append(router.db_for_read(Stok))
+            return HttpResponse()
+
+        # Di bawah ASGI middleware berjalan sebagai coroutine, tanpa adaptasi sync_to_async
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertFalse(iscoroutinefunction(self.middleware))
+        await middleware(self.request('get'))
+        await middleware(self.request('post'))
+        await middleware(self.request('get'))
+        self.assertEqual(self.hasil, ['replica1', 'default', 'default'])
+        self.assertEqual(router.db_for_read(Stok), 'default')
+
+    def test_streaming_tetap_ke_replica(self):
+        def get_response(request):
+            return StreamingHttpResponse(router.db_for_read(Stok) for _ in range(2))
+
+        response = ReplicaRoutingMiddleware(get_response)(self.request('get'))
+        self.assertEqual(b''.join(response.streaming_content), b'replica1replica1')
+        self.assertEqual(router.db_for_read(Stok), 'default')
+
+
+@override_settings(INVENTARIS_DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTransaksiTest(TransactionTestCase):
+    def test_di_dalam_transaksi_selalu_primary(self):
+        hasil = []
+
+        def get_response(request):
+            with transaction.atomic():
+                hasil.append(router.db_for_read(Stok))
+            return HttpResponse()
+
+        cache.clear()
+        ReplicaRoutingMiddleware(get_response)(RequestFactory().get('/api/stok/'))
+        self.assertEqual(hasil, ['default'])
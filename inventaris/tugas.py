@@ -0,0 +1,480 @@
+"""Tugas latar berbasis tabel database (tanpa broker eksternal).
+
+Pekerjaan berat yang tidak muat dalam satu request HTTP (export stok besar,
+hapus kategori dengan ribuan barang, bangun ulang rekap dari log riwayat,
+rekonsiliasi ledger stok)
+dikirim sebagai baris `Tugas` lewat `kirim()` / `POST /api/tugas/`, lalu
+dijalankan oleh `python manage.py jalankan_tugas` dalam pool thread atau
+proses. Klien memantau `progres` lewat `GET /api/tugas/<id>/` dan mengunduh
+berkas hasilnya dari `/api/tugas/<id>/hasil/`.
+
+Alur status: antri -> berjalan -> selesai | gagal | batal.
+  - Pekerja mengambil tugas dengan UPDATE bersyarat (`status='antri'`),
+    jadi beberapa pekerja aman berbagi satu antrian.
+  - Exception biasa dicoba ulang dengan jeda eksponensial sampai
+    `maks_percobaan`; `TugasGagal` langsung menggagalkan tugas.
+  - Pekerja memperbarui `detak` selama tugas berjalan. Tugas 'berjalan'
+    yang detaknya lebih tua dari BATAS_DETAK (pekerjanya mati) dikembalikan
+    ke antrian oleh pekerja lain.
+  - Pembatalan tugas yang sedang berjalan hanya menandai `batal_diminta`;
+    tugas berhenti pada laporan progres berikutnya.
+
+Jenis tugas didaftarkan dengan dekorator `daftar()`. Fungsinya menerima
+`Konteks` dan parameter tugas sebagai keyword argument, lalu mengembalikan
+dict hasil (disimpan di `Tugas.hasil`).
+
+Konfigurasi lewat setting `INVENTARIS_TUGAS` (lihat `KONFIGURASI_DEFAULT`).
+"""
+import datetime
+import logging
+import os
+import socket
+import tempfile
+import time
+import traceback
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, router, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from . import exports, rekap, rekonsiliasi
+from .filters import RiwayatStokFilter
+from .models import (
+    Barang, CheckpointStok, Gudang, Kategori, RekapPergerakanHarian, RiwayatStok, RiwayatStokArsip, Stok, Tugas,
+)
+
+logger = logging.getLogger('inventaris.tugas')
+
+KONFIGURASI_DEFAULT = {
+    'KONKURENSI': 2,
+    # Detik antar pemeriksaan antrian oleh pekerja
+    'INTERVAL': 1.0,
+    # Tugas 'berjalan' tanpa detak selama ini dianggap ditinggal pekerjanya
+    'BATAS_DETAK': 300,
+    # Jeda dasar sebelum percobaan ulang (detik), dikali 2 setiap percobaan
+    'JEDA_ULANG': 30,
+    # Tugas yang sudah berakhir (beserta berkasnya) dihapus setelah sekian hari
+    'SIMPAN_HARI': 7,
+    # Kategori dengan barang lebih dari ini dihapus lewat tugas latar
+    'AMBANG_HAPUS_KATEGORI': 500,
+}
+# Jarak minimal antar penulisan progres ke database (detik)
+INTERVAL_PROGRES = 0.5
+UKURAN_BATCH_HAPUS = 200
+
+
+def konfigurasi():
+    return {**KONFIGURASI_DEFAULT, **getattr(settings, 'INVENTARIS_TUGAS', {})}
+
+
+class TugasGagal(Exception):
+    """Kegagalan permanen (parameter salah, data tidak ada): tidak dicoba ulang."""
+
+
+class TugasDibatalkan(Exception):
+    pass
+
+
+class JenisTugas:
+    def __init__(self, nama, fungsi, validasi=None, maks_percobaan=3, maks_paralel=None, staff_saja=True):
+        self.nama = nama
+        self.fungsi = fungsi
+        self.validasi = validasi
+        self.maks_percobaan = maks_percobaan
+        self.maks_paralel = maks_paralel
+        self.staff_saja = staff_saja
+
+
+_registri = {}
+
+
+def daftar(nama, *, validasi=None, maks_percobaan=3, maks_paralel=None, staff_saja=True):
+    """Dekorator pendaftaran jenis tugas.
+
+    `validasi(parameter, user)` dipanggil saat tugas dikirim dan mengembalikan
+    parameter yang sudah dibersihkan (atau raise ValidationError).
+    `maks_paralel` membatasi jumlah tugas jenis ini yang berjalan bersamaan
+    di semua pekerja.
+    """
+    def dekorator(fungsi):
+        _registri[nama] = JenisTugas(nama, fungsi, validasi, maks_percobaan, maks_paralel, staff_saja)
+        return fungsi
+    return dekorator
+
+
+def jenis_tugas(nama):
+    return _registri.get(nama)
+
+
+def semua_jenis():
+    return sorted(_registri)
+
+
+def kirim(jenis, parameter=None, user=None, jalan_setelah=None):
+    """Masukkan tugas baru ke antrian dan kembalikan barisnya."""
+    terdaftar = _registri.get(jenis)
+    if terdaftar is None:
+        raise ValidationError({'jenis': [f'Jenis tugas tidak dikenal: {jenis}']})
+    if terdaftar.staff_saja and not (user is not None and user.is_staff):
+        raise PermissionDenied('Jenis tugas ini hanya untuk admin.')
+    parameter = dict(parameter or {})
+    if terdaftar.validasi is not None:
+        parameter = terdaftar.validasi(parameter, user)
+    return Tugas.objects.create(
+        jenis=jenis,
+        parameter=parameter,
+        dibuat_oleh=user if user is not None and user.is_authenticated else None,
+        maks_percobaan=terdaftar.maks_percobaan,
+        jalan_setelah=jalan_setelah or timezone.now(),
+    )
+
+
+def batalkan(tugas):
+    """Batalkan tugas: langsung jika masih antri, lewat `batal_diminta` jika sedang berjalan.
+
+    Mengembalikan False jika tugas sudah berakhir.
+    """
+    if Tugas.objects.filter(pk=tugas.pk, status=Tugas.ANTRI).update(
+            status=Tugas.BATAL, selesai_pada=timezone.now(), pesan='Dibatalkan'):
+        return True
+    return bool(Tugas.objects.filter(pk=tugas.pk, status=Tugas.BERJALAN).update(batal_diminta=True))
+
+
+class Konteks:
+    """Penghubung fungsi tugas dengan barisnya: progres, pembatalan dan berkas hasil."""
+
+    def __init__(self, tugas):
+        self.tugas = tugas
+        self.berkas = None
+        self._terakhir = 0.0
+        self._progres = None
+
+    def laporkan(self, selesai, total=None, pesan=None, paksa=False):
+        """Catat progres (`selesai` dari `total` langkah) dan periksa pembatalan.
+
+        Aman dipanggil per baris: penulisan ke database dibatasi sekali per
+        INTERVAL_PROGRES detik. Raise TugasDibatalkan jika tugas dibatalkan.
+        """
+        progres = min(99, int(selesai * 100 / total)) if total else 0
+        sekarang = time.monotonic()
+        if not paksa and (progres == self._progres or sekarang - self._terakhir < INTERVAL_PROGRES):
+            return
+        self._terakhir, self._progres = sekarang, progres
+        kolom = {'progres': progres, 'detak': timezone.now()}
+        if pesan is not None:
+            kolom['pesan'] = pesan[:255]
+        Tugas.objects.filter(pk=self.tugas.pk).update(**kolom)
+        if Tugas.objects.filter(pk=self.tugas.pk, batal_diminta=True).exists():
+            raise TugasDibatalkan()
+
+    def simpan_berkas(self, nama, potongan):
+        """Tulis `potongan` (iterable str/bytes, mis. generator exports.stream_csv) sebagai berkas hasil."""
+        with tempfile.TemporaryFile() as sementara:
+            for bagian in potongan:
+                sementara.write(bagian.encode('utf-8') if isinstance(bagian, str) else bagian)
+            sementara.seek(0)
+            field = self.tugas.berkas_hasil
+            field.save(nama, File(sementara, name=nama), save=False)
+        self.berkas = field.name
+        return self.berkas
+
+    def buang_berkas(self):
+        if self.berkas:
+            self.tugas.berkas_hasil.storage.delete(self.berkas)
+            self.berkas = None
+
+
+def _akhiri(tugas, **kolom):
+    """Tulis status akhir hanya jika tugas masih dipegang pekerja ini (belum dipulihkan pekerja lain)."""
+    return Tugas.objects.filter(pk=tugas.pk, status=Tugas.BERJALAN, pekerja=tugas.pekerja).update(**kolom)
+
+
+def jalankan(tugas_id):
+    """Jalankan satu tugas yang sudah diklaim (status 'berjalan'); mengembalikan status akhirnya."""
+    tugas = Tugas.objects.select_related('dibuat_oleh').get(pk=tugas_id)
+    terdaftar = _registri.get(tugas.jenis)
+    konteks = Konteks(tugas)
+    try:
+        if terdaftar is None:
+            raise TugasGagal(f'Jenis tugas tidak dikenal: {tugas.jenis}')
+        hasil = terdaftar.fungsi(konteks, **tugas.parameter)
+    except TugasDibatalkan:
+        konteks.buang_berkas()
+        status = Tugas.BATAL
+        _akhiri(tugas, status=status, pesan='Dibatalkan', selesai_pada=timezone.now())
+    except Exception as e:
+        konteks.buang_berkas()
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        if isinstance(e, TugasGagal) or tugas.percobaan >= tugas.maks_percobaan:
+            logger.exception('Tugas %s gagal', tugas)
+            status = Tugas.GAGAL
+            _akhiri(tugas, status=status, error=error, pesan=str(e)[:255], selesai_pada=timezone.now())
+        else:
+            jeda = konfigurasi()['JEDA_ULANG'] * 2 ** (tugas.percobaan - 1)
+            logger.warning('Tugas %s gagal (percobaan %s), dicoba ulang dalam %ss: %s', tugas, tugas.percobaan, jeda, error)
+            status = Tugas.ANTRI
+            _akhiri(tugas, status=status, error=error, pekerja='', detak=None,
+                    jalan_setelah=timezone.now() + datetime.timedelta(seconds=jeda))
+    else:
+        status = Tugas.SELESAI
+        if not _akhiri(tugas, status=status, progres=100, pesan='Selesai', hasil=hasil,
+                       berkas_hasil=konteks.berkas or '', selesai_pada=timezone.now()):
+            konteks.buang_berkas()
+    return status
+
+
+def jalankan_terisolasi(tugas_id):
+    """`jalankan` untuk pool thread/proses: koneksi database thread ini ditutup setelahnya."""
+    try:
+        return jalankan(tugas_id)
+    finally:
+        connections.close_all()
+
+
+def klaim(pekerja, batas, jenis=None):
+    """Ambil hingga `batas` tugas antri yang sudah waktunya; mengembalikan list id."""
+    if batas < 1:
+        return []
+    sekarang = timezone.now()
+    berjalan = dict(
+        Tugas.objects.filter(status=Tugas.BERJALAN).values('jenis').annotate(n=Count('id'))
+        .order_by().values_list('jenis', 'n')
+    )
+    kandidat = Tugas.objects.filter(
+        status=Tugas.ANTRI, jalan_setelah__lte=sekarang, jenis__in=jenis or list(_registri),
+    ).order_by('jalan_setelah', 'id').values_list('id', 'jenis')
+    diklaim = []
+    for tugas_id, nama in kandidat[:batas * 4]:
+        # Batas paralel per jenis adalah perkiraan: dua pekerja bisa mengklaim bersamaan
+        maks = _registri[nama].maks_paralel
+        if maks is not None and berjalan.get(nama, 0) >= maks:
+            continue
+        if Tugas.objects.filter(pk=tugas_id, status=Tugas.ANTRI).update(
+                status=Tugas.BERJALAN, pekerja=pekerja, mulai_pada=sekarang, detak=sekarang,
+                percobaan=F('percobaan') + 1):
+            diklaim.append(tugas_id)
+            berjalan[nama] = berjalan.get(nama, 0) + 1
+            if len(diklaim) >= batas:
+                break
+    return diklaim
+
+
+def detak(tugas_ids):
+    if tugas_ids:
+        Tugas.objects.filter(pk__in=list(tugas_ids), status=Tugas.BERJALAN).update(detak=timezone.now())
+
+
+def pulihkan_macet():
+    """Kembalikan tugas yang pekerjanya berhenti ke antrian (atau gagalkan jika percobaan habis)."""
+    sekarang = timezone.now()
+    batas = sekarang - datetime.timedelta(seconds=konfigurasi()['BATAS_DETAK'])
+    pesan = 'Pekerja berhenti sebelum tugas selesai'
+    jumlah = 0
+    for tugas in Tugas.objects.filter(status=Tugas.BERJALAN, detak__lt=batas).only(
+            'id', 'percobaan', 'maks_percobaan', 'detak'):
+        if tugas.percobaan >= tugas.maks_percobaan:
+            kolom = {'status': Tugas.GAGAL, 'error': pesan, 'selesai_pada': sekarang}
+        else:
+            kolom = {'status': Tugas.ANTRI, 'error': pesan, 'pekerja': '', 'detak': None, 'jalan_setelah': sekarang}
+        jumlah += Tugas.objects.filter(pk=tugas.pk, status=Tugas.BERJALAN, detak=tugas.detak).update(**kolom)
+    return jumlah
+
+
+def bersihkan(hari=None):
+    """Hapus tugas yang sudah berakhir lebih dari `hari` (default SIMPAN_HARI) beserta berkasnya."""
+    hari = konfigurasi()['SIMPAN_HARI'] if hari is None else hari
+    lama = Tugas.objects.filter(
+        status__in=Tugas.STATUS_AKHIR, selesai_pada__lt=timezone.now() - datetime.timedelta(days=hari))
+    for tugas in lama.exclude(berkas_hasil='').only('id', 'berkas_hasil'):
+        tugas.berkas_hasil.delete(save=False)
+    jumlah, _ = lama.delete()
+    return jumlah
+
+
+# ---------- Jenis tugas bawaan ----------
+FILTER_EKSPOR = {'gudang': 'gudang_id', 'barang': 'barang_id', 'barang__kategori': 'barang__kategori_id'}
+PARAMETER_RIWAYAT = ('tipe', 'dari', 'sampai')
+
+
+def _validasi_ekspor(parameter, user):
+    jenis = str(parameter.get('jenis') or 'csv').lower()
+    if jenis not in ('csv', 'xlsx'):
+        raise ValidationError({'parameter': {'jenis': ['Jenis harus csv atau xlsx']}})
+    hasil = {'jenis': jenis}
+    for nama in (*FILTER_EKSPOR, *PARAMETER_RIWAYAT):
+        if parameter.get(nama) not in (None, ''):
+            hasil[nama] = parameter[nama]
+    # Filter yang sama diterapkan ke sheet riwayat, jadi divalidasi dengan FilterSet-nya
+    filterset = RiwayatStokFilter({k: v for k, v in hasil.items() if k != 'barang'}, queryset=RiwayatStok.objects.none())
+    errors = dict(filterset.errors)
+    try:
+        if 'barang' in hasil:
+            hasil['barang'] = int(hasil['barang'])
+    except (TypeError, ValueError):
+        errors['barang'] = ['Masukkan angka yang valid.']
+    if errors:
+        raise ValidationError({'parameter': errors})
+    for nama in ('gudang', 'barang__kategori'):
+        if nama in hasil:
+            hasil[nama] = int(hasil[nama])
+    return hasil
+
+
+@daftar('ekspor_stok', validasi=_validasi_ekspor, maks_paralel=2, staff_saja=False)
+def ekspor_stok(konteks, jenis='csv', **filter):
+    """Export stok (CSV, atau XLSX dengan sheet 'Stok Keluar') ke berkas hasil.
+
+    Kolom dan filter sama dengan `GET /api/stok/export/`; sheet riwayat hanya
+    diisi jika pembuat tugas admin.
+    """
+    stok_qs = Stok.objects.filter(
+        jumlah__gt=0, **{FILTER_EKSPOR[k]: v for k, v in filter.items() if k in FILTER_EKSPOR},
+    ).order_by('-diperbarui_pada', '-id')
+    sheets = [('Stok', stok_qs, exports.KOLOM_STOK)]
+    if jenis == 'xlsx':
+        riwayat_qs = RiwayatStok.objects.none()
+        user = konteks.tugas.dibuat_oleh
+        if user is not None and user.is_staff:
+            params = {'tipe': 'OUT', **{k: v for k, v in filter.items() if k != 'barang'}}
+            riwayat_qs = RiwayatStokFilter(params, queryset=RiwayatStok.objects.order_by('-dibuat_pada')).qs
+        sheets.append(('Stok Keluar', riwayat_qs, exports.KOLOM_RIWAYAT))
+
+    total = sum(qs.count() for _, qs, _ in sheets)
+    ditulis = 0
+    konteks.laporkan(0, total, f'Menulis {total} baris', paksa=True)
+
+    def baris(queryset, kolom):
+        nonlocal ditulis
+        for row in exports.iter_baris(queryset, kolom):
+            ditulis += 1
+            konteks.laporkan(ditulis, total)
+            yield row
+
+    if jenis == 'csv':
+        nama = exports.nama_file('stok_export', 'csv')
+        potongan = exports.stream_csv([judul for judul, _ in exports.KOLOM_STOK], baris(stok_qs, exports.KOLOM_STOK))
+    else:
+        nama = exports.nama_file('laporan_stok', 'xlsx')
+        potongan = exports.stream_xlsx([
+            (sheet, [judul for judul, _ in kolom], baris(qs, kolom)) for sheet, qs, kolom in sheets
+        ])
+    konteks.simpan_berkas(nama, potongan)
+    return {'baris': ditulis, 'nama_berkas': nama}
+
+
+def _validasi_kategori(parameter, user):
+    try:
+        kategori = int(parameter.get('kategori'))
+    except (TypeError, ValueError):
+        raise ValidationError({'parameter': {'kategori': ['Masukkan id kategori.']}})
+    if not Kategori.objects.filter(pk=kategori).exists():
+        raise ValidationError({'parameter': {'kategori': ['Kategori tidak ditemukan.']}})
+    return {'kategori': kategori}
+
+
+def hapus_barang(barang_ids):
+    """Hapus barang beserta stok, riwayat (aktif dan arsip), checkpoint dan rekapnya.
+
+    Riwayat dan turunannya dihapus dengan SQL langsung per batch: tanpa itu
+    Collector memuat setiap riwayat dan signal post_delete-nya mengurangi
+    rekap satu per satu, padahal rekap barang yang sama ikut dihapus.
+    Barang sendiri tetap dihapus lewat ORM agar signal index pencarian jalan.
+    """
+    koneksi = connections[router.db_for_write(Barang)]
+    qn = koneksi.ops.quote_name
+    tanda = ', '.join(['%s'] * len(barang_ids))
+    stok = f'SELECT {qn("id")} FROM {qn(Stok._meta.db_table)} WHERE {qn("barang_id")} IN ({tanda})'
+    with transaction.atomic(using=koneksi.alias):
+        with koneksi.cursor() as cursor:
+            for model in (RiwayatStok, RiwayatStokArsip, CheckpointStok):
+                cursor.execute(f'DELETE FROM {qn(model._meta.db_table)} WHERE {qn("stok_id")} IN ({stok})', barang_ids)
+            cursor.execute(
+                f'DELETE FROM {qn(RekapPergerakanHarian._meta.db_table)} WHERE {qn("barang_id")} IN ({tanda})',
+                barang_ids)
+        Barang.objects.using(koneksi.alias).filter(pk__in=barang_ids).delete()
+
+
+@daftar('hapus_kategori', validasi=_validasi_kategori, maks_paralel=1)
+def hapus_kategori(konteks, kategori):
+    """Hapus kategori beserta seluruh barangnya per batch (UKURAN_BATCH_HAPUS barang per transaksi)."""
+    try:
+        obj = Kategori.objects.get(pk=kategori)
+    except Kategori.DoesNotExist:
+        raise TugasGagal(f'Kategori {kategori} tidak ditemukan')
+    barang = Barang.objects.filter(kategori_id=kategori)
+    total, dihapus = barang.count(), 0
+    while True:
+        ids = list(barang.order_by('id').values_list('id', flat=True)[:UKURAN_BATCH_HAPUS])
+        if not ids:
+            break
+        # Pembatalan hanya diperiksa di antara batch: batch yang sudah commit tetap terhapus
+        konteks.laporkan(dihapus, total, f'Menghapus barang {dihapus}/{total}')
+        hapus_barang(ids)
+        dihapus += len(ids)
+    obj.delete()
+    return {'kategori': kategori, 'nama': obj.nama, 'barang_dihapus': dihapus}
+
+
+def _validasi_rekap(parameter, user):
+    dari = parameter.get('dari')
+    if dari in (None, ''):
+        return {}
+    if parse_date(str(dari)) is None:
+        raise ValidationError({'parameter': {'dari': ['Format tanggal YYYY-MM-DD.']}})
+    return {'dari': str(dari)}
+
+
+@daftar('bangun_rekap', validasi=_validasi_rekap, maks_paralel=1)
+def bangun_rekap(konteks, dari=None):
+    """Hitung ulang rekap pergerakan harian dari log riwayat (sama dengan command bangun_rekap)."""
+    konteks.laporkan(0, 1, 'Menghitung ulang rekap', paksa=True)
+    return {'baris_rekap': rekap.bangun_ulang(parse_date(dari) if dari else None)}
+
+
+def _validasi_rekonsiliasi(parameter, user):
+    gudang = parameter.get('gudang')
+    if gudang in (None, '', []):
+        gudang = None
+    else:
+        try:
+            gudang = sorted({int(g) for g in (gudang if isinstance(gudang, list) else [gudang])})
+        except (TypeError, ValueError):
+            raise ValidationError({'parameter': {'gudang': ['Masukkan id gudang atau list id gudang.']}})
+        if Gudang.objects.filter(pk__in=gudang).count() != len(gudang):
+            raise ValidationError({'parameter': {'gudang': ['Gudang tidak ditemukan.']}})
+    perbaiki = parameter.get('perbaiki', False)
+    if isinstance(perbaiki, str):
+        perbaiki = perbaiki.lower() in ('1', 'true', 'ya')
+    return {'gudang': gudang, 'perbaiki': bool(perbaiki)}
+
+
+@daftar('rekonsiliasi_stok', validasi=_validasi_rekonsiliasi, maks_paralel=1)
+def rekonsiliasi_stok(konteks, gudang=None, perbaiki=False):
+    """Cocokkan Stok.jumlah dengan total riwayat per gudang (sama dengan command rekonsiliasi_stok)."""
+    gudang = gudang or list(Gudang.objects.order_by('id').values_list('id', flat=True))
+    selesai = []
+
+    def lapor(hasil):
+        selesai.append(hasil)
+        konteks.laporkan(len(selesai), len(gudang), f'Gudang {len(selesai)}/{len(gudang)}')
+
+    konteks.laporkan(0, len(gudang), 'Memeriksa ledger', paksa=True)
+    # Di dalam pekerja tugas gudang diperiksa berurutan: paralelismenya dari pool jalankan_tugas
+    semua = rekonsiliasi.rekonsiliasi(gudang, perbaiki=perbaiki, user_id=konteks.tugas.dibuat_oleh_id, callback=lapor)
+    selisih = [s for h in semua for s in h['selisih']]
+    return {
+        'gudang': len(semua),
+        'stok': sum(h['stok'] for h in semua),
+        'selisih': len(selisih),
+        'diperbaiki': sum(h['diperbaiki'] for h in semua),
+        # Contoh (stok_id, jumlah, total_riwayat); daftar lengkap lewat command rekonsiliasi_stok
+        'contoh_selisih': selisih[:100],
+    }
+
+
+def nama_pekerja():
+    return f'{socket.gethostname()}:{os.getpid()}'
@@ -1,22 +1,28 @@
+import os
+
 # Impor untuk Django CBV (Web Views)
 from django.shortcuts import render
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 # Impor untuk DRF API Views
-from rest_framework import viewsets
+from rest_framework import mixins, viewsets
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, action
+from rest_framework import renderers
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import status
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.db.models import F
+from django.http import FileResponse
+from django.utils import timezone
+from datetime import timedelta
 
 
 # Custom permission: allow safe methods to everyone; require authentication for write;
@@ -45,11 +51,21 @@ def current_user(request):
     })
 
 # Impor Model dan Serializer
-from .models import Kategori, Supplier, Barang, Gudang, Stok, RiwayatStok
+from .models import Kategori, Supplier, Barang, Gudang, Stok, RiwayatStok, RiwayatStokSemua, Tugas
 from .serializers import (
     KategoriSerializer, SupplierSerializer, BarangSerializer,
-    GudangSerializer, StokSerializer, RiwayatStokSerializer
+    GudangSerializer, StokSerializer, RiwayatStokSerializer, TugasSerializer
+)
+from .filters import RiwayatStokFilter, RiwayatStokSemuaFilter
+from .search import FullTextSearchFilter
+from .movements import (
+    parse_pergerakan, terapkan_batch, terapkan_pergerakan, terapkan_transfer, PergerakanGagal, MAKS_BARIS_BATCH,
 )
+from . import arsip, cache, checkpoint, exports, importer, metrics, realtime, rekap, tugas
+from .idempotensi import idempoten
+from .conditional import ConditionalMixin
+from .serializer_cepat import SerializerCepatMixin
+from .fieldsets import FieldsetMixin
 
 # ====================== WEB VIEWS (CBV) ======================
 class BarangListView(LoginRequiredMixin, ListView):
@@ -76,7 +92,7 @@ class BarangDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('barang-list')
 
 # ====================== API VIEWS (DRF ViewSet) ======================
-class KategoriViewSet(viewsets.ModelViewSet):
+class KategoriViewSet(cache.ResponseCacheMixin, FieldsetMixin, viewsets.ModelViewSet):
     queryset = Kategori.objects.all().order_by('nama')
     serializer_class = KategoriSerializer
     permission_classes = [IsAuthenticatedOrAdminDelete]
@@ -84,7 +100,25 @@ class KategoriViewSet(viewsets.ModelViewSet):
     search_fields = ['nama', 'deskripsi']
     ordering_fields = ['nama', 'dibuat_pada']
 
-class SupplierViewSet(viewsets.ModelViewSet):
+    def destroy(self, request, *args, **kwargs):
+        """Kategori dengan barang lebih dari AMBANG_HAPUS_KATEGORI dihapus lewat tugas latar.
+
+        Response 202 berisi tugas `hapus_kategori` (pantau di `/api/tugas/<id>/`);
+        kategori kecil tetap dihapus langsung (204).
+        """
+        kategori = self.get_object()
+        ambang = tugas.konfigurasi()['AMBANG_HAPUS_KATEGORI']
+        if kategori.barang.order_by()[ambang:ambang + 1].exists():
+            aktif = Tugas.objects.filter(
+                jenis='hapus_kategori', parameter__kategori=kategori.pk, status__in=(Tugas.ANTRI, Tugas.BERJALAN),
+            ).first()
+            obj = aktif or tugas.kirim('hapus_kategori', {'kategori': kategori.pk}, request.user)
+            return Response(TugasSerializer(obj, context=self.get_serializer_context()).data,
+                            status=status.HTTP_202_ACCEPTED)
+        self.perform_destroy(kategori)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class SupplierViewSet(cache.ResponseCacheMixin, FieldsetMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all().order_by('nama')
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticatedOrAdminDelete]
@@ -92,16 +126,36 @@ class SupplierViewSet(viewsets.ModelViewSet):
     search_fields = ['nama', 'kontak', 'telepon', 'email']
     ordering_fields = ['nama', 'dibuat_pada']
 
-class BarangViewSet(viewsets.ModelViewSet):
-    queryset = Barang.objects.all().order_by('-dibuat_pada')
+class BarangViewSet(ConditionalMixin, SerializerCepatMixin, FieldsetMixin, viewsets.ModelViewSet):
+    queryset = Barang.objects.select_related('kategori', 'supplier').order_by('-dibuat_pada')
     serializer_class = BarangSerializer
     permission_classes = [IsAuthenticatedOrAdminDelete]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     search_fields = ['sku', 'nama', 'kategori__nama', 'supplier__nama']
+    fts_prefix = ''
     filterset_fields = ['kategori', 'supplier']
     ordering_fields = ['nama', 'sku', 'dibuat_pada']
 
-class GudangViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser],
+            parser_classes=[MultiPartParser, FormParser])
+    def impor(self, request):
+        """Import barang (dan stok) dari file CSV/XLSX, upsert berdasarkan SKU.
+
+        Form multipart: `file` (.csv atau .xlsx) dan opsional `buat_referensi=true`
+        untuk membuat kategori/supplier/gudang yang belum ada. Response berisi
+        ringkasan jumlah baris dibuat/diperbarui dan error per baris.
+        """
+        berkas = request.FILES.get('file')
+        if berkas is None:
+            return Response({'file': ['File wajib diunggah']}, status=status.HTTP_400_BAD_REQUEST)
+        buat_referensi = str(request.data.get('buat_referensi', '')).lower() in ('1', 'true', 'ya')
+        try:
+            hasil = importer.impor_berkas(berkas, berkas.name, buat_referensi=buat_referensi, user=request.user)
+        except ValueError as e:
+            return Response({'file': [f'File tidak bisa dibaca: {e}']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(hasil)
+
+class GudangViewSet(cache.ResponseCacheMixin, FieldsetMixin, viewsets.ModelViewSet):
     queryset = Gudang.objects.all().order_by('nama')
     serializer_class = GudangSerializer
     permission_classes = [IsAuthenticatedOrAdminDelete]
@@ -109,15 +163,23 @@ class GudangViewSet(viewsets.ModelViewSet):
     search_fields = ['nama', 'lokasi']
     ordering_fields = ['nama', 'dibuat_pada']
 
-class StokViewSet(viewsets.ModelViewSet):
-    queryset = Stok.objects.filter(jumlah__gt=0).order_by('-diperbarui_pada')
+class StokViewSet(ConditionalMixin, SerializerCepatMixin, FieldsetMixin, viewsets.ModelViewSet):
+    queryset = Stok.objects.filter(jumlah__gt=0).select_related('barang', 'gudang').order_by('-diperbarui_pada', '-id')
     serializer_class = StokSerializer
+    # Mendukung paginasi cursor: ?cursor=
+    keyset_field = 'diperbarui_pada'
+    # Lookup upsert di create() harus melihat data terbaru (lihat db_router)
+    baca_dari_primary = ('create',)
+    # List dan reorder diserialisasi dari .values() (lihat serializer_cepat)
+    serializer_cepat_aksi = ('list', 'reorder')
+    fieldset_aksi = ('list', 'retrieve', 'reorder')
     permission_classes = [IsAuthenticatedOrAdminDelete]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['barang__sku', 'barang__nama', 'gudang__nama']
     filterset_fields = ['gudang', 'barang']
     ordering_fields = ['jumlah', 'diperbarui_pada']
 
+    @idempoten
     def create(self, request, *args, **kwargs):
         """
         Override create so that if a Stok with the same (barang, gudang) exists,
@@ -131,7 +193,7 @@ class StokViewSet(viewsets.ModelViewSet):
         # Only attempt the upsert behavior when both foreign keys are provided
         if barang_id and gudang_id:
             try:
-                existing = Stok.objects.filter(barang_id=barang_id, gudang_id=gudang_id).first()
+                existing = Stok.objects.select_related('barang', 'gudang').filter(barang_id=barang_id, gudang_id=gudang_id).first()
             except Exception:
                 existing = None
 
@@ -162,10 +224,11 @@ class StokViewSet(viewsets.ModelViewSet):
     
     # ... (queryset dan serializer_class) ...
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     
-    # Cari berdasarkan nama/sku barang (SearchFilter)
+    # Cari berdasarkan nama/sku barang (index FTS) dan nama gudang (icontains)
     search_fields = ['barang__sku', 'barang__nama', 'gudang__nama']
+    fts_prefix = 'barang__'
     
     # Filter berdasarkan ID Kategori (Filter Backend)
     # Kita menargetkan relasi: Stok -> Barang -> Kategori
@@ -176,15 +239,247 @@ class StokViewSet(viewsets.ModelViewSet):
     }
     ordering_fields = ['jumlah', 'diperbarui_pada']
 
-class RiwayatStokViewSet(viewsets.ModelViewSet):
-    queryset = RiwayatStok.objects.all().order_by('-dibuat_pada')
+    def get_queryset(self):
+        if self.action == 'reorder':
+            # Termasuk stok kosong (jumlah 0); dilayani partial index stok_reorder_idx
+            return (Stok.objects.filter(jumlah__lte=F('level_reorder'))
+                    .select_related('barang', 'gudang').order_by('gudang_id', 'barang_id'))
+        if self.action == 'histori' or (self.action == 'list' and 'as_of' in self.request.query_params):
+            # Stok yang sekarang kosong bisa saja berisi pada waktu yang diminta
+            return Stok.objects.select_related('barang', 'gudang').order_by('gudang_id', 'id')
+        return super().get_queryset()
+
+    def kolom_wajib(self):
+        # checkpoint.level_pada (?as_of=) menghitung mundur dari jumlah saat ini
+        return super().kolom_wajib() + ('jumlah',)
+
+    def list(self, request, *args, **kwargs):
+        """List stok; dengan `?as_of=` jumlah diganti jumlah stok pada waktu tersebut.
+
+        `as_of` berupa tanggal (YYYY-MM-DD, artinya akhir hari itu) atau datetime
+        ISO 8601. Semua stok ikut ditampilkan, termasuk yang jumlahnya 0, dan
+        filter yang sama (`gudang`, `barang`, `search`, ...) tetap berlaku.
+        Jumlah hanya dihitung untuk stok di halaman yang diminta.
+        """
+        as_of = request.query_params.get('as_of')
+        if as_of is None or self.action != 'list':
+            return super().list(request, *args, **kwargs)
+        try:
+            waktu = checkpoint.parse_waktu(as_of, akhir_hari=True)
+        except ValueError as e:
+            return Response({'as_of': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        stok_list = page if page is not None else list(queryset)
+        level = checkpoint.level_pada(stok_list, waktu)
+        data = self.get_serializer(stok_list, many=True).data
+        for row, stok in zip(data, stok_list):
+            if 'jumlah' in row:
+                row['jumlah'] = level[stok.id]
+            row['as_of'] = waktu.isoformat()
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path='riwayat', permission_classes=[IsAdminUser])
+    def histori(self, request, pk=None):
+        """Histori satu stok: saldo awal dan setiap pergerakan beserta saldo sesudahnya.
+
+        `?dari=` dan `?sampai=` (tanggal atau datetime ISO 8601, `sampai`
+        inklusif sampai akhir hari) default 30 hari terakhir. Maksimal
+        `checkpoint.MAKS_PERGERAKAN` pergerakan; `terpotong` true jika masih ada
+        sisanya (lanjutkan dengan `dari` = waktu pergerakan terakhir).
+        """
+        stok = self.get_object()
+        try:
+            sampai = checkpoint.parse_waktu(request.query_params['sampai'], akhir_hari=True) \
+                if request.query_params.get('sampai') else timezone.now()
+            dari = checkpoint.parse_waktu(request.query_params['dari']) \
+                if request.query_params.get('dari') else sampai - timedelta(days=checkpoint.HARI_HISTORI_DEFAULT)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if dari >= sampai:
+            return Response({'dari': ['Harus sebelum sampai']}, status=status.HTTP_400_BAD_REQUEST)
+
+        saldo_awal, riwayat, terpotong = checkpoint.histori(stok, dari, sampai, checkpoint.MAKS_PERGERAKAN)
+        for r in riwayat:
+            # Nama barang/gudang diambil dari stok yang sudah dimuat
+            r.stok = stok
+        pergerakan = RiwayatStokSerializer(riwayat, many=True).data
+        for row, r in zip(pergerakan, riwayat):
+            row['saldo'] = r.saldo
+        return Response({
+            'stok': StokSerializer(stok).data,
+            'dari': dari.isoformat(),
+            'sampai': sampai.isoformat(),
+            'saldo_awal': saldo_awal,
+            'saldo_akhir': riwayat[-1].saldo if riwayat else saldo_awal,
+            'terpotong': terpotong,
+            'pergerakan': pergerakan,
+        })
+
+    @action(detail=False, methods=['get'], url_path='reorder')
+    def reorder(self, request):
+        """Daftar stok yang jumlahnya sudah mencapai level reorder (jumlah <= level_reorder).
+
+        Mendukung filter yang sama dengan list stok (`gudang`, `barang__kategori`,
+        `search`). Biaya query sebanding dengan jumlah stok yang perlu reorder,
+        bukan ukuran seluruh tabel stok.
+        """
+        return self.list(request)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Download stok secara streaming tanpa paginasi.
+
+        `?jenis=csv` (default) mengirim CSV stok, `?jenis=xlsx` mengirim workbook
+        dua sheet: 'Stok' dan 'Stok Keluar'. Filter yang sama dengan list stok
+        (`gudang`, `barang__kategori`, `search`, `ordering`) berlaku; sheet
+        riwayat juga menerima `tipe` (default OUT), `dari` dan `sampai`.
+        """
+        jenis = (request.query_params.get('jenis') or 'csv').lower()
+        if jenis not in ('csv', 'xlsx'):
+            return Response({'jenis': ['Jenis harus csv atau xlsx']}, status=status.HTTP_400_BAD_REQUEST)
+
+        stok_qs = self.filter_queryset(self.get_queryset())
+        if jenis == 'csv':
+            return exports.response_csv(stok_qs, exports.KOLOM_STOK, 'stok_export')
+
+        # Riwayat stok hanya untuk admin (sama seperti RiwayatStokViewSet);
+        # pengguna lain tetap mendapat sheet kosong.
+        riwayat_qs = RiwayatStok.objects.none()
+        if request.user and request.user.is_staff:
+            params = request.query_params.copy()
+            params.setdefault('tipe', 'OUT')
+            riwayat_qs = RiwayatStokFilter(params, queryset=RiwayatStok.objects.order_by('-dibuat_pada')).qs
+        return exports.response_xlsx([
+            ('Stok', stok_qs, exports.KOLOM_STOK),
+            ('Stok Keluar', riwayat_qs, exports.KOLOM_RIWAYAT),
+        ], 'laporan_stok')
+
+class RiwayatStokViewSet(SerializerCepatMixin, FieldsetMixin, viewsets.ModelViewSet):
+    queryset = RiwayatStok.objects.select_related('stok__barang', 'stok__gudang', 'dibuat_oleh').order_by('-dibuat_pada', '-id')
     serializer_class = RiwayatStokSerializer
+    # Mendukung paginasi cursor: ?cursor=
+    keyset_field = 'dibuat_pada'
     permission_classes = [IsAdminUser]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['stok__barang__nama', 'tipe', 'catatan']
-    filterset_fields = ['tipe', 'dibuat_oleh']
     ordering_fields = ['dibuat_pada', 'jumlah']
 
+    def pakai_arsip(self):
+        """Baca gabungan riwayat aktif + arsip hanya jika rentang `dari` (atau `?arsip=true`) membutuhkannya.
+
+        Arsip hanya bisa dibaca; update/delete tetap ke tabel riwayat aktif.
+        """
+        if not hasattr(self, '_pakai_arsip'):
+            request = getattr(self, 'request', None)
+            self._pakai_arsip = (
+                request is not None and request.method in SAFE_METHODS and arsip.perlu_arsip(request.query_params)
+            )
+        return self._pakai_arsip
+
+    @property
+    def filterset_class(self):
+        return RiwayatStokSemuaFilter if self.pakai_arsip() else RiwayatStokFilter
+
+    def get_queryset(self):
+        if self.pakai_arsip():
+            return (RiwayatStokSemua.objects.select_related('stok__barang', 'stok__gudang', 'dibuat_oleh')
+                    .order_by('-dibuat_pada', '-id'))
+        return super().get_queryset()
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Download riwayat stok sebagai CSV streaming dengan filter yang sama seperti list."""
+        return exports.response_csv(self.filter_queryset(self.get_queryset()), exports.KOLOM_RIWAYAT, 'riwayat_stok_export')
+
+
+class TugasViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                   viewsets.GenericViewSet):
+    """Tugas latar (lihat tugas.py).
+
+    `POST {"jenis": "ekspor_stok", "parameter": {"jenis": "xlsx"}}` memasukkan
+    tugas ke antrian (202); progres dipantau lewat GET detail dan berkas hasil
+    diunduh dari `hasil/`. Pengguna biasa hanya melihat tugasnya sendiri.
+    """
+    queryset = Tugas.objects.select_related('dibuat_oleh').order_by('-dibuat_pada', '-id')
+    serializer_class = TugasSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status', 'jenis']
+    ordering_fields = ['dibuat_pada']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(dibuat_oleh=self.request.user)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        obj = tugas.kirim(serializer.validated_data['jenis'], serializer.validated_data.get('parameter'), request.user)
+        data = self.get_serializer(obj).data
+        return Response(data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': request.build_absolute_uri(reverse('tugas-detail', args=[obj.pk]))})
+
+    @action(detail=True, methods=['get'])
+    def hasil(self, request, pk=None):
+        """Download berkas hasil tugas yang sudah selesai."""
+        obj = self.get_object()
+        if obj.status != Tugas.SELESAI or not obj.berkas_hasil:
+            return Response({'detail': 'Tugas belum selesai atau tidak menghasilkan berkas.'},
+                            status=status.HTTP_409_CONFLICT)
+        nama = (obj.hasil or {}).get('nama_berkas') or os.path.basename(obj.berkas_hasil.name)
+        return FileResponse(obj.berkas_hasil.open('rb'), as_attachment=True, filename=nama)
+
+    @action(detail=True, methods=['post'])
+    def batal(self, request, pk=None):
+        """Batalkan tugas yang masih antri atau sedang berjalan."""
+        obj = self.get_object()
+        if not tugas.batalkan(obj):
+            return Response({'detail': 'Tugas sudah berakhir.'}, status=status.HTTP_409_CONFLICT)
+        obj.refresh_from_db()
+        return Response(self.get_serializer(obj).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def tiket_stream(request):
+    """Tiket berumur pendek untuk membuka /api/stok/stream/ dari EventSource (lihat realtime.py)."""
+    response = Response({'tiket': realtime.buat_tiket(request.user, request.auth), 'ttl': realtime.ttl_tiket()})
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Statistik cache response data referensi (hit/miss per view dan isi store)."""
+    return Response({**cache.statistik.ringkasan(), 'store': cache.store().info()})
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # Response error (401/403) berupa dict
+        return renderers.JSONRenderer().render(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([PrometheusRenderer, renderers.JSONRenderer])
+def metrik_prometheus(request):
+    """Metrik performa per rute (lihat metrics.py) dalam format teks Prometheus untuk scrape."""
+    return Response(metrics.registri.teks_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 class StokTransactionAPIView(APIView):
     """Endpoint to perform transactional stok IN/OUT operations in a single request.
@@ -196,45 +491,132 @@ class StokTransactionAPIView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @idempoten
     def post(self, request, *args, **kwargs):
-        tipe = (request.data.get('tipe') or '').upper()
+        item, errors = parse_pergerakan(request.data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            jumlah = int(request.data.get('jumlah'))
-        except Exception:
-            return Response({'jumlah': ['Jumlah harus berupa angka']}, status=status.HTTP_400_BAD_REQUEST)
+            stok, riwayat = terapkan_pergerakan(item, user=request.user)
+        except PergerakanGagal as e:
+            return Response(e.errors, status=e.status)
 
-        if tipe not in ('IN', 'OUT'):
-            return Response({'tipe': ['Tipe harus IN atau OUT']}, status=status.HTTP_400_BAD_REQUEST)
-        if jumlah <= 0:
-            return Response({'jumlah': ['Jumlah harus lebih besar dari 0']}, status=status.HTTP_400_BAD_REQUEST)
+        stok_data = StokSerializer(stok).data
+        riwayat_data = RiwayatStokSerializer(riwayat).data
+        return Response({'stok': stok_data, 'riwayat': riwayat_data}, status=status.HTTP_200_OK)
 
-        stok_id = request.data.get('stok')
-        barang_id = request.data.get('barang')
-        gudang_id = request.data.get('gudang')
-        catatan = request.data.get('catatan', '')
-
-        with transaction.atomic():
-            if stok_id:
-                stok_qs = Stok.objects.select_for_update().filter(pk=stok_id)
-                stok = get_object_or_404(stok_qs)
-            else:
-                if not (barang_id and gudang_id):
-                    return Response({'detail': 'stok id atau barang+gudang harus diberikan'}, status=status.HTTP_400_BAD_REQUEST)
-                stok, created = Stok.objects.select_for_update().get_or_create(barang_id=barang_id, gudang_id=gudang_id, defaults={'jumlah': 0, 'level_reorder': 10})
-
-            if tipe == 'OUT':
-                if jumlah > stok.jumlah:
-                    return Response({'detail': 'Jumlah keluar melebihi stok tersedia'}, status=status.HTTP_400_BAD_REQUEST)
-                stok.jumlah -= jumlah
-            else:
-                stok.jumlah += jumlah
-
-            stok.save()
-            riwayat = RiwayatStok.objects.create(stok=stok, tipe=tipe, jumlah=jumlah, catatan=catatan, dibuat_oleh=request.user if request.user.is_authenticated else None)
-
-            stok_data = StokSerializer(stok).data
-            riwayat_data = RiwayatStokSerializer(riwayat).data
-            return Response({'stok': stok_data, 'riwayat': riwayat_data}, status=status.HTTP_200_OK)
+
+class StokBulkTransactionAPIView(APIView):
+    """Endpoint untuk banyak pergerakan stok IN/OUT sekaligus (misalnya satu surat jalan).
+
+    Body JSON:
+      - pergerakan: list baris dengan format yang sama seperti StokTransactionAPIView
+        (`stok` atau `barang`+`gudang`, `tipe`, `jumlah`, `catatan`)
+      - atomik: bool, default true. Jika true, satu baris gagal membatalkan semua
+        baris; jika false, baris yang valid tetap disimpan.
+
+    Response berisi hasil per baris (`ok`, `error` atau `batal`) sesuai urutan input.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @idempoten
+    def post(self, request, *args, **kwargs):
+        baris = request.data.get('pergerakan') if isinstance(request.data, dict) else request.data
+        if not isinstance(baris, list) or not baris:
+            return Response({'pergerakan': ['Pergerakan harus berupa list yang tidak kosong']}, status=status.HTTP_400_BAD_REQUEST)
+        if len(baris) > MAKS_BARIS_BATCH:
+            return Response({'pergerakan': [f'Maksimal {MAKS_BARIS_BATCH} baris per request']}, status=status.HTTP_400_BAD_REQUEST)
+
+        atomik = request.data.get('atomik', True) if isinstance(request.data, dict) else True
+        if isinstance(atomik, str):
+            atomik = atomik.lower() not in ('false', '0', 'no')
+
+        hasil, berhasil = terapkan_batch(baris, user=request.user, atomik=bool(atomik))
+        jumlah_ok = sum(1 for h in hasil if h['status'] == 'ok')
+        return Response({
+            'atomik': bool(atomik),
+            'berhasil': jumlah_ok,
+            'gagal': len(hasil) - jumlah_ok,
+            'hasil': hasil,
+        }, status=status.HTTP_200_OK if berhasil else status.HTTP_400_BAD_REQUEST)
+
+class StokTransferAPIView(APIView):
+    """Transfer stok antar gudang: OUT di gudang asal dan IN di gudang tujuan dalam satu transaksi.
+
+    Body JSON satu transfer:
+      - `stok` (id stok asal) atau `barang` + `dari_gudang`
+      - `ke_gudang`: gudang tujuan (stok tujuan dibuat jika belum ada)
+      - `jumlah`: integer > 0, `catatan`: opsional
+    Response berisi stok asal, stok tujuan dan pasangan riwayatnya (satu `kode_transfer`).
+
+    Banyak transfer sekaligus: `{"transfer": [...], "atomik": true}` dengan
+    response per baris seperti StokBulkTransactionAPIView.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @idempoten
+    def post(self, request, *args, **kwargs):
+        data = request.data if isinstance(request.data, dict) else {}
+        if 'transfer' not in data:
+            hasil, _ = terapkan_transfer([data], user=request.user)
+            baris = hasil[0]
+            if baris['status'] != 'ok':
+                kode = status.HTTP_404_NOT_FOUND if baris['errors'].get('detail') == 'Stok tidak ditemukan' else status.HTTP_400_BAD_REQUEST
+                return Response(baris['errors'], status=kode)
+            stok = Stok.objects.select_related('barang', 'gudang').in_bulk([baris['asal'], baris['tujuan']])
+            riwayat = RiwayatStok.objects.select_related('stok__barang', 'stok__gudang', 'dibuat_oleh').filter(
+                pk__in=baris['riwayat']).order_by('pk')
+            return Response({
+                'kode_transfer': baris['kode_transfer'],
+                'asal': StokSerializer(stok[baris['asal']]).data,
+                'tujuan': StokSerializer(stok[baris['tujuan']]).data,
+                'riwayat': RiwayatStokSerializer(riwayat, many=True).data,
+            }, status=status.HTTP_200_OK)
+
+        baris = data.get('transfer')
+        if not isinstance(baris, list) or not baris:
+            return Response({'transfer': ['Transfer harus berupa list yang tidak kosong']}, status=status.HTTP_400_BAD_REQUEST)
+        if len(baris) > MAKS_BARIS_BATCH:
+            return Response({'transfer': [f'Maksimal {MAKS_BARIS_BATCH} baris per request']}, status=status.HTTP_400_BAD_REQUEST)
+        atomik = data.get('atomik', True)
+        if isinstance(atomik, str):
+            atomik = atomik.lower() not in ('false', '0', 'no')
+
+        hasil, berhasil = terapkan_transfer(baris, user=request.user, atomik=bool(atomik))
+        jumlah_ok = sum(1 for h in hasil if h['status'] == 'ok')
+        return Response({
+            'atomik': bool(atomik),
+            'berhasil': jumlah_ok,
+            'gagal': len(hasil) - jumlah_ok,
+            'hasil': hasil,
+        }, status=status.HTTP_200_OK if berhasil else status.HTTP_400_BAD_REQUEST)
+
+class StatistikAPIView(APIView):
+    """Statistik dashboard admin, dihitung dari tabel rekap pergerakan harian.
+
+    Query params:
+      - hari: panjang deret harian dan periode top barang keluar (default 30, maks 366)
+      - gudang: batasi ke satu gudang (id)
+      - top: jumlah barang teratas (default 5, maks 50)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        params = {}
+        for nama, default, maks in (('hari', 30, 366), ('top', 5, 50), ('gudang', None, None)):
+            nilai = request.query_params.get(nama)
+            if not nilai:
+                params[nama] = default
+                continue
+            try:
+                nilai = int(nilai)
+            except ValueError:
+                return Response({nama: ['Harus berupa bilangan bulat']}, status=status.HTTP_400_BAD_REQUEST)
+            if nilai < 1:
+                return Response({nama: ['Harus lebih dari 0']}, status=status.HTTP_400_BAD_REQUEST)
+            params[nama] = min(nilai, maks) if maks else nilai
+        return Response(rekap.statistik(**params))
 
 class BarangListView(LoginRequiredMixin, ListView):
     model = Barang